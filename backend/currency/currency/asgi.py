@@ -12,16 +12,18 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from currency_app.invalidation import InvalidationListenerMiddleware
 from currency_app.routing import websocket_urlpatterns
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'currency.settings')
 
-application = ProtocolTypeRouter({
+# Workers join the cache invalidation bus at startup, before their first socket connects
+application = InvalidationListenerMiddleware(ProtocolTypeRouter({
     'http': get_asgi_application(),
     'websocket': AuthMiddlewareStack(
         URLRouter(
             websocket_urlpatterns
         )
     )
-})
\ No newline at end of file
+}))
\ No newline at end of file
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os 
+import sys
 
 load_dotenv() 
 
@@ -90,6 +91,15 @@ DATABASES = {
     }
 }
 
+# Tests run against SQLite so they need no MySQL server
+if 'test' in sys.argv:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -110,6 +120,45 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Shared by every ASGI worker, on the Redis server the channel layer already uses
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'KEY_PREFIX': 'currency',
+    }
+}
+
+# Tests use an in-memory stand-in
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'currency',
+        }
+    }
+
+# Seconds a dashboard snapshot may be served; rate writes retire it earlier through the data version
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds the shared country/currency catalog, and the rate summaries and yearly averages, stay fresh
+CATALOG_CACHE_TIMEOUT = 3600
+SUMMARY_CACHE_TIMEOUT = 300
+
+# Seconds past freshness an entry may still be served while one reader rebuilds it
+CACHE_STALE_TIMEOUT = 60
+
+# Threads (and so database connections) per worker running the consumer's ORM reads in parallel;
+# 0 sends them through asgiref's single thread-sensitive executor instead
+DB_READ_THREADS = 8
+
+# Seconds committed rate changes are gathered per currency before one merged push goes out
+RATE_BROADCAST_WINDOW = 0.05
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -141,4 +190,14 @@ CHANNEL_LAYERS = {
             "hosts": [('127.0.0.1', 6379)],
         },
     },
-}
\ No newline at end of file
+}
+
+# Tests need no Redis server either
+if 'test' in sys.argv:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+    # Pushes go out as each write commits; coalescing tests flush by hand
+    RATE_BROADCAST_WINDOW = 0
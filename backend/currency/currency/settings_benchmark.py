@@ -0,0 +1,39 @@
+"""
+Settings for `manage.py benchmark_load --settings=currency.settings_benchmark`.
+
+The load benchmark seeds its own synthetic SQLite database and needs neither MySQL nor Redis.
+A server started with DJANGO_SETTINGS_MODULE=currency.settings_benchmark serves the same
+database to `benchmark_load --url`.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+
+# benchmark_load deletes and re-creates this database, so it refuses to run without the flag
+BENCHMARK_LOAD = True
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Outside the source tree, with its -wal/-shm files
+        'NAME': os.getenv('BENCHMARK_DB', Path(tempfile.gettempdir()) / 'currency_benchmark.sqlite3'),
+        # update_rate writers and the read pool share one file
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'currency-benchmark',
+    }
+}
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .encoding import CODECS, JSON_CODEC
+
+logger = logging.getLogger(__name__)
+
+# Handler name on CurrencyConsumer for events sent to the rate groups
+RATE_CHANGED_EVENT = 'rate.changed'
+
+# (event id, currency id) pairs this worker has already refreshed its rate store for
+_SEEN_EVENTS_LIMIT = 1024
+_seen_events = OrderedDict()
+_seen_lock = threading.Lock()
+
+
+def currency_group(currency_id):
+    """Channel-layer group of every socket subscribed to one currency"""
+    return f'rates.currency.{int(currency_id)}'
+
+
+def claim_event(event):
+    """
+    True for the first consumer of this worker to receive a change event, False for the rest.
+
+    Every subscribed consumer of a worker receives the same event; only the claimer refreshes
+    the rate store for it, so a broadcast costs one small read per worker, not one per socket.
+    """
+    key = (event['id'], event['currency_id'])
+    with _seen_lock:
+        if key in _seen_events:
+            return False
+        _seen_events[key] = True
+        if len(_seen_events) > _SEEN_EVENTS_LIMIT:
+            _seen_events.popitem(last=False)
+    return True
+
+
+class RateBroadcaster:
+    """
+    Coalesces committed rate changes per currency before fanning them out.
+
+    Changes are gathered for settings.RATE_BROADCAST_WINDOW seconds after the first one;
+    a flush then sends one event per touched currency, with the months merged (last rate
+    wins) and the rate_update payload encoded once per codec for every socket in the group.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # currency id -> {'since': first change time, 'received': change count, 'changes': {(year, month): rate}}
+        self._pending = {}
+        self._timer = None
+        self._changes_received = 0
+        self._events_sent = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def publish(self, changes):
+        """Queue (currency_id, year, month, rate) changes; flushes at once when the window is 0"""
+        window = settings.RATE_BROADCAST_WINDOW
+        now = time.monotonic()
+        with self._lock:
+            for currency_id, year, month, rate in changes:
+                bucket = self._pending.setdefault(int(currency_id), {'since': now, 'received': 0, 'changes': {}})
+                bucket['changes'][(int(year), int(month))] = float(rate)
+                bucket['received'] += 1
+                self._changes_received += 1
+            if window > 0 and self._pending and self._timer is None:
+                self._timer = threading.Timer(window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if window <= 0:
+            self.flush()
+
+    def flush(self):
+        """Send every pending currency now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+
+        # Shared by the events of one flush, so each worker refreshes its rate store once per currency
+        event_id = uuid.uuid4().hex
+
+        events = []
+        for currency_id, bucket in pending.items():
+            changes = [
+                {'year': year, 'month': month, 'rate': rate}
+                for (year, month), rate in sorted(bucket['changes'].items())
+            ]
+            events.append((currency_group(currency_id), {
+                'type': RATE_CHANGED_EVENT,
+                'id': event_id,
+                'currency_id': currency_id,
+                'changes': changes,
+                # Encoded once per wire format, for every socket in the group
+                'payloads': {
+                    codec.name: codec.encode({
+                        'type': 'rate_update',
+                        'data': {'currency_id': currency_id, 'changes': changes}
+                    })
+                    for codec in (JSON_CODEC, *CODECS.values())
+                }
+            }))
+
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            try:
+                async_to_sync(self._send)(channel_layer, events)
+            except Exception:
+                # The writes are already committed; a lost push must not fail the caller
+                logger.exception('Rate broadcast of %d currencies failed', len(events))
+
+        sent = time.monotonic()
+        with self._lock:
+            self._events_sent += len(events)
+            for bucket in pending.values():
+                latency = sent - bucket['since']
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    async def _send(self, channel_layer, events):
+        for group, event in events:
+            await channel_layer.group_send(group, event)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'window_ms': settings.RATE_BROADCAST_WINDOW * 1000,
+                'changes_received': self._changes_received,
+                'events_sent': self._events_sent,
+                'messages_saved': self._changes_received - self._events_sent - sum(
+                    bucket['received'] for bucket in self._pending.values()
+                ),
+                'pending_currencies': len(self._pending),
+                'average_added_latency_ms': (
+                    self._latency_total / self._events_sent * 1000 if self._events_sent else 0.0
+                ),
+                'max_added_latency_ms': self._latency_max * 1000
+            }
+
+
+# One broadcaster per worker process, fed by every committed rate write in it
+rate_broadcaster = RateBroadcaster()
+
+
+def broadcast_rate_changes(changes):
+    """
+    Publish committed (currency_id, year, month, rate) changes to the groups of the touched currencies.
+
+    Meant to run from transaction.on_commit, after the rate store of this worker was refreshed.
+    """
+    rate_broadcaster.publish(changes)
@@ -0,0 +1,61 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Bumped on every committed rate/currency write; cached payloads are stored under it
+DATA_VERSION_KEY = 'currency:data_version'
+
+
+def get_data_version():
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # add() keeps concurrent first readers from resetting a version another worker just set
+        cache.add(DATA_VERSION_KEY, 1, timeout=None)
+        version = cache.get(DATA_VERSION_KEY, 1)
+    return version
+
+
+def bump_data_version():
+    try:
+        return cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        # Key evicted or never set: any fresh value retires entries cached under the old one
+        get_data_version()
+        return cache.incr(DATA_VERSION_KEY)
+
+
+def make_key(name, *params):
+    """Cache key for a named payload; free-form parameters are hashed so every backend accepts them"""
+    if not params:
+        return f'currency:{name}'
+    digest = hashlib.md5('\x1f'.join(str(param) for param in params).encode()).hexdigest()
+    return f'currency:{name}:{digest}'
+
+
+def get_or_build(key, build, timeout, stale_timeout=None):
+    """
+    Return the payload cached for the current data version, building it on a miss.
+
+    An entry is fresh for `timeout` seconds and may then be served stale for `stale_timeout`
+    more (settings.CACHE_STALE_TIMEOUT by default): the first reader to find it stale rebuilds
+    it while every other worker keeps getting the old payload. A data version bump is a miss.
+    """
+    if stale_timeout is None:
+        stale_timeout = settings.CACHE_STALE_TIMEOUT
+    version = get_data_version()
+    entry = cache.get(key, version=version)
+    if entry is not None:
+        fresh_until, payload = entry
+        if time.time() < fresh_until:
+            return payload
+        # add() succeeds for exactly one reader across workers; the rest serve stale meanwhile
+        if not cache.add(f'{key}:refresh', True, timeout=max(stale_timeout, 1), version=version):
+            return payload
+
+    payload = build()
+    cache.set(key, (time.time() + timeout, payload), timeout + stale_timeout, version=version)
+    if entry is not None:
+        cache.delete(f'{key}:refresh', version=version)
+    return payload
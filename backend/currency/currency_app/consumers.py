@@ -1,30 +1,168 @@
-import json
+import asyncio
+import contextvars
 import datetime
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
-from django.db.models import Avg, Subquery, OuterRef
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from .broadcast import claim_event, currency_group, rate_broadcaster
+from .cache import get_data_version, get_or_build, make_key
+from .conversion import MAX_BATCH_SIZE, convert_batch, currency_name, usd_value
+from .db import db_read
+from .encoding import JSON_CODEC, dumps, encoded_payloads, loads, negotiate_codec
+from .history import DOWNSAMPLERS, MIN_HISTORY_POINTS, downsample, pair_series, series
+from .invalidation import ensure_listener
+from .models import normalize_key
+from .rate_store import rate_store
+from .singleflight import flights, read_after, single_flight
+
+MAX_BULK_UPDATE_ROWS = 10000
+MAX_SUBSCRIPTIONS = 100
+# Bounds of one get_rates_above_average request, which scans every month of every matching currency
+MAX_ABOVE_AVERAGE_COUNTRIES = 50
+MAX_ABOVE_AVERAGE_YEARS = 30
+# Handlers one connection may run at once; further frames wait until one finishes
+MAX_IN_FLIGHT_PER_CONNECTION = 8
+# Run in arrival order on the receive loop, so an unsubscribe never overtakes its subscribe
+ORDERED_MESSAGES = {'subscribe', 'unsubscribe'}
+# Other messages run concurrently, but a write starts after every earlier handler of its
+# connection has finished and the messages after it start once it has, so a convert sent
+# after an update_rate sees the new rate. Reads between two writes still overlap.
+WRITE_MESSAGES = {'update_rate', 'update_rates'}
+
+# request_id of the message the running handler task answers, echoed in every reply it sends
+current_request_id = contextvars.ContextVar('current_request_id', default=None)
+
+# Everything but the timestamp of the greeting is fixed, so it is encoded once per worker
+CONNECTION_ESTABLISHED_PREFIX = dumps({
+    'type': 'connection_established',
+    'message': 'Connected to Currency Exchange',
+    'features': ['INDEX', 'VIEW', 'STORED_FUNCTION', 'STORED_PROCEDURE', 'TRIGGER', 'SUBQUERY']
+})[:-1]
+
+
+def message_key(name, *fields):
+    """single_flight key of a helper taking a message: its name plus the fields it reads, countries normalized"""
+    def key(self, *args):
+        data = args[-1]
+        return (name, dumps([
+            normalize_key(data.get(field)) if 'country' in field and isinstance(data.get(field), str) else data.get(field)
+            for field in fields
+        ]))
+    return key
+
+
 class CurrencyConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        await self.accept()
-        await self.send(text_data=json.dumps({
-            'type': 'connection_established',
-            'message': 'Connected to Currency Exchange',
-            'timestamp': datetime.datetime.now().isoformat(),
-            'features': ['INDEX', 'VIEW', 'STORED_FUNCTION', 'STORED_PROCEDURE', 'TRIGGER', 'SUBQUERY']
-        }))
+        # Joins this worker to the invalidation bus, once per event loop
+        ensure_listener()
+        # Live-update subscriptions by id, and how many of them need each currency group
+        self.subscriptions = {}
+        self.group_refs = {}
+        # Handler tasks still running for this connection, and the last write among them
+        self.tasks = set()
+        self.write_task = None
+        # Single-flight generation of this connection's last write, so its reads never join an older flight
+        self.last_write = 0
+        self.in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_PER_CONNECTION)
+        # msgpack clients offer the subprotocol and get binary frames; everyone else keeps JSON text
+        self.codec = negotiate_codec(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.codec.subprotocol)
+        
+        timestamp = datetime.datetime.now().isoformat()
+        if self.codec is JSON_CODEC:
+            await self.send(text_data=f'{CONNECTION_ESTABLISHED_PREFIX},"timestamp":{dumps(timestamp)}}}')
+        else:
+            await self.send_message({**loads(f'{CONNECTION_ESTABLISHED_PREFIX}}}'), 'timestamp': timestamp})
 
     async def disconnect(self, close_code):
-        pass
+        # Nobody is left to read the replies of unfinished handlers
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        
+        for group in self.group_refs:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.group_refs = {}
+        self.subscriptions = {}
+
+    async def send_message(self, payload):
+        request_id = current_request_id.get()
+        if request_id is not None:
+            payload = {**payload, 'request_id': request_id}
+        await self._send_frame(self.codec.encode(payload))
+
+    async def send_encoded(self, data):
+        """Send an already-encoded reply, adding the request_id without re-encoding the rest"""
+        request_id = current_request_id.get()
+        if request_id is not None:
+            data = self.codec.with_field(data, 'request_id', request_id)
+        await self._send_frame(data)
 
-    async def receive(self, text_data):
+    async def _send_frame(self, data):
+        # Each codec encodes to the frame type it is sent in
+        if isinstance(data, bytes):
+            await self.send(bytes_data=data)
+        else:
+            await self.send(text_data=data)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            # Text frames are always JSON, so msgpack clients can still send hand-written messages
+            if bytes_data is not None:
+                data = self.codec.decode(bytes_data)
+            else:
+                data = loads(text_data)
+        except ValueError:
+            # Raised by both codecs for malformed frames (JSONDecodeError is a ValueError)
+            await self.send_message({
+                'type': 'error',
+                'message': 'Invalid msgpack' if bytes_data is not None and self.codec is not JSON_CODEC else 'Invalid JSON'
+            })
+            return
+        
+        request_id = data.get('request_id') if isinstance(data, dict) else None
+        if isinstance(data, dict) and data.get('type') in ORDERED_MESSAGES:
+            await self.handle_message(data, request_id)
+            return
+        
+        # Slow handlers no longer hold back the frames behind them; the semaphore bounds the backlog
+        await self.in_flight.acquire()
+        is_write = isinstance(data, dict) and data.get('type') in WRITE_MESSAGES
+        if is_write:
+            previous = set(self.tasks)
+        else:
+            previous = {self.write_task} if self.write_task is not None else set()
+        task = asyncio.create_task(self._handle_after(previous, data, request_id))
+        if is_write:
+            self.write_task = task
+        self.tasks.add(task)
+        task.add_done_callback(self._handler_done)
+
+    def _handler_done(self, task):
+        self.tasks.discard(task)
+        if task is self.write_task:
+            self.write_task = None
+        self.in_flight.release()
+
+    async def _handle_after(self, previous, data, request_id):
+        """Handle a message once the handlers it must not overtake have finished"""
+        if previous:
+            await asyncio.wait(previous)
+        await self.handle_message(data, request_id)
+
+    async def handle_message(self, data, request_id=None):
+        """Run the handler of one decoded message; every reply it sends carries request_id"""
+        token = current_request_id.set(request_id)
+        read_token = read_after.set(self.last_write)
         try:
-            data = json.loads(text_data)
             message_type = data.get('type', 'echo')
             
             if message_type == 'convert':
                 await self.handle_conversion(data)
+            elif message_type == 'convert_batch':
+                await self.handle_batch_conversion(data)
             elif message_type == 'get_currencies':
                 await self.send_currencies(data)
             elif message_type == 'get_countries':
@@ -37,253 +175,260 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
                 await self.demo_view(data)  # VIEW demo handler
             elif message_type == 'update_rate': 
                 await self.demo_stored_procedure(data)  # STORED PROCEDURE demo handler
+                self.last_write = flights.mark_write()
+            elif message_type == 'update_rates':
+                await self.bulk_update_rates(data)
+                self.last_write = flights.mark_write()
             elif message_type == 'get_audit_logs':
                 await self.demo_trigger(data)  # TRIGGER demo handler
             elif message_type == 'get_currency_stats':
                 await self.demo_index_performance(data)  # INDEX demo handler
             elif message_type == 'get_dashboard_data':
                 await self.get_dashboard_data(data)
+            elif message_type == 'get_rate_history':
+                await self.get_rate_history(data)
+            elif message_type == 'subscribe':
+                await self.subscribe(data)
+            elif message_type == 'unsubscribe':
+                await self.unsubscribe(data)
+            elif message_type == 'get_broadcast_metrics':
+                await self.get_broadcast_metrics()
+            elif message_type == 'get_single_flight_metrics':
+                await self.get_single_flight_metrics()
             elif message_type == 'echo':
-                await self.send(text_data=json.dumps({
+                await self.send_message({
                     'type': 'echo',
                     'message': 'Echo received',
                     'data': data,
                     'timestamp': datetime.datetime.now().isoformat()
-                }))
+                })
             else:
-                await self.send(text_data=json.dumps({
+                await self.send_message({
                     'type': 'error',
                     'message': f'Unknown type: {message_type}'
-                }))
+                })
 
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Invalid JSON'
-            }))
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error', 
                 'message': f'Error: {str(e)}'
-            }))
+            })
+        finally:
+            current_request_id.reset(token)
+            read_after.reset(read_token)
 
     def _get_models(self):
         from .models import Currency, MonthlyRate, CurrencyRateAudit
         return Currency, MonthlyRate, CurrencyRateAudit
 
-    @sync_to_async
+    @single_flight(lambda self: ('countries',))
+    @db_read
     def get_all_countries(self):
         Currency, _, _ = self._get_models()
         # INDEX: Using db_index on COUNTRY field
         countries = Currency.objects.values_list('COUNTRY', flat=True).distinct().order_by('COUNTRY')
-        return list(countries)
+        # CACHE: Shared by every worker until the next data version
+        return get_or_build(make_key('countries'), lambda: list(countries), settings.CATALOG_CACHE_TIMEOUT)
 
-    @sync_to_async
+    @single_flight(lambda self, country: ('currencies', normalize_key(country)))
+    @db_read
     def get_currencies_by_country(self, country):
         Currency, _, _ = self._get_models()
-        # INDEX: Using composite index idx_country_indicator
-        currencies = Currency.objects.filter(COUNTRY__iexact=country).order_by('INDICATOR')
-        return list(currencies.values('id', 'COUNTRY', 'INDICATOR'))
+        # INDEX: Using composite index idx_country_indicator_key
+        currencies = Currency.objects.by_country(country).order_by('INDICATOR')
+        return get_or_build(
+            make_key('currencies', normalize_key(country)),
+            lambda: list(currencies.values('id', 'COUNTRY', 'INDICATOR')),
+            settings.CATALOG_CACHE_TIMEOUT
+        )
 
-    @sync_to_async
-    def get_currency_by_indicator(self, country, indicator):
-        Currency, _, _ = self._get_models()
-        try:
-            # INDEX: Using composite index idx_country_indicator
-            currency = Currency.objects.get(COUNTRY__iexact=country, INDICATOR__iexact=indicator)
-            return {
-                'id': currency.id,
-                'country': currency.COUNTRY,
-                'indicator': currency.INDICATOR
-            }
-        except Currency.DoesNotExist:
-            return None
+    async def get_rate_snapshot(self):
+        # Served from worker memory; only reloads after a rate or currency write
+        snapshot = rate_store.peek()
+        if snapshot is None:
+            snapshot = await db_read(rate_store.snapshot)()
+        return snapshot
 
-    @sync_to_async
-    def get_rate_at_date(self, currency_id, year, month):
-        _, MonthlyRate, _ = self._get_models()
-        try:
-            # INDEX: Using idx_currency_date composite index
-            rate = MonthlyRate.objects.get(
-                currency_id=currency_id,
-                year=year,
-                month=month
-            )
-            return rate.rate
-        except Exception:
-            return None
+    def _conversion_data(self, rates, fields):
+        """Convert one amount against a rate snapshot; returns (data, error message)"""
+        amount = float(fields.get('amount', 100))
+        from_country = fields.get('from_country', 'Vietnam')
+        from_indicator = fields.get('from_indicator', 'Domestic currency per US Dollar')
+        to_country = fields.get('to_country', 'Vietnam')
+        to_indicator = fields.get('to_indicator', 'US Dollar per domestic currency')
+        year = int(fields.get('year', 2024))
+        month = int(fields.get('month', 12))
+        
+        from_currency = rates.get_currency(from_country, from_indicator)
+        to_currency = rates.get_currency(to_country, to_indicator)
+        
+        if not from_currency or not to_currency:
+            return None, 'Currency not found'
+        
+        from_rate = rates.get_rate(from_currency['id'], year, month)
+        to_rate = rates.get_rate(to_currency['id'], year, month)
+        
+        if not from_rate or not to_rate:
+            return None, f'No rate data for {year}-{month}'
+        
+        from_base, from_direction = rates.get_quote(from_currency['id'])
+        to_base, to_direction = rates.get_quote(to_currency['id'])
+        
+        # Triangulate EUR/SDR quotes through that month's data-derived USD value
+        from_to_usd = usd_value(from_base, from_direction, from_rate, rates.get_base_value(from_base, year, month))
+        to_to_usd = usd_value(to_base, to_direction, to_rate, rates.get_base_value(to_base, year, month))
+        
+        direct_rate = from_to_usd / to_to_usd if to_to_usd != 0 else 0
+        converted_amount = amount * direct_rate
+        
+        from_currency_name = currency_name(from_country)
+        to_currency_name = currency_name(to_country)
+        
+        return {
+            'original_amount': amount,
+            'converted_amount': converted_amount,
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+            'from_rate': from_rate,
+            'to_rate': to_rate,
+            'from_to_usd': from_to_usd,
+            'to_to_usd': to_to_usd,
+            'exchange_rate': direct_rate,
+            'exchange_rate_formula': f"{amount} {from_currency_name} = {converted_amount:.6f} {to_currency_name}",
+            'year': year,
+            'month': month
+        }, None
 
     async def handle_conversion(self, data):
         try:
-            amount = float(data.get('amount', 100))
-            from_country = data.get('from_country', 'Vietnam')
-            from_indicator = data.get('from_indicator', 'Domestic currency per US Dollar')
-            to_country = data.get('to_country', 'Vietnam')
-            to_indicator = data.get('to_indicator', 'US Dollar per domestic currency')
-            year = data.get('year', 2024)
-            month = data.get('month', 12)
-            
-            from_currency = await self.get_currency_by_indicator(from_country, from_indicator)
-            to_currency = await self.get_currency_by_indicator(to_country, to_indicator)
+            rates = await self.get_rate_snapshot()
+            result, error = self._conversion_data(rates, data)
             
-            if not from_currency or not to_currency:
-                await self.send(text_data=json.dumps({
+            if error:
+                await self.send_message({
                     'type': 'error',
-                    'message': 'Currency not found'
-                }))
+                    'message': error
+                })
                 return
             
-            from_rate = await self.get_rate_at_date(from_currency['id'], year, month)
-            to_rate = await self.get_rate_at_date(to_currency['id'], year, month)
+            await self.send_message({
+                'type': 'conversion_result',
+                'data': result
+            })
             
-            if not from_rate or not to_rate:
-                await self.send(text_data=json.dumps({
+        except Exception as e:
+            await self.send_message({
+                'type': 'error',
+                'message': f'Conversion error: {str(e)}'
+            })
+
+    async def handle_batch_conversion(self, data):
+        try:
+            items = data.get('items')
+            if not isinstance(items, list):
+                await self.send_message({
                     'type': 'error',
-                    'message': f'No rate data for {year}-{month}'
-                }))
+                    'message': 'items must be a list'
+                })
                 return
             
-            if "Domestic currency per US Dollar" in from_indicator:
-                from_to_usd = 1 / from_rate
-            elif "US Dollar per domestic currency" in from_indicator:
-                from_to_usd = from_rate
-            elif "Domestic currency per Euro" in from_indicator:
-                eur_to_usd = 1.1
-                from_to_usd = (1 / from_rate) * eur_to_usd
-            elif "Euros per domestic currency" in from_indicator:
-                eur_to_usd = 1.1
-                from_to_usd = from_rate * eur_to_usd
-            elif "Domestic currency per SDR" in from_indicator:
-                sdr_to_usd = 1.35
-                from_to_usd = (1 / from_rate) * sdr_to_usd
-            elif "SDR per domestic currency" in from_indicator:
-                sdr_to_usd = 1.35
-                from_to_usd = from_rate * sdr_to_usd
-            else:
-                from_to_usd = 1 / from_rate
-            
-            if "Domestic currency per US Dollar" in to_indicator:
-                to_to_usd = 1 / to_rate
-            elif "US Dollar per domestic currency" in to_indicator:
-                to_to_usd = to_rate
-            elif "Domestic currency per Euro" in to_indicator:
-                eur_to_usd = 1.1
-                to_to_usd = (1 / to_rate) * eur_to_usd
-            elif "Euros per domestic currency" in to_indicator:
-                eur_to_usd = 1.1
-                to_to_usd = to_rate * eur_to_usd
-            elif "Domestic currency per SDR" in to_indicator:
-                sdr_to_usd = 1.35
-                to_to_usd = (1 / to_rate) * sdr_to_usd
-            elif "SDR per domestic currency" in to_indicator:
-                sdr_to_usd = 1.35
-                to_to_usd = to_rate * sdr_to_usd
-            else:
-                to_to_usd = 1 / to_rate
-            
-            direct_rate = from_to_usd / to_to_usd if to_to_usd != 0 else 0
-            converted_amount = amount * direct_rate
+            if len(items) > MAX_BATCH_SIZE:
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Batch too large: {len(items)} items (max {MAX_BATCH_SIZE})'
+                })
+                return
             
-            from_currency_name = from_country.split(',')[0].split('(')[0].strip() + " currency"
-            to_currency_name = to_country.split(',')[0].split('(')[0].strip() + " currency"
+            rates = await self.get_rate_snapshot()
+            results = convert_batch(rates, items, defaults=data)
             
-            await self.send(text_data=json.dumps({
-                'type': 'conversion_result',
+            await self.send_message({
+                'type': 'conversion_batch_result',
                 'data': {
-                    'original_amount': amount,
-                    'converted_amount': converted_amount,
-                    'from_currency': from_currency,
-                    'to_currency': to_currency,
-                    'from_rate': from_rate,
-                    'to_rate': to_rate,
-                    'from_to_usd': from_to_usd,
-                    'to_to_usd': to_to_usd,
-                    'exchange_rate': direct_rate,
-                    'exchange_rate_formula': f"{amount} {from_currency_name} = {converted_amount:.6f} {to_currency_name}",
-                    'year': year,
-                    'month': month
+                    'results': results,
+                    'count': len(results),
+                    'errors': sum(1 for result in results if result['status'] == 'error')
                 }
-            }))
+            })
             
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
-                'message': f'Conversion error: {str(e)}'
-            }))
+                'message': f'Batch conversion error: {str(e)}'
+            })
+
+    async def get_encoded_payload(self, key, build):
+        """Return a reply encoded once per data version and codec; build is awaited only on a miss"""
+        key = f'{self.codec.name}:{key}'
+        # Read before building, so a write landing mid-build leaves the entry already stale
+        # (a shared-cache round trip, so it runs off the event loop)
+        version = await db_read(get_data_version)()
+        encoded = encoded_payloads.get(key, version)
+        if encoded is None:
+            encoded = self.codec.encode(await build())
+            encoded_payloads.set(key, version, encoded)
+        return encoded
 
     async def send_currencies(self, data):
         country = data.get('country', 'Vietnam')
-        currencies = await self.get_currencies_by_country(country)
-        
-        await self.send(text_data=json.dumps({
-            'type': 'currencies_list',
-            'data': {
-                'country': country,
-                'currencies': currencies,
-                'count': len(currencies),
-                'index_info': 'Using composite index: idx_country_indicator'  # INDEX reference
+        
+        async def build():
+            currencies = await self.get_currencies_by_country(country)
+            return {
+                'type': 'currencies_list',
+                'data': {
+                    'country': country,
+                    'currencies': currencies,
+                    'count': len(currencies),
+                    'index_info': 'Using composite index: idx_country_indicator'  # INDEX reference
+                }
             }
-        }))
+        
+        await self.send_encoded(await self.get_encoded_payload(f'currencies_list:{country}', build))
 
     async def get_countries_list(self):
-        countries = await self.get_all_countries()
-        
-        await self.send(text_data=json.dumps({
-            'type': 'countries_list',
-            'data': {
-                'countries': countries,
-                'count': len(countries),
-                'index_info': 'Using single-column index on COUNTRY field'  # INDEX reference
+        async def build():
+            countries = await self.get_all_countries()
+            return {
+                'type': 'countries_list',
+                'data': {
+                    'countries': countries,
+                    'count': len(countries),
+                    'index_info': 'Using single-column index on COUNTRY field'  # INDEX reference
+                }
             }
-        }))
+        
+        await self.send_encoded(await self.get_encoded_payload('countries_list', build))
 
 
-    @sync_to_async
+    @single_flight(message_key('rates_above_average', 'countries', 'country', 'year', 'year_from', 'year_to'))
+    @db_read
     def _demo_subquery_logic(self, data):
-        """SUBQUERY: Find rates above average for each currency"""
-        Currency, MonthlyRate, _ = self._get_models()
-        
-        country = data.get('country', 'Vietnam')
-        year = data.get('year', 2024)
+        """WINDOW FUNCTION: Find rates above their currency's yearly average"""
+        _, MonthlyRate, _ = self._get_models()
+        countries, year_from, year_to = self._above_average_range(data)
         
-        currencies = Currency.objects.filter(COUNTRY__iexact=country)
+        # WINDOW FUNCTION: AVG(rate) OVER (PARTITION BY currency, year) in a single query
+        rates = MonthlyRate.objects.rates_above_average(countries, year_from, year_to)
         
         results = []
-        for currency in currencies:
-            # SUBQUERY: Creating a subquery to calculate average rate
-            avg_subquery = MonthlyRate.objects.filter(
-                currency_id=OuterRef('currency_id'),
-                year=year
-            ).values('currency_id').annotate(
-                avg_rate=Avg('rate')
-            ).values('avg_rate')
-            
-            # QUERY WITH SUBQUERY: Using Subquery in filter condition
-            above_avg_rates = MonthlyRate.objects.filter(
-                currency=currency,
-                year=year,
-                rate__gt=Subquery(avg_subquery)  # SUBQUERY usage
-            ).order_by('month')
-            
-            if above_avg_rates.exists():
-                # STORED FUNCTION: Using the stored function equivalent
-                avg_rate = MonthlyRate.calculate_average_rate(currency.id, year)
-                
-                for rate in above_avg_rates:
-                    results.append({
-                        'country': currency.COUNTRY,
-                        'indicator': currency.INDICATOR,
-                        'year': rate.year,
-                        'month': rate.month,
-                        'rate': rate.rate,
-                        'average_rate': avg_rate,
-                        'difference': rate.rate - avg_rate,
-                        'difference_percent': ((rate.rate - avg_rate) / avg_rate * 100) if avg_rate != 0 else 0
-                    })
+        for rate in rates:
+            avg_rate = rate['average_rate']
+            results.append({
+                'country': rate['currency__COUNTRY'],
+                'indicator': rate['currency__INDICATOR'],
+                'year': rate['year'],
+                'month': rate['month'],
+                'rate': rate['rate'],
+                'average_rate': avg_rate,
+                'difference': rate['rate'] - avg_rate,
+                'difference_percent': ((rate['rate'] - avg_rate) / avg_rate * 100) if avg_rate != 0 else 0
+            })
         
         return results
 
-    @sync_to_async
+    @single_flight(message_key('average_rate', 'currency_id', 'year'))
+    @db_read
     def _demo_stored_function_logic(self, data):
         """STORED FUNCTION: Calculate average rate using Django aggregation"""
         _, MonthlyRate, _ = self._get_models()
@@ -294,31 +439,39 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
         if not currency_id:
             return {'error': 'currency_id is required'}
         
-        # STORED FUNCTION: Calling the stored function equivalent
-        avg_rate = MonthlyRate.calculate_average_rate(currency_id, year)
+        # STORED FUNCTION: Calling the stored function equivalent, through the shared cache
+        avg_rate = get_or_build(
+            make_key('average_rate', currency_id, year),
+            lambda: MonthlyRate.calculate_average_rate(currency_id, year),
+            settings.SUMMARY_CACHE_TIMEOUT
+        )
         
         return {
             'currency_id': currency_id,
             'year': year,
             'average_rate': avg_rate,
-            'calculation_method': 'Django aggregation with Avg()'
+            'calculation_method': 'Indexed lookup on the maintained YearlyRateAggregate table'
         }
 
-    @sync_to_async
+    @single_flight(message_key('rate_summary', 'country', 'year'))
+    @db_read
     def _demo_view_logic(self, data):
         """VIEW: Exchange rate summary using annotated queryset"""
         Currency, MonthlyRate, _ = self._get_models()
-        
         country = data.get('country', 'Vietnam')
         year = data.get('year', 2024)
         
         # VIEW: Using the view-like structure from custom manager
         summary = MonthlyRate.objects.get_summary_view().filter(
-            currency__COUNTRY__iexact=country,
+            country_key=normalize_key(country),
             year=year
         )[:15]
         
-        return list(summary)
+        return get_or_build(
+            make_key('rate_summary', normalize_key(country), year),
+            lambda: list(summary),
+            settings.SUMMARY_CACHE_TIMEOUT
+        )
 
     @sync_to_async
     def _demo_stored_procedure_logic(self, data):
@@ -349,6 +502,13 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
             return {'error': f'Procedure failed: {str(e)}', 'status': 'error'}
 
     @sync_to_async
+    def _bulk_update_rates_logic(self, rows):
+        """STORED PROCEDURE: Validate, upsert and audit a batch of rates"""
+        _, MonthlyRate, _ = self._get_models()
+        return MonthlyRate.procedures.bulk_update_rates(rows)
+
+    @single_flight(message_key('audit_logs', 'country', 'limit'))
+    @db_read
     def _demo_trigger_logic(self, data):
         """TRIGGER: Get audit logs created by signal triggers"""
         Currency, MonthlyRate, CurrencyRateAudit = self._get_models()
@@ -356,10 +516,10 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
         country = data.get('country', 'Vietnam')
         limit = data.get('limit', 10)
         
-        # INDEX: Using idx_audit_currency_date index
+        # INDEX: Using idx_audit_country_key_date index
         queryset = CurrencyRateAudit.objects.all()
         if country:
-            queryset = queryset.filter(currency_country__iexact=country)
+            queryset = CurrencyRateAudit.objects.by_country(country)
         
         logs = queryset.order_by('-updated_at')[:limit]
         
@@ -378,7 +538,8 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
         
         return log_list
 
-    @sync_to_async
+    # Not coalesced: every caller gets the timings of its own run
+    @db_read
     def _demo_index_performance(self, data):
         """INDEX: Demonstrate performance with and without indexes"""
         Currency, MonthlyRate, _ = self._get_models()
@@ -408,13 +569,90 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
         
         return stats
 
-    @sync_to_async
+    @single_flight(message_key(
+        'rate_history', 'currency_id', 'country', 'indicator', 'to_currency_id', 'to_country', 'to_indicator',
+        'year_from', 'year_to', 'max_points', 'downsample'
+    ))
+    @db_read
+    def _rate_history_logic(self, rates, data):
+        """INDEX: A currency's or pair's monthly series over a year range as columnar arrays"""
+        import numpy as np
+        _, MonthlyRate, _ = self._get_models()
+        
+        def resolve(prefix):
+            # currency_id, or country + indicator; the to_ prefixed fields select the pair's target
+            currency_id = data.get(f'{prefix}currency_id')
+            if currency_id is not None:
+                return next(
+                    (currency for currency in rates.currencies.values() if currency['id'] == int(currency_id)), None
+                )
+            return rates.get_currency(
+                data.get(f'{prefix}country', 'Vietnam'),
+                data.get(f'{prefix}indicator', 'Domestic currency per US Dollar')
+            )
+        
+        currency = resolve('')
+        is_pair = data.get('to_currency_id') is not None or data.get('to_country') is not None
+        to_currency = resolve('to_') if is_pair else None
+        if not currency or (is_pair and not to_currency):
+            return {'error': 'Currency not found'}
+        
+        year_from = int(data.get('year_from', 2000))
+        year_to = int(data.get('year_to', 2024))
+        max_points = data.get('max_points')
+        method = data.get('downsample', 'lttb')
+        if max_points is not None:
+            max_points = int(max_points)
+            if max_points < MIN_HISTORY_POINTS:
+                return {'error': f'max_points must be at least {MIN_HISTORY_POINTS}'}
+        if method not in DOWNSAMPLERS:
+            return {'error': f"downsample must be one of: {', '.join(DOWNSAMPLERS)}"}
+        
+        currency_ids = [currency['id']] + ([to_currency['id']] if is_pair else [])
+        # INDEX: Single query over idx_currency_date for one or both currencies
+        records = np.array(
+            list(MonthlyRate.objects.history(currency_ids, year_from, year_to)), dtype=np.float64
+        ).reshape(-1, 4)
+        
+        if is_pair:
+            periods, values = pair_series(rates, records, currency['id'], to_currency['id'])
+        else:
+            periods, values = series(records, currency['id'])
+        total_points = len(periods)
+        periods, values, applied = downsample(periods, values, max_points, method)
+        
+        return {
+            'currency': currency,
+            'to_currency': to_currency,
+            'value': 'exchange_rate' if is_pair else 'rate',
+            'year_from': year_from,
+            'year_to': year_to,
+            'total_points': total_points,
+            'points': len(periods),
+            'downsampling': applied,
+            # Columnar: one array per field instead of a list of point objects
+            'years': periods // 12,
+            'months': periods % 12 + 1,
+            'values': values
+        }
+
+    @single_flight(message_key('dashboard', 'year', 'limit'))
+    @db_read
     def _get_dashboard_data(self, data):
+        """CACHE: Dashboard payload built once per (year, limit) and data version"""
+        year = int(data.get('year', 2024))
+        limit = int(data.get('limit', 5))
+        
+        return get_or_build(
+            make_key('dashboard', year, limit),
+            lambda: self._build_dashboard_data(year, limit),
+            settings.DASHBOARD_CACHE_TIMEOUT
+        )
+
+    def _build_dashboard_data(self, year, limit):
         """Combined: Get dashboard data using all advanced features"""
         Currency, MonthlyRate, CurrencyRateAudit = self._get_models()
-        
-        year = data.get('year', 2024)
-        limit = data.get('limit', 5)
+        from .models import TableCounter, YearlyRateAggregate
         
         # VIEW: Using the view-like summary
         summary_query = MonthlyRate.objects.get_summary_view().filter(
@@ -433,15 +671,22 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
             }
             summary.append(item_dict)
         
-        top_currencies = Currency.objects.all()[:5]
+        top_currencies = list(Currency.objects.all()[:5])
+        # STORED FUNCTION: Precomputed yearly aggregates for every listed currency in one query
+        yearly = {
+            aggregate.currency_id: aggregate
+            for aggregate in YearlyRateAggregate.objects.filter(currency__in=top_currencies, year=year)
+        }
         averages = []
         for currency in top_currencies:
-            # STORED FUNCTION: Using stored function to calculate averages
-            avg = MonthlyRate.calculate_average_rate(currency.id, year)
+            aggregate = yearly.get(currency.id)
             averages.append({
                 'country': currency.COUNTRY,
                 'indicator': currency.INDICATOR,
-                'average_rate': float(avg) if avg is not None else 0.0
+                'average_rate': aggregate.average if aggregate else 0.0,
+                'min_rate': aggregate.minimum if aggregate else None,
+                'max_rate': aggregate.maximum if aggregate else None,
+                'stddev': aggregate.stddev if aggregate else 0.0
             })
         
         recent_logs = []
@@ -455,9 +700,11 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
                 'updated_at': log.updated_at.isoformat() if log.updated_at else None
             })
         
-        total_currencies = Currency.objects.count()
-        total_rates = MonthlyRate.objects.count()
-        total_audits = CurrencyRateAudit.objects.count()
+        # Maintained counters instead of three unfiltered COUNT(*) queries
+        counts = TableCounter.objects.totals()
+        total_currencies = counts.get(TableCounter.CURRENCIES, 0)
+        total_rates = counts.get(TableCounter.RATES, 0)
+        total_audits = counts.get(TableCounter.AUDITS, 0)
         
         return {
             'summary': summary,
@@ -472,26 +719,51 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
         }
 
 
+    def _above_average_range(self, data):
+        """Countries and years of a get_rates_above_average message"""
+        countries = data.get('countries') or [data.get('country', 'Vietnam')]
+        if isinstance(countries, str):
+            countries = [countries]
+        year = int(data.get('year', 2024))
+        year_from = int(data.get('year_from', year))
+        year_to = int(data.get('year_to', year_from))
+        return countries, year_from, year_to
+
     async def demo_subquery(self, data):
         """Handle subquery demo request"""
         try:
+            countries, year_from, year_to = self._above_average_range(data)
+            if len(countries) > MAX_ABOVE_AVERAGE_COUNTRIES:
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Too many countries: {len(countries)} (max {MAX_ABOVE_AVERAGE_COUNTRIES})'
+                })
+                return
+            
+            if year_to - year_from + 1 > MAX_ABOVE_AVERAGE_YEARS:
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Year range too long: {year_from}-{year_to} (max {MAX_ABOVE_AVERAGE_YEARS} years)'
+                })
+                return
+            
             results = await self._demo_subquery_logic(data)
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'rates_above_average',
                 'data': {
                     'results': results,
                     'count': len(results),
-                    'demonstration': 'SUBQUERY: Using Subquery() and OuterRef() to find rates above average',
-                    'sql_concept': 'Correlated subquery with aggregation',
-                    'orm_method': 'Subquery(OuterRef()) with rate__gt filter'
+                    'demonstration': 'WINDOW FUNCTION: Using Window(Avg()) to find rates above average',
+                    'sql_concept': 'AVG() OVER (PARTITION BY currency, year) filtered in one query',
+                    'orm_method': 'Window(Avg(), partition_by=...) with rate__gt=F() filter'
                 }
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Subquery demo error: {str(e)}'
-            }))
+            })
 
     async def demo_stored_function(self, data):
         """Handle stored function demo request"""
@@ -499,13 +771,13 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
             result = await self._demo_stored_function_logic(data)
             
             if 'error' in result:
-                await self.send(text_data=json.dumps({
+                await self.send_message({
                     'type': 'error',
                     'message': result['error']
-                }))
+                })
                 return
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'average_rate_result',
                 'data': {
                     **result,
@@ -513,33 +785,33 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
                     'sql_concept': 'User-defined function returning scalar value',
                     'orm_equivalent': 'Model class method with aggregation'
                 }
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Stored function demo error: {str(e)}'
-            }))
+            })
 
     async def demo_view(self, data):
         """Handle view demo request"""
         try:
             summary = await self._demo_view_logic(data)
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'rate_summary',
                 'data': {
                     'summary': summary,
                     'count': len(summary),
-                    'demonstration': 'VIEW: Using custom manager with annotated queryset',
-                    'sql_concept': 'Virtual table from complex query',
-                    'orm_equivalent': 'Manager method returning annotated ValuesQuerySet'
+                    'demonstration': 'VIEW: Using custom manager over the materialized RateSummary table',
+                    'sql_concept': 'Materialized view refreshed incrementally on writes',
+                    'orm_equivalent': 'Denormalized model maintained by post_save signals'
                 }
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'View demo error: {str(e)}'
-            }))
+            })
 
     async def demo_stored_procedure(self, data):
         """Handle stored procedure demo request"""
@@ -547,13 +819,13 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
             result = await self._demo_stored_procedure_logic(data)
             
             if 'error' in result:
-                await self.send(text_data=json.dumps({
+                await self.send_message({
                     'type': 'error',
                     'message': result['error']
-                }))
+                })
                 return
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'rate_update_result',
                 'data': {
                     **result,
@@ -561,19 +833,55 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
                     'sql_concept': 'Parameterized transaction with validation logic',
                     'orm_equivalent': 'Model manager method with update_or_create()'
                 }
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Stored procedure demo error: {str(e)}'
-            }))
+            })
+
+    async def bulk_update_rates(self, data):
+        """Handle bulk rate update request"""
+        try:
+            rows = data.get('rates')
+            if not isinstance(rows, list):
+                await self.send_message({
+                    'type': 'error',
+                    'message': 'rates must be a list'
+                })
+                return
+            
+            if len(rows) > MAX_BULK_UPDATE_ROWS:
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Too many rates: {len(rows)} (max {MAX_BULK_UPDATE_ROWS})'
+                })
+                return
+            
+            results = await self._bulk_update_rates_logic(rows)
+            
+            await self.send_message({
+                'type': 'rates_update_result',
+                'data': {
+                    'results': results,
+                    'count': len(results),
+                    'created': sum(1 for result in results if result.get('action') == 'created'),
+                    'updated': sum(1 for result in results if result.get('action') == 'updated'),
+                    'errors': sum(1 for result in results if result['status'] == 'error')
+                }
+            })
+        except Exception as e:
+            await self.send_message({
+                'type': 'error',
+                'message': f'Bulk update error: {str(e)}'
+            })
 
     async def demo_trigger(self, data):
         """Handle trigger demo request"""
         try:
             logs = await self._demo_trigger_logic(data)
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'audit_logs',
                 'data': {
                     'logs': logs,
@@ -582,39 +890,264 @@ class CurrencyConsumer(AsyncWebsocketConsumer):
                     'sql_concept': 'Automatic action after data modification',
                     'orm_equivalent': 'Signal receivers that create audit records'
                 }
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Trigger demo error: {str(e)}'
-            }))
+            })
 
     async def demo_index_performance(self, data):
         """Handle index performance demo"""
         try:
             stats = await self._demo_index_performance(data)
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'index_performance',
                 'data': stats
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Index demo error: {str(e)}'
-            }))
+            })
 
     async def get_dashboard_data(self, data):
         """Handle dashboard data request"""
         try:
             dashboard_data = await self._get_dashboard_data(data)
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'dashboard_data',
                 'data': dashboard_data
-            }))
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Dashboard data error: {str(e)}'
-            }))
\ No newline at end of file
+            })
+
+    def _resolve_subscription(self, rates, data):
+        """Build a pair or country subscription from a subscribe/unsubscribe message; returns (subscription, error)"""
+        if data.get('pair') is not None:
+            pair = data['pair']
+            if not isinstance(pair, dict):
+                return None, 'pair must be an object'
+            
+            fields = {
+                'amount': float(pair.get('amount', 100)),
+                'from_country': pair.get('from_country', 'Vietnam'),
+                'from_indicator': pair.get('from_indicator', 'Domestic currency per US Dollar'),
+                'to_country': pair.get('to_country', 'Vietnam'),
+                'to_indicator': pair.get('to_indicator', 'US Dollar per domestic currency'),
+                'year': int(pair.get('year', 2024)),
+                'month': int(pair.get('month', 12))
+            }
+            from_currency = rates.get_currency(fields['from_country'], fields['from_indicator'])
+            to_currency = rates.get_currency(fields['to_country'], fields['to_indicator'])
+            if not from_currency or not to_currency:
+                return None, 'Currency not found'
+            
+            return {
+                'id': f"pair:{from_currency['id']}:{to_currency['id']}:{fields['year']}:{fields['month']}",
+                'kind': 'pair',
+                'fields': fields,
+                'currencies': {currency['id']: currency for currency in (from_currency, to_currency)}
+            }, None
+        
+        if data.get('country') is not None:
+            country_key = normalize_key(str(data['country']))
+            currencies = {
+                currency['id']: currency
+                for (currency_country_key, _), currency in rates.currencies.items()
+                if currency_country_key == country_key
+            }
+            if not currencies:
+                return None, 'Country not found'
+            
+            return {
+                'id': f'country:{country_key}',
+                'kind': 'country',
+                'country': data['country'],
+                'currencies': currencies
+            }, None
+        
+        return None, 'pair or country is required'
+
+    async def _join_groups(self, currency_ids):
+        for currency_id in currency_ids:
+            group = currency_group(currency_id)
+            if group not in self.group_refs:
+                await self.channel_layer.group_add(group, self.channel_name)
+            self.group_refs[group] = self.group_refs.get(group, 0) + 1
+
+    async def _leave_groups(self, currency_ids):
+        for currency_id in currency_ids:
+            group = currency_group(currency_id)
+            self.group_refs[group] -= 1
+            if not self.group_refs[group]:
+                del self.group_refs[group]
+                await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def _send_conversion_update(self, rates, subscription):
+        result, error = self._conversion_data(rates, subscription['fields'])
+        await self.send_message({
+            'type': 'conversion_update',
+            'subscription': subscription['id'],
+            'data': result,
+            'error': error
+        })
+
+    async def subscribe(self, data):
+        """Handle subscribe request: join the currency groups of a pair or country"""
+        try:
+            rates = await self.get_rate_snapshot()
+            subscription, error = self._resolve_subscription(rates, data)
+            if error:
+                await self.send_message({
+                    'type': 'error',
+                    'message': error
+                })
+                return
+            
+            # Re-subscribing replaces the previous parameters (e.g. a new amount)
+            previous = self.subscriptions.pop(subscription['id'], None)
+            if previous is not None:
+                await self._leave_groups(previous['currencies'])
+            elif len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Too many subscriptions (max {MAX_SUBSCRIPTIONS})'
+                })
+                return
+            
+            self.subscriptions[subscription['id']] = subscription
+            await self._join_groups(subscription['currencies'])
+            
+            await self.send_message({
+                'type': 'subscribed',
+                'data': {
+                    'subscription': subscription['id'],
+                    'kind': subscription['kind'],
+                    'currencies': list(subscription['currencies'].values()),
+                    'count': len(self.subscriptions)
+                }
+            })
+            
+            # Pair subscribers start from the current conversion instead of sending a convert first
+            if subscription['kind'] == 'pair':
+                await self._send_conversion_update(rates, subscription)
+        except Exception as e:
+            await self.send_message({
+                'type': 'error',
+                'message': f'Subscribe error: {str(e)}'
+            })
+
+    async def unsubscribe(self, data):
+        """Handle unsubscribe request by subscription id, or by the pair/country it was made with"""
+        try:
+            subscription_id = data.get('subscription')
+            if subscription_id is None:
+                rates = await self.get_rate_snapshot()
+                subscription, error = self._resolve_subscription(rates, data)
+                if error:
+                    await self.send_message({
+                        'type': 'error',
+                        'message': error
+                    })
+                    return
+                subscription_id = subscription['id']
+            
+            subscription = self.subscriptions.pop(subscription_id, None)
+            if subscription is None:
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Not subscribed: {subscription_id}'
+                })
+                return
+            
+            await self._leave_groups(subscription['currencies'])
+            await self.send_message({
+                'type': 'unsubscribed',
+                'data': {
+                    'subscription': subscription_id,
+                    'count': len(self.subscriptions)
+                }
+            })
+        except Exception as e:
+            await self.send_message({
+                'type': 'error',
+                'message': f'Unsubscribe error: {str(e)}'
+            })
+
+    async def _refresh_event_cells(self, event):
+        if claim_event(event):
+            await db_read(rate_store.refresh)([
+                (event['currency_id'], change['year'], change['month']) for change in event['changes']
+            ])
+
+    async def rate_changed(self, event):
+        """Channel-layer handler: push one currency's coalesced rate changes to the matching subscriptions"""
+        # In case this event overtook the invalidation bus, its cells are re-read from the database
+        # (never taken from the event); every consumer of this worker waits on the same refresh
+        await flights.do(
+            ('rate_event', event['id'], event['currency_id']), lambda: self._refresh_event_cells(event)
+        )
+        
+        currency_id = event['currency_id']
+        periods = {(change['year'], change['month']) for change in event['changes']}
+        rates = None
+        country_pushed = False
+        
+        for subscription in list(self.subscriptions.values()):
+            if currency_id not in subscription['currencies']:
+                continue
+            
+            if subscription['kind'] == 'pair':
+                fields = subscription['fields']
+                if (fields['year'], fields['month']) not in periods:
+                    continue
+                if rates is None:
+                    rates = await self.get_rate_snapshot()
+                await self._send_conversion_update(rates, subscription)
+            elif not country_pushed:
+                # Encoded once by the broadcaster for every socket in the group
+                await self.send_encoded(event['payloads'][self.codec.name])
+                country_pushed = True
+
+    async def get_broadcast_metrics(self):
+        """Handle broadcast metrics request"""
+        await self.send_message({
+            'type': 'broadcast_metrics',
+            'data': rate_broadcaster.metrics()
+        })
+
+    async def get_rate_history(self, data):
+        """Handle rate history request"""
+        try:
+            rates = await self.get_rate_snapshot()
+            result = await self._rate_history_logic(rates, data)
+            
+            if 'error' in result:
+                await self.send_message({
+                    'type': 'error',
+                    'message': result['error']
+                })
+                return
+            
+            await self.send_message({
+                'type': 'rate_history',
+                'data': result
+            })
+        except Exception as e:
+            await self.send_message({
+                'type': 'error',
+                'message': f'Rate history error: {str(e)}'
+            })
+
+    async def get_single_flight_metrics(self):
+        """Handle single-flight metrics request"""
+        await self.send_message({
+            'type': 'single_flight_metrics',
+            'data': flights.metrics()
+        })
@@ -0,0 +1,172 @@
+import warnings
+
+import numpy as np
+
+from .models import BaseCurrency, QuoteDirection
+
+# Only used for months where no country publishes both a USD and a EUR/SDR quote
+EUR_TO_USD = 1.1
+SDR_TO_USD = 1.35
+
+# Value of one base unit in USD, indexed by BaseCurrency; OTHER quotes are treated as USD
+FALLBACK_BASE_TO_USD = np.zeros(max(BaseCurrency.values) + 1)
+FALLBACK_BASE_TO_USD[BaseCurrency.OTHER] = 1.0
+FALLBACK_BASE_TO_USD[BaseCurrency.USD] = 1.0
+FALLBACK_BASE_TO_USD[BaseCurrency.EUR] = EUR_TO_USD
+FALLBACK_BASE_TO_USD[BaseCurrency.SDR] = SDR_TO_USD
+
+CONVERSION_DEFAULTS = {
+    'amount': 100,
+    'from_country': 'Vietnam',
+    'from_indicator': 'Domestic currency per US Dollar',
+    'to_country': 'Vietnam',
+    'to_indicator': 'US Dollar per domestic currency',
+    'year': 2024,
+    'month': 12,
+}
+
+# Positional layout accepted for list-style convert_batch items
+BATCH_FIELDS = ('amount', 'from_country', 'from_indicator', 'to_country', 'to_indicator', 'year', 'month')
+
+MAX_BATCH_SIZE = 1000
+
+
+def derive_cross_rates(country_keys, base_currencies, quote_directions, rates):
+    """
+    Build the USD value of each base currency for every period of a rate matrix.
+
+    A country quoting both against USD and against EUR (or SDR) in the same month
+    implies EUR/USD = (domestic per EUR) / (domestic per USD). The median across all
+    such countries is used, falling back to the fixed constants for months without any.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        domestic_per_base = np.where(
+            (quote_directions == QuoteDirection.BASE_PER_DOMESTIC)[:, None], 1 / rates, rates
+        )
+
+    usd_rows = {}
+    for row, (country_key, base) in enumerate(zip(country_keys, base_currencies)):
+        if base == BaseCurrency.USD:
+            usd_rows.setdefault(country_key, row)
+
+    cross_rates = np.repeat(FALLBACK_BASE_TO_USD[:, None], rates.shape[1], axis=1)
+    for base in (BaseCurrency.EUR, BaseCurrency.SDR):
+        pairs = [
+            (row, usd_rows[country_key])
+            for row, country_key in enumerate(country_keys)
+            if base_currencies[row] == base and country_key in usd_rows
+        ]
+        if not pairs:
+            continue
+
+        base_rows, quote_rows = np.array(pairs).T
+        with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+            # Months with no overlapping quotes are all-NaN slices; they keep the fallback
+            warnings.simplefilter('ignore', RuntimeWarning)
+            derived = np.nanmedian(domestic_per_base[base_rows] / domestic_per_base[quote_rows], axis=0)
+
+        usable = np.isfinite(derived) & (derived > 0)
+        cross_rates[base, usable] = derived[usable]
+
+    return cross_rates
+
+
+def usd_value(base_currency, quote_direction, rate, base_to_usd):
+    """Value of one unit of domestic currency in USD"""
+    if quote_direction == QuoteDirection.BASE_PER_DOMESTIC:
+        return rate * base_to_usd
+    return (1 / rate) * base_to_usd
+
+
+def usd_values(base_currencies, quote_directions, rates, base_to_usd):
+    """Vectorized usd_value over arrays of quote types, rates and base values"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        legs = np.where(quote_directions == QuoteDirection.BASE_PER_DOMESTIC, rates, 1 / rates)
+    return legs * base_to_usd
+
+
+def currency_name(country):
+    return country.split(',')[0].split('(')[0].strip() + " currency"
+
+
+def convert_batch(rates, items, defaults):
+    """Convert many items against one rate snapshot; per-item failures are reported in place"""
+    results = [None] * len(items)
+    pending = []
+
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, (list, tuple)):
+                item = dict(zip(BATCH_FIELDS, item))
+            fields = {
+                field: item.get(field, defaults.get(field, CONVERSION_DEFAULTS[field]))
+                for field in BATCH_FIELDS
+            }
+            fields['amount'] = float(fields['amount'])
+            fields['year'] = int(fields['year'])
+            fields['month'] = int(fields['month'])
+        except (AttributeError, TypeError, ValueError):
+            results[index] = {'index': index, 'status': 'error', 'message': 'Invalid item'}
+            continue
+
+        from_currency = rates.get_currency(fields['from_country'], fields['from_indicator'])
+        to_currency = rates.get_currency(fields['to_country'], fields['to_indicator'])
+        if not from_currency or not to_currency:
+            results[index] = {'index': index, 'status': 'error', 'message': 'Currency not found'}
+            continue
+
+        pending.append((index, fields, from_currency, to_currency))
+
+    if not pending:
+        return results
+
+    amounts = np.array([fields['amount'] for _, fields, _, _ in pending])
+    years = np.array([fields['year'] for _, fields, _, _ in pending])
+    months = np.array([fields['month'] for _, fields, _, _ in pending])
+
+    from_ids = [from_currency['id'] for _, _, from_currency, _ in pending]
+    to_ids = [to_currency['id'] for _, _, _, to_currency in pending]
+
+    from_rates = rates.get_rates(from_ids, years, months)
+    to_rates = rates.get_rates(to_ids, years, months)
+
+    from_bases, from_directions = rates.get_quotes(from_ids)
+    to_bases, to_directions = rates.get_quotes(to_ids)
+
+    from_to_usd = usd_values(
+        from_bases, from_directions, from_rates, rates.get_base_values(from_bases, years, months)
+    )
+    to_to_usd = usd_values(
+        to_bases, to_directions, to_rates, rates.get_base_values(to_bases, years, months)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exchange_rates = from_to_usd / to_to_usd
+    converted_amounts = amounts * exchange_rates
+
+    # Missing and zero rates are both treated as "no data", as in single conversions
+    missing = np.isnan(from_rates) | np.isnan(to_rates) | (from_rates == 0) | (to_rates == 0)
+
+    for position, (index, fields, from_currency, to_currency) in enumerate(pending):
+        if missing[position]:
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'message': f"No rate data for {fields['year']}-{fields['month']}"
+            }
+            continue
+
+        results[index] = {
+            'index': index,
+            'status': 'ok',
+            'original_amount': fields['amount'],
+            'converted_amount': float(converted_amounts[position]),
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+            'from_rate': float(from_rates[position]),
+            'to_rate': float(to_rates[position]),
+            'exchange_rate': float(exchange_rates[position]),
+            'year': fields['year'],
+            'month': fields['month']
+        }
+
+    return results
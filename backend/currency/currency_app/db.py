@@ -0,0 +1,48 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+_lock = threading.Lock()
+_executor = None
+_executor_size = None
+
+
+def read_executor():
+    """
+    Thread pool running the consumer's ORM reads, sized by settings.DB_READ_THREADS.
+
+    Each thread keeps its own database connection, so the pool size is also the number of
+    connections reads may hold per worker. Resized pools replace the old one on next use.
+    """
+    global _executor, _executor_size
+    size = settings.DB_READ_THREADS
+    with _lock:
+        if _executor_size != size:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='currency-db-read')
+            _executor_size = size
+        return _executor
+
+
+def db_read(func):
+    """
+    Run a read-only ORM helper off the event loop on the read pool.
+
+    Unlike @sync_to_async, which is thread-sensitive and funnels every socket's queries
+    through one thread, reads from different sockets run in parallel. Old connections are
+    closed around each call as in database_sync_to_async. DB_READ_THREADS = 0 restores the
+    thread-sensitive behaviour.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not settings.DB_READ_THREADS:
+            return await sync_to_async(func)(*args, **kwargs)
+        return await database_sync_to_async(
+            func, thread_sensitive=False, executor=read_executor()
+        )(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,148 @@
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - the msgpack subprotocol is simply not offered
+    msgpack = None
+
+
+def _plain(obj):
+    """NumPy values as the builtin types the encoders understand"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+    # NumPy scalars come straight from the rate matrix; non-str keys match json.dumps
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_plain, option=_ORJSON_OPTIONS).decode()
+
+    def loads(text):
+        return orjson.loads(text)
+else:
+    JSON_BACKEND = 'json'
+
+    def dumps(obj):
+        return json.dumps(obj, default=_plain)
+
+    def loads(text):
+        return json.loads(text)
+
+
+class JSONCodec:
+    """Default wire format: one JSON text frame per message"""
+
+    name = 'json'
+    # No subprotocol is echoed back, so clients that never asked for one keep working
+    subprotocol = None
+
+    def encode(self, obj):
+        return dumps(obj)
+
+    def decode(self, data):
+        return loads(data)
+
+    def with_field(self, encoded, key, value):
+        """Prepend one key to an encoded object without decoding it"""
+        if encoded == '{}':
+            return dumps({key: value})
+        return f'{{{dumps(key)}:{dumps(value)},{encoded[1:]}'
+
+
+# msgpack extension type carrying a little-endian float64 array (a JS Float64Array)
+FLOAT64_ARRAY_EXT = 1
+
+
+class MessagePackCodec:
+    """
+    Binary wire format for the ``msgpack`` WebSocket subprotocol: one msgpack binary frame per message.
+
+    Float NumPy arrays are packed as extension type FLOAT64_ARRAY_EXT, 8 bytes per value
+    with no per-element headers; every other value uses the standard msgpack types.
+    """
+
+    name = 'msgpack'
+    subprotocol = 'msgpack'
+
+    def _default(self, obj):
+        if isinstance(obj, np.ndarray) and obj.dtype.kind == 'f':
+            return msgpack.ExtType(FLOAT64_ARRAY_EXT, obj.astype('<f8', copy=False).tobytes())
+        return _plain(obj)
+
+    def _ext_hook(self, code, data):
+        if code == FLOAT64_ARRAY_EXT:
+            return np.frombuffer(data, dtype='<f8')
+        return msgpack.ExtType(code, data)
+
+    def encode(self, obj):
+        return msgpack.packb(obj, default=self._default)
+
+    def decode(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, strict_map_key=False)
+
+    def with_field(self, encoded, key, value):
+        """Add one key to an encoded map; a fixmap (up to 15 keys) only needs its header byte bumped"""
+        if 0x80 <= encoded[0] < 0x8f:
+            return bytes([encoded[0] + 1]) + self.encode(key) + self.encode(value) + encoded[1:]
+        return self.encode({**self.decode(encoded), key: value})
+
+
+JSON_CODEC = JSONCodec()
+
+# Subprotocols CurrencyConsumer can negotiate, in server preference order
+CODECS = {}
+if msgpack is not None:
+    CODECS[MessagePackCodec.subprotocol] = MessagePackCodec()
+
+
+def negotiate_codec(subprotocols):
+    """Pick the codec for a connection from the subprotocols its client offered"""
+    for subprotocol in CODECS:
+        if subprotocol in (subprotocols or ()):
+            return CODECS[subprotocol]
+    return JSON_CODEC
+
+
+class EncodedPayloadCache:
+    """Per-worker LRU of already-encoded replies (text or bytes), each valid for one data version"""
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, encoded):
+        with self._lock:
+            self._entries[key] = (version, encoded)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+# One cache per worker process, shared by every consumer in it
+encoded_payloads = EncodedPayloadCache()
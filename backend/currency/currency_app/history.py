@@ -0,0 +1,99 @@
+import numpy as np
+
+from .conversion import usd_values
+
+MIN_HISTORY_POINTS = 3
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: indices of at most max_points samples that keep the visual shape.
+
+    The first and last samples are always kept; every bucket in between contributes the
+    sample forming the largest triangle with the previous pick and the next bucket's mean.
+    """
+    count = len(x)
+    if count <= max_points:
+        return np.arange(count)
+
+    edges = np.linspace(1, count - 1, max_points - 1).astype(np.int64)
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = count - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Mean of the following bucket, or the last sample for the final bucket
+        next_start, next_stop = stop, edges[bucket + 2] if bucket + 2 < len(edges) else count
+        mean_x = x[next_start:next_stop].mean()
+        mean_y = y[next_start:next_stop].mean()
+
+        areas = np.abs(
+            (x[previous] - mean_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        picked[bucket + 1] = previous
+
+    return picked
+
+
+def minmax_indices(x, y, max_points):
+    """
+    Indices of the minimum and maximum of max_points // 2 equal buckets, so no spike is lost.
+
+    An odd max_points also keeps the last sample. Buckets whose minimum and maximum are the
+    same sample contribute it once, so flat series may come back with fewer points.
+    """
+    count = len(x)
+    if count <= max_points:
+        return np.arange(count)
+
+    picked = []
+    for bucket in np.array_split(np.arange(count), max_points // 2):
+        values = y[bucket]
+        picked.extend((bucket[np.argmin(values)], bucket[np.argmax(values)]))
+    if max_points % 2:
+        picked.append(count - 1)
+    return np.unique(picked)
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+def series(records, currency_id):
+    """Split (currency_id, year, month, rate) records into the period and rate arrays of one currency"""
+    rows = records[records[:, 0] == currency_id]
+    return (rows[:, 1] * 12 + rows[:, 2] - 1).astype(np.int64), rows[:, 3]
+
+
+def pair_series(rates, records, from_id, to_id):
+    """Exchange rate from one currency to another for every period both of them have a rate"""
+    from_periods, from_rates = series(records, from_id)
+    to_periods, to_rates = series(records, to_id)
+    periods, from_index, to_index = np.intersect1d(from_periods, to_periods, return_indices=True)
+    from_rates, to_rates = from_rates[from_index], to_rates[to_index]
+
+    years, months = periods // 12, periods % 12 + 1
+    from_bases, from_directions = rates.get_quotes([from_id] * len(periods))
+    to_bases, to_directions = rates.get_quotes([to_id] * len(periods))
+    from_to_usd = usd_values(from_bases, from_directions, from_rates, rates.get_base_values(from_bases, years, months))
+    to_to_usd = usd_values(to_bases, to_directions, to_rates, rates.get_base_values(to_bases, years, months))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = from_to_usd / to_to_usd
+    # Zero rates mean "no data", as in single conversions
+    usable = np.isfinite(values) & (from_rates != 0) & (to_rates != 0)
+    return periods[usable], values[usable]
+
+
+def downsample(periods, values, max_points, method='lttb'):
+    """Reduce a series to at most max_points samples; returns (periods, values, method applied)"""
+    if max_points is None or len(periods) <= max_points:
+        return periods, values, None
+    picked = DOWNSAMPLERS[method](periods.astype(np.float64), values, max_points)
+    return periods[picked], values[picked], method
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .db import db_read
+from .rate_store import rate_store
+
+logger = logging.getLogger(__name__)
+
+# Channel-layer group every worker process listens on for writes made by the others
+INVALIDATION_GROUP = 'rates.invalidation'
+INVALIDATION_EVENT = 'cache.invalidate'
+
+# Tells this worker's own messages apart from the others'
+WORKER_ID = uuid.uuid4().hex
+
+# Seconds before a listener that lost the channel layer subscribes again
+LISTENER_RETRY_DELAY = 1.0
+
+
+def publish_rate_changes(cells, store=rate_store, worker_id=WORKER_ID):
+    """
+    Refresh committed (currency_id, year, month) cells in this worker's rate store, then tell
+    every other worker to refresh the same cells.
+
+    Messages name the cells, not their rates: each worker re-reads them, so the order in
+    which messages of concurrent writers arrive cannot leave it on an older rate.
+    Meant to run from transaction.on_commit, before the changes are pushed to subscribers.
+    """
+    cells = sorted({(int(currency_id), int(year), int(month)) for currency_id, year, month in cells})
+    store.refresh(cells)
+    _send({'type': INVALIDATION_EVENT, 'origin': worker_id, 'cells': cells})
+
+
+def publish_flush(store=rate_store, worker_id=WORKER_ID):
+    """Drop the rate store of every worker, for writes a refresh cannot describe (currencies, seeding)"""
+    store.invalidate()
+    _send({'type': INVALIDATION_EVENT, 'origin': worker_id, 'cells': None})
+
+
+def _send(message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(INVALIDATION_GROUP, message)
+    except Exception:
+        # The write is committed; other workers catch up on their next data version miss
+        logger.exception('Cache invalidation broadcast failed')
+
+
+class InvalidationListener:
+    """
+    Applies the invalidation messages of other workers to one rate store.
+
+    Group membership expires after the layer's group_expiry (a day by default), so run()
+    joins the group again every renew_interval seconds for as long as it listens.
+    """
+
+    def __init__(self, store=rate_store, worker_id=WORKER_ID, channel_layer=None, renew_interval=None):
+        self.store = store
+        self.worker_id = worker_id
+        self.channel_layer = channel_layer
+        self.renew_interval = renew_interval
+        self.channel_name = None
+        self.applied = 0
+
+    async def subscribe(self):
+        if self.channel_layer is None:
+            self.channel_layer = get_channel_layer()
+        self.channel_name = await self.channel_layer.new_channel()
+        await self.renew()
+
+    async def renew(self):
+        """Join the group again, restarting its expiry clock"""
+        await self.channel_layer.group_add(INVALIDATION_GROUP, self.channel_name)
+
+    async def receive(self):
+        """Wait for one message and apply it"""
+        message = await self.channel_layer.receive(self.channel_name)
+        # The refresh reads the database, so it runs off the event loop
+        await db_read(self.apply)(message)
+
+    def apply(self, message):
+        if message.get('origin') == self.worker_id:
+            return
+        cells = message.get('cells')
+        if cells is None:
+            self.store.invalidate()
+        else:
+            self.store.refresh(cells)
+        self.applied += 1
+
+    async def _renew_forever(self):
+        interval = self.renew_interval or getattr(self.channel_layer, 'group_expiry', 86400) / 2
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.renew()
+            except Exception:
+                # Tried again next interval, well before the membership runs out
+                logger.exception('Cache invalidation group renewal failed')
+
+    async def run(self):
+        while True:
+            renewer = None
+            try:
+                await self.subscribe()
+                renewer = asyncio.ensure_future(self._renew_forever())
+                while True:
+                    await self.receive()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Cache invalidation listener failed; resubscribing')
+                # Messages missed meanwhile cannot be refreshed in, so start over from the database
+                self.store.invalidate()
+                await asyncio.sleep(LISTENER_RETRY_DELAY)
+            finally:
+                if renewer is not None:
+                    renewer.cancel()
+
+
+# One listener task per event loop of this worker, started at ASGI lifespan startup or with its first connection
+_listeners = {}
+
+
+def ensure_listener():
+    """Start this worker's invalidation listener on the running event loop if it has none yet"""
+    if get_channel_layer() is None:
+        return
+    loop = asyncio.get_running_loop()
+    task = _listeners.get(loop)
+    if task is None or task.done():
+        _listeners[loop] = loop.create_task(InvalidationListener().run())
+
+
+class InvalidationListenerMiddleware:
+    """
+    ASGI wrapper that starts the invalidation listener when the worker starts.
+
+    Servers sending the lifespan protocol (uvicorn, hypercorn) start it at startup; under
+    servers without it (daphne) it starts with the first HTTP request or socket instead.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        ensure_listener()
+        if scope['type'] != 'lifespan':
+            return await self.application(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
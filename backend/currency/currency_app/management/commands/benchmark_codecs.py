@@ -0,0 +1,120 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from currency_app.consumers import CurrencyConsumer
+from currency_app.encoding import CODECS, JSON_BACKEND, JSON_CODEC
+
+
+class CapturingConsumer(CurrencyConsumer):
+    """CurrencyConsumer that keeps its replies instead of writing them to a socket"""
+
+    def __init__(self):
+        super().__init__()
+        self.codec = JSON_CODEC
+        self.subscriptions = {}
+        self.group_refs = {}
+        self.replies = []
+
+    async def send_message(self, payload):
+        self.replies.append(payload)
+
+    async def send_encoded(self, data):
+        self.replies.append(self.codec.decode(data))
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and encode/decode time of every wire format for each response type'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--country',
+            default='Vietnam',
+            help='Country used by the per-country requests (default: Vietnam)'
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=2024,
+            help='Year used by the per-year requests (default: 2024)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Encode/decode rounds averaged per response and codec (default: 200)'
+        )
+
+    def handle(self, *args, **kwargs):
+        country = kwargs['country']
+        year = kwargs['year']
+        repeat = kwargs['repeat']
+        codecs = [JSON_CODEC, *CODECS.values()]
+
+        self.stdout.write("="*60)
+        self.stdout.write(f"WIRE FORMAT BENCHMARK (JSON backend: {JSON_BACKEND})")
+        self.stdout.write("="*60)
+        if not CODECS:
+            self.stdout.write(self.style.WARNING("msgpack is not installed; only JSON is measured"))
+
+        self.stdout.write(f"\n{'response':<26}{'codec':<9}{'bytes':>10}{'encode µs':>12}{'decode µs':>12}")
+        for payload in self._payloads(country, year):
+            for codec in codecs:
+                encoded = codec.encode(payload)
+                size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+                encode_seconds = self._time(lambda: codec.encode(payload), repeat)
+                decode_seconds = self._time(lambda: codec.decode(encoded), repeat)
+                self.stdout.write(
+                    f"{payload['type']:<26}{codec.name:<9}{size:>10}"
+                    f"{encode_seconds * 1e6:>12.1f}{decode_seconds * 1e6:>12.1f}"
+                )
+
+    def _payloads(self, country, year):
+        """Real replies of the consumer for one request of each response type"""
+        consumer = CapturingConsumer()
+        requests = [
+            {'type': 'get_countries'},
+            {'type': 'get_currencies', 'country': country},
+            {'type': 'get_rates_above_average', 'country': country, 'year_from': year - 4, 'year_to': year},
+            {'type': 'get_rate_summary', 'country': country, 'year': year},
+            {'type': 'get_audit_logs', 'country': '', 'limit': 500},
+            {'type': 'get_dashboard_data', 'year': year},
+            {'type': 'get_rate_history', 'country': country, 'year_from': year - 24, 'year_to': year},
+        ]
+
+        currencies = []
+        for request in requests:
+            reply = self._request(consumer, request)
+            if reply is None:
+                continue
+            if reply['type'] == 'currencies_list':
+                currencies = reply['data']['currencies']
+            yield reply
+
+        # A batch converting every currency of the country into every other one, for each month
+        items = [
+            {
+                'from_country': source['COUNTRY'], 'from_indicator': source['INDICATOR'],
+                'to_country': target['COUNTRY'], 'to_indicator': target['INDICATOR'],
+                'year': year, 'month': month
+            }
+            for source in currencies for target in currencies for month in range(1, 13)
+        ][:1000]
+        reply = self._request(consumer, {'type': 'convert_batch', 'items': items})
+        if reply is not None:
+            yield reply
+
+    def _request(self, consumer, request):
+        async_to_sync(consumer.handle_message)(request)
+        reply = consumer.replies.pop()
+        if reply['type'] == 'error':
+            self.stderr.write(f"   ✗ {request['type']}: {reply['message']}")
+            return None
+        return reply
+
+    def _time(self, run, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - started) / repeat
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from currency_app.cache import bump_data_version
+from currency_app.consumers import CurrencyConsumer
+from currency_app.encoding import dumps
+from currency_app.models import MonthlyRate
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = 'Measure how CurrencyConsumer read throughput scales with simultaneous sockets and read threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sockets',
+            type=int_list,
+            default=[1, 10, 50, 100],
+            help='Comma-separated numbers of simultaneous sockets (default: 1,10,50,100)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int_list,
+            help='Comma-separated DB_READ_THREADS values to compare; 0 is the thread-sensitive path '
+                 '(default: 0 and the configured value)'
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=20,
+            help='Messages each socket sends, one at a time (default: 20)'
+        )
+
+    def handle(self, *args, **kwargs):
+        thread_counts = kwargs['threads'] or sorted({0, settings.DB_READ_THREADS})
+        # Every stored (country, currency, year), so each message can ask for rows no other one did
+        cells = list(
+            MonthlyRate.objects.order_by('year', 'currency_id')
+            .values_list('currency__COUNTRY', 'currency_id', 'year').distinct()
+        )
+        if not cells:
+            raise CommandError('No rates to read; seed the database first')
+
+        self.stdout.write("="*60)
+        self.stdout.write("CONSUMER CONCURRENCY BENCHMARK")
+        self.stdout.write("="*60)
+        self.stdout.write(f"\n{'threads':>8}{'sockets':>9}{'messages':>10}{'seconds':>10}{'msgs/sec':>11}{'p95 ms':>9}")
+
+        # No Redis needed: the benchmark never leaves this process
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            for threads in thread_counts:
+                with override_settings(DB_READ_THREADS=threads):
+                    for sockets in kwargs['sockets']:
+                        # Replies cached by the previous run would be read from the cache, not the database
+                        bump_data_version()
+                        seconds, latencies = async_to_sync(self._run)(sockets, kwargs['messages'], cells)
+                        latencies.sort()
+                        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+                        self.stdout.write(
+                            f"{threads:>8}{sockets:>9}{len(latencies):>10}{seconds:>10.2f}"
+                            f"{len(latencies) / seconds:>11.0f}{p95 * 1000:>9.1f}"
+                        )
+
+    def _request(self, number, cells):
+        """
+        The number-th read of a run. Its cache and single-flight key differs from those of the
+        reads before it until the cells run out, so it reaches the database instead of joining
+        another socket's flight or hitting its cached reply.
+        """
+        country, currency_id, year = cells[number % len(cells)]
+        kind = number % 3
+        if kind == 0:
+            return {'type': 'get_rate_summary', 'country': country, 'year': year}
+        if kind == 1:
+            return {'type': 'get_audit_logs', 'country': country, 'limit': 10 + number // 3 % 90}
+        return {'type': 'get_average_rate', 'currency_id': currency_id, 'year': year}
+
+    async def _run(self, sockets, messages, cells):
+        application = CurrencyConsumer.as_asgi()
+        clients = [WebsocketCommunicator(application, '/ws/currency/') for _ in range(sockets)]
+        for client in clients:
+            await client.connect()
+            await client.receive_from()  # connection_established
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(
+            self._drive(client, index, sockets, messages, cells) for index, client in enumerate(clients)
+        ))
+        seconds = time.perf_counter() - started
+
+        for client in clients:
+            await client.disconnect()
+        return seconds, [latency for client_latencies in latencies for latency in client_latencies]
+
+    async def _drive(self, client, socket, sockets, messages, cells):
+        latencies = []
+        for index in range(messages):
+            # Sockets sending their index-th message at the same moment ask for neighbouring cells
+            request = self._request(index * sockets + socket, cells)
+            sent = time.perf_counter()
+            await client.send_to(text_data=dumps({**request, 'request_id': index}))
+            await client.receive_from(timeout=60)
+            latencies.append(time.perf_counter() - sent)
+        return latencies
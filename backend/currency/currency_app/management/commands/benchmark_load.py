@@ -0,0 +1,424 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+
+from currency_app.cache import bump_data_version
+from currency_app.consumers import CurrencyConsumer, current_request_id
+from currency_app.encoding import dumps, loads
+from currency_app.models import BaseCurrency, Currency, MonthlyRate, RateSummary, TableCounter, YearlyRateAggregate
+
+try:
+    # channels.testing needs daphne (pip install "channels[daphne]")
+    from channels.testing import WebsocketCommunicator
+except ImportError:
+    WebsocketCommunicator = None
+
+try:
+    import websockets
+except ImportError:  # only needed to drive a real server with --url
+    websockets = None
+
+MESSAGE_TYPES = ('convert', 'get_currencies', 'get_dashboard_data', 'get_rates_above_average', 'update_rate')
+DEFAULT_MIX = 'convert=50,get_currencies=15,get_dashboard_data=10,get_rates_above_average=15,update_rate=10'
+
+# Synthetic currencies per country: one quoted against USD and one against EUR, as in the IMF data
+INDICATORS = ('Domestic currency per US Dollar', 'Domestic currency per Euro')
+
+
+def message_mix(value):
+    """Parse 'type=weight,...' into {type: weight}"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in MESSAGE_TYPES:
+            raise argparse.ArgumentTypeError(f"unknown message type '{name}' (choose from {', '.join(MESSAGE_TYPES)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('the mix needs at least one positive weight')
+    return mix
+
+
+class QueryCounter:
+    """
+    execute_wrapper counting queries per message type on every connection of the process.
+
+    The benchmark's request ids start with the message type, and the consumer keeps the
+    request id in a context variable that follows its handlers onto the ORM threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        request_id = current_request_id.get()
+        if isinstance(request_id, str):
+            with self._lock:
+                self.counts[request_id.split(':', 1)[0]] += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class CommunicatorClient:
+    """In-process socket through Channels' WebsocketCommunicator"""
+
+    def __init__(self, application):
+        self.communicator = WebsocketCommunicator(application, '/ws/currency/')
+
+    async def connect(self):
+        await self.communicator.connect()
+        await self.communicator.receive_from()  # connection_established
+
+    async def send(self, text):
+        await self.communicator.send_to(text_data=text)
+
+    async def receive(self):
+        return await self.communicator.receive_from(timeout=60)
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class ServerClient:
+    """Socket to a running server, for measuring the real ASGI stack"""
+
+    def __init__(self, url):
+        self.url = url
+        self.socket = None
+
+    async def connect(self):
+        self.socket = await websockets.connect(self.url, max_size=None)
+        await self.socket.recv()  # connection_established
+
+    async def send(self, text):
+        await self.socket.send(text)
+
+    async def receive(self):
+        return await asyncio.wait_for(self.socket.recv(), 60)
+
+    async def close(self):
+        await self.socket.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic SQLite dataset and measure throughput, latency percentiles and DB queries '
+        'per message type under a mix of concurrent CurrencyConsumer clients'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--countries',
+            type=int,
+            default=50,
+            help='Synthetic countries to seed, two currencies each (default: 50)'
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=10,
+            help='Years of monthly rates per currency, ending with --year (default: 10)'
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=2024,
+            help='Last seeded year (default: 2024)'
+        )
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Reuse the dataset of the previous run instead of seeding a new one'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=20,
+            help='Concurrent sockets (default: 20)'
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=50,
+            help='Messages each client sends, one at a time (default: 50)'
+        )
+        parser.add_argument(
+            '--mix',
+            type=message_mix,
+            default=message_mix(DEFAULT_MIX),
+            help=f'Relative weight of each message type (default: {DEFAULT_MIX})'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the dataset and the message sequence (default: 0)'
+        )
+        parser.add_argument(
+            '--url',
+            help='Drive a running server instead, e.g. ws://127.0.0.1:8000/ws/currency/; start it with '
+                 'DJANGO_SETTINGS_MODULE=currency.settings_benchmark so it serves the seeded database. '
+                 'DB queries are not counted then.'
+        )
+        parser.add_argument(
+            '--output',
+            default=os.path.join(tempfile.gettempdir(), 'currency_benchmark_results.json'),
+            help='Where the machine-readable results are written (default: in the temp directory)'
+        )
+
+    def handle(self, *args, **kwargs):
+        if not getattr(settings, 'BENCHMARK_LOAD', False) or connection.vendor != 'sqlite':
+            raise CommandError(
+                'benchmark_load replaces its SQLite database; run it with --settings=currency.settings_benchmark'
+            )
+        if kwargs['url'] and websockets is None:
+            raise CommandError('--url needs the websockets package')
+        if not kwargs['url'] and WebsocketCommunicator is None:
+            raise CommandError('channels.testing needs daphne: pip install "channels[daphne]"')
+
+        self.stdout.write("="*60)
+        self.stdout.write("WEBSOCKET LOAD BENCHMARK")
+        self.stdout.write("="*60)
+
+        if not kwargs['no_seed']:
+            self.stdout.write(f"\nSeeding {kwargs['countries']} countries x {kwargs['years']} years into "
+                              f"{settings.DATABASES['default']['NAME']}...")
+            started = time.perf_counter()
+            self._seed(kwargs['countries'], kwargs['year'] - kwargs['years'] + 1, kwargs['year'], kwargs['seed'])
+            self.stdout.write(f"   Seeded in {time.perf_counter() - started:.1f}s")
+
+        dataset = self._dataset()
+        if not dataset['currencies']:
+            raise CommandError('The benchmark database is empty; run without --no-seed')
+
+        counter = QueryCounter()
+        if not kwargs['url']:
+            for existing in connections.all():
+                counter.install(existing)
+            connection_created.connect(counter.install)
+
+        self.stdout.write(f"\nDriving {kwargs['clients']} clients x {kwargs['messages']} messages "
+                          f"({'server ' + kwargs['url'] if kwargs['url'] else 'WebsocketCommunicator'})...")
+        try:
+            seconds, samples = async_to_sync(self._run)(dataset, kwargs)
+        finally:
+            connection_created.disconnect(counter.install)
+
+        results = self._results(seconds, samples, None if kwargs['url'] else counter.counts)
+        self._report(results)
+
+        document = {
+            'commit': self._commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'transport': 'server' if kwargs['url'] else 'communicator',
+            'dataset': {
+                'countries': len(dataset['countries']),
+                'currencies': len(dataset['currencies']),
+                'rates': dataset['rates'],
+                'years': [dataset['year_from'], dataset['year_to']],
+            },
+            'clients': kwargs['clients'],
+            'messages_per_client': kwargs['messages'],
+            'mix': kwargs['mix'],
+            'seed': kwargs['seed'],
+            'db_read_threads': settings.DB_READ_THREADS,
+            'seconds': seconds,
+            'results': results,
+        }
+        with open(kwargs['output'], 'w') as output:
+            json.dump(document, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"\nResults written to {kwargs['output']}"))
+
+    def _seed(self, countries, year_from, year_to, seed):
+        """Replace the benchmark database with a freshly migrated one"""
+        connections.close_all()
+        path = str(settings.DATABASES['default']['NAME'])
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        call_command('migrate', verbosity=0, interactive=False)
+        with connection.cursor() as cursor:
+            # Readers keep going while update_rate writes
+            cursor.execute('PRAGMA journal_mode=WAL')
+        self._populate(countries, year_from, year_to, seed)
+
+    def _populate(self, countries, year_from, year_to, seed):
+        """Fill an empty database with two currencies per country and random-walk monthly rates"""
+        currencies = []
+        for number in range(1, countries + 1):
+            for indicator in INDICATORS:
+                currency = Currency(
+                    COUNTRY=f'Country {number:03d}', INDICATOR=indicator, FREQUENCY='Monthly', SCALE='Units'
+                )
+                currency.sync_derived_fields()
+                currencies.append(currency)
+
+        generator = np.random.default_rng(seed)
+        months = (year_to - year_from + 1) * 12
+        years = np.repeat(np.arange(year_from, year_to + 1), 12)
+        month_numbers = np.tile(np.arange(1, 13), year_to - year_from + 1)
+
+        with transaction.atomic():
+            Currency.objects.bulk_create(currencies, batch_size=1000)
+            # Each country's USD and EUR currencies, paired by key
+            ids = dict(Currency.objects.filter(base_currency=BaseCurrency.USD).values_list('country_key', 'id'))
+            euro_ids = dict(Currency.objects.filter(base_currency=BaseCurrency.EUR).values_list('country_key', 'id'))
+
+            rates = []
+            for country_key, currency_id in ids.items():
+                walk = generator.uniform(0.5, 20000) * np.exp(np.cumsum(generator.normal(0, 0.02, months)))
+                # EUR quotes follow the USD ones at a drifting EUR/USD, so the cross rates are realistic
+                euro = walk * 1.1 * np.exp(np.cumsum(generator.normal(0, 0.005, months)))
+                for target, values in ((currency_id, walk), (euro_ids[country_key], euro)):
+                    rates.extend(
+                        MonthlyRate(currency_id=target, year=int(year), month=int(month), rate=float(rate))
+                        for year, month, rate in zip(years, month_numbers, values)
+                    )
+            MonthlyRate.objects.bulk_create(rates, batch_size=1000)
+
+            # bulk_create skips the signals, so the derived tables are rebuilt in one pass each
+            YearlyRateAggregate.objects.rebuild()
+            RateSummary.objects.rebuild()
+            TableCounter.objects.recount()
+        bump_data_version()
+
+    def _dataset(self):
+        """What the generated messages may refer to"""
+        currencies = list(Currency.objects.order_by('id').values_list('id', 'COUNTRY', 'INDICATOR'))
+        years = MonthlyRate.objects.order_by('year').values_list('year', flat=True)
+        return {
+            'currencies': currencies,
+            'countries': sorted({country for _, country, _ in currencies}),
+            'rates': MonthlyRate.objects.count(),
+            'year_from': years.first(),
+            'year_to': years.last(),
+        }
+
+    def _message(self, rng, message_type, dataset):
+        year = rng.randint(dataset['year_from'], dataset['year_to'])
+        if message_type == 'convert':
+            (_, from_country, from_indicator), (_, to_country, to_indicator) = rng.sample(dataset['currencies'], 2)
+            return {
+                'from_country': from_country, 'from_indicator': from_indicator,
+                'to_country': to_country, 'to_indicator': to_indicator,
+                'year': year, 'month': rng.randint(1, 12), 'amount': rng.randint(1, 10000)
+            }
+        if message_type == 'get_currencies':
+            return {'country': rng.choice(dataset['countries'])}
+        if message_type == 'get_dashboard_data':
+            return {'year': year}
+        if message_type == 'get_rates_above_average':
+            return {'country': rng.choice(dataset['countries']), 'year': year}
+        currency_id, _, _ = rng.choice(dataset['currencies'])
+        return {
+            'currency_id': currency_id, 'year': year, 'month': rng.randint(1, 12),
+            'rate': round(rng.uniform(0.5, 20000), 4)
+        }
+
+    async def _run(self, dataset, options):
+        application = None if options['url'] else CurrencyConsumer.as_asgi()
+        clients = [
+            ServerClient(options['url']) if options['url'] else CommunicatorClient(application)
+            for _ in range(options['clients'])
+        ]
+        for client in clients:
+            await client.connect()
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(
+            self._drive(client, index, dataset, options) for index, client in enumerate(clients)
+        ))
+        seconds = time.perf_counter() - started
+
+        for client in clients:
+            await client.close()
+        return seconds, [sample for client_samples in samples for sample in client_samples]
+
+    async def _drive(self, client, index, dataset, options):
+        """Send this client's share of the mix one message at a time; returns (type, seconds, ok) samples"""
+        rng = random.Random(f"{options['seed']}:{index}")
+        types, weights = zip(*options['mix'].items())
+        samples = []
+        for number in range(options['messages']):
+            message_type = rng.choices(types, weights)[0]
+            request_id = f'{message_type}:{index}:{number}'
+            message = {**self._message(rng, message_type, dataset), 'type': message_type, 'request_id': request_id}
+
+            sent = time.perf_counter()
+            await client.send(dumps(message))
+            # Pushes of other frames are skipped; the reply carries our request id
+            while True:
+                reply = loads(await client.receive())
+                if reply.get('request_id') == request_id:
+                    break
+            samples.append((message_type, time.perf_counter() - sent, reply.get('type') != 'error'))
+        return samples
+
+    def _results(self, seconds, samples, query_counts):
+        """Per message type and overall: throughput, latency percentiles, errors and queries"""
+        groups = defaultdict(list)
+        for message_type, latency, ok in samples:
+            groups[message_type].append((latency, ok))
+            groups['total'].append((latency, ok))
+
+        results = {}
+        for name in [*sorted(name for name in groups if name != 'total'), 'total']:
+            latencies = np.array([latency for latency, _ in groups[name]])
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            queries = None
+            if query_counts is not None:
+                queries = sum(query_counts.values()) if name == 'total' else query_counts.get(name, 0)
+            results[name] = {
+                'messages': len(latencies),
+                'errors': sum(1 for _, ok in groups[name] if not ok),
+                'throughput': len(latencies) / seconds,
+                'mean_ms': float(latencies.mean() * 1000),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'queries': queries,
+                'queries_per_message': queries / len(latencies) if queries is not None else None,
+            }
+        return results
+
+    def _report(self, results):
+        self.stdout.write(
+            f"\n{'message':<26}{'count':>7}{'errors':>8}{'msgs/sec':>10}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries/msg':>13}"
+        )
+        for name, result in results.items():
+            queries = result['queries_per_message']
+            self.stdout.write(
+                f"{name:<26}{result['messages']:>7}{result['errors']:>8}{result['throughput']:>10.0f}"
+                f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{'-' if queries is None else f'{queries:.2f}':>13}"
+            )
+
+    def _commit(self):
+        """Commit of the measured tree, so result files can be compared across commits"""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from currency_app.models import RateSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized RateSummary table from MonthlyRate and Currency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of RateSummary records to create in batch (default: 1000)'
+        )
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rebuilding RateSummary...")
+        RateSummary.objects.rebuild(batch_size=kwargs['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✓ RateSummary rebuilt with {RateSummary.objects.count()} rows"))
@@ -1,13 +1,110 @@
 # currency_app/management/commands/seed_full.py
-import pandas as pd
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
 import numpy as np
+import pandas as pd
 from django.core.management.base import BaseCommand
-from currency_app.models import Currency, MonthlyRate
+from django.db import connection, connections, transaction
+from currency_app.cache import bump_data_version
+from currency_app.invalidation import publish_flush
+from currency_app.models import Currency, MonthlyRate, RateSummary, TableCounter, YearlyRateAggregate
+
+NA_VALUES = ['Units', 'units', 'UNITS', '', 'NaN', 'nan', 'null', 'NULL']
+META_COLUMNS = ['COUNTRY', 'INDICATOR', 'FREQUENCY', 'SCALE']
+# Monthly value columns are named YYYY-MMM, e.g. 2024-M03
+MONTHLY_COLUMN = re.compile(r'^(\d{4})-M(\d{1,2})$')
+CELL_COLUMNS = ['currency_id', 'year', 'month', 'rate']
+
+
+def melt_rates(chunk, monthly_cols, currency_ids):
+    """Turn wide YYYY-MMM columns into long (currency_id, year, month, rate) rows"""
+    rates = chunk[list(monthly_cols)].set_axis(currency_ids).melt(
+        var_name='period', value_name='rate', ignore_index=False
+    )
+    rates['rate'] = pd.to_numeric(rates['rate'], errors='coerce')
+    rates = rates.dropna(subset=['rate'])
+    return pd.DataFrame({
+        'currency_id': rates.index.to_numpy(dtype='int64'),
+        'year': rates['period'].map({col: year for col, (year, _) in monthly_cols.items()}).to_numpy(dtype='int64'),
+        'month': rates['period'].map({col: month for col, (_, month) in monthly_cols.items()}).to_numpy(dtype='int64'),
+        'rate': rates['rate'].to_numpy(dtype='float64')
+    })
+
+
+def monthly_rates(rates):
+    return (
+        MonthlyRate(currency_id=currency_id, year=year, month=month, rate=rate)
+        for currency_id, year, month, rate in zip(
+            rates['currency_id'].tolist(), rates['year'].tolist(),
+            rates['month'].tolist(), rates['rate'].tolist()
+        )
+    )
+
+
+def _init_worker():
+    # No-op under fork; spawned workers start without the app registry
+    import django
+    django.setup()
+
+
+def _load_range(csv_path, start, stop, currency_ids, monthly_cols, chunk_size, batch_size, insert):
+    """
+    Parse CSV rows [start, stop) in a worker process.
+
+    Rows get their currency id from their own (country, indicator) through currency_ids, which
+    the parent resolved from the metadata scan; rows without one are skipped.
+    With insert set, the rates go straight to the database through the worker's own
+    connection and only counts come back; otherwise the parsed rates are returned.
+    """
+    started = time.perf_counter()
+    insert_seconds = 0.0
+    rates_created = 0
+    parsed = []
+
+    try:
+        for chunk in pd.read_csv(
+            csv_path,
+            skiprows=range(1, start + 1),
+            nrows=stop - start,
+            chunksize=chunk_size,
+            na_values=NA_VALUES,
+            dtype={column: str for column in META_COLUMNS},
+            usecols=['COUNTRY', 'INDICATOR', *monthly_cols],
+            # Rows are addressed by line, as in the parent's scan
+            skip_blank_lines=False
+        ):
+            keys = zip(chunk['COUNTRY'].fillna('').str.strip(), chunk['INDICATOR'].fillna('').str.strip())
+            ids = np.fromiter((currency_ids.get(key, -1) for key in keys), dtype=np.int64, count=len(chunk))
+            rates = melt_rates(chunk[ids >= 0], monthly_cols, ids[ids >= 0])
+            if not insert:
+                parsed.append(rates)
+                continue
+
+            inserting = time.perf_counter()
+            MonthlyRate.objects.bulk_create(monthly_rates(rates), batch_size=batch_size, ignore_conflicts=True)
+            insert_seconds += time.perf_counter() - inserting
+            rates_created += len(rates)
+    finally:
+        connections.close_all()
+
+    if not insert:
+        return pd.concat(parsed) if parsed else None, time.perf_counter() - started, 0.0
+    return rates_created, time.perf_counter() - started - insert_seconds, insert_seconds
+
 
 class Command(BaseCommand):
     help = 'Clear database and seed full currency data from CSV'
-    
+
     def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_path',
+            help='Path to the cleaned currency CSV'
+        )
         parser.add_argument(
             '--skip-errors',
             action='store_true',
@@ -19,186 +116,440 @@ class Command(BaseCommand):
             default=1000,
             help='Number of MonthlyRate records to create in batch (default: 1000)'
         )
-    
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of CSV rows parsed per chunk (default: 500)'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Apply only the cells that differ from the database instead of clearing it'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Resume file for --incremental loads (default: <csv_path>.checkpoint)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes parsing and inserting row ranges in parallel (default: 1)'
+        )
+
     def handle(self, *args, **kwargs):
+        csv_path = kwargs['csv_path']
         skip_errors = kwargs['skip_errors']
         batch_size = kwargs['batch_size']
-        
-        csv_path = '/Users/mar/react_projects/currency_converter/backend/cleaned_currency_2000.csv'
-        
+        chunk_size = kwargs['chunk_size']
+        incremental = kwargs['incremental']
+        checkpoint_path = kwargs['checkpoint'] or f'{csv_path}.checkpoint'
+        workers = kwargs['workers']
+
+        if workers > 1 and incremental:
+            self.stderr.write("--workers cannot be combined with --incremental")
+            return
+
+        self.timings = {}
+
+        self.stdout.write("="*60)
+        if incremental:
+            self.stdout.write("INCREMENTAL SEEDING FROM CSV")
+        else:
+            self.stdout.write("CLEARING DATABASE AND SEEDING FROM CSV")
         self.stdout.write("="*60)
-        self.stdout.write("CLEARING DATABASE AND SEEDING FROM CSV")
+
+        start_row = 0
+        if incremental:
+            # Step 1: Keep existing data, resuming after the last committed chunk if any
+            start_row = self._read_checkpoint(checkpoint_path, csv_path)
+            if start_row:
+                self.stdout.write(f"\n1. Resuming from checkpoint after row {start_row}...")
+            else:
+                self.stdout.write("\n1. Comparing against existing data...")
+        else:
+            # Step 1: Clear existing data
+            self.stdout.write("\n1. Clearing existing data...")
+            with self._timed('clear'):
+                deleted_rates, _ = MonthlyRate.objects.all().delete()
+                deleted_currencies, _ = Currency.objects.all().delete()
+            self.stdout.write(f"   Deleted {deleted_currencies} Currency records")
+            self.stdout.write(f"   Deleted {deleted_rates} MonthlyRate records")
+
+        self.currency_ids = {}
+        self.currency_created = 0
+        self.rates_created = 0
+        self.rates_updated = 0
+        self.rates_deleted = 0
+        self.rows_with_errors = 0
+        started = time.perf_counter()
+
+        if workers > 1:
+            rows_processed, completed = self._load_parallel(csv_path, workers, chunk_size, batch_size, skip_errors)
+        else:
+            rows_processed, completed = self._load_serial(
+                csv_path, start_row, chunk_size, batch_size, skip_errors, incremental, checkpoint_path
+            )
+
+        load_seconds = time.perf_counter() - started
+
+        if incremental:
+            # Aggregates and summary rows were refreshed with each chunk
+            self.stdout.write("\n4. Removing currencies no longer in the CSV and recounting rows...")
+            if completed:
+                deleted_currencies = self._delete_missing_currencies(csv_path)
+                self.stdout.write(f"   Deleted {deleted_currencies} Currency records")
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
+            else:
+                self.stdout.write(f"   Load interrupted; rerun to resume from {checkpoint_path}")
+        else:
+            # Rebuild the derived tables in one pass each (bulk_create skips the signals)
+            self.stdout.write("\n4. Rebuilding yearly aggregates, rate summary and row counters...")
+            with self._timed('derived tables'):
+                YearlyRateAggregate.objects.rebuild(batch_size=batch_size)
+                RateSummary.objects.rebuild(batch_size=batch_size)
+        with self._timed('derived tables'):
+            TableCounter.objects.recount()
+        bump_data_version()
+        # Running servers drop their rate matrices; bulk_create sent no per-row invalidations
+        publish_flush()
+
+        # Step 5: Summary
+        self.stdout.write("\n" + "="*60)
+        self.stdout.write("SEEDING COMPLETE - FINAL SUMMARY")
         self.stdout.write("="*60)
-        
-        # Step 1: Clear existing data
-        self.stdout.write("\n1. Clearing existing data...")
-        deleted_rates, _ = MonthlyRate.objects.all().delete()
-        deleted_currencies, _ = Currency.objects.all().delete()
-        self.stdout.write(f"   Deleted {deleted_currencies} Currency records")
-        self.stdout.write(f"   Deleted {deleted_rates} MonthlyRate records")
-        
-        # Step 2: Read CSV
-        self.stdout.write("\n2. Reading CSV file...")
+        self.stdout.write(f"Rows processed: {rows_processed}")
+        self.stdout.write(f"Rows with errors: {self.rows_with_errors}")
+        self.stdout.write(f"Currency records created: {self.currency_created}")
+        self.stdout.write(f"MonthlyRate records created: {self.rates_created}")
+        if incremental:
+            self.stdout.write(f"MonthlyRate records updated: {self.rates_updated}")
+            self.stdout.write(f"MonthlyRate records deleted: {self.rates_deleted}")
+        self.stdout.write(f"Load time: {load_seconds:.2f}s")
+        if load_seconds > 0:
+            self.stdout.write(f"Throughput: {rows_processed / load_seconds:.0f} rows/sec, "
+                              f"{self.rates_created / load_seconds:.0f} rates/sec")
+        self.stdout.write("Stage timings:")
+        for stage, seconds in self.timings.items():
+            self.stdout.write(f"   {stage:<24} {seconds:8.2f}s")
+        self.stdout.write(f"Total Currency in DB: {Currency.objects.count()}")
+        self.stdout.write(f"Total MonthlyRate in DB: {MonthlyRate.objects.count()}")
+
+        if self.rows_with_errors == 0:
+            self.stdout.write(self.style.SUCCESS("\n✓ All rows processed successfully!"))
+        else:
+            self.stdout.write(self.style.WARNING(f"\n⚠ Completed with {self.rows_with_errors} errors"))
+
+    def _load_serial(self, csv_path, start_row, chunk_size, batch_size, skip_errors, incremental, checkpoint_path):
+        """Stream the CSV chunk by chunk in this process; returns (rows processed, whether the whole file was read)"""
+        # Step 2: Open the CSV as a stream of chunks
+        self.stdout.write(f"\n2. Reading CSV file {csv_path} in chunks of {chunk_size} rows...")
         try:
-            df = pd.read_csv(
-                csv_path, 
-                low_memory=False,
-                na_values=['Units', 'units', 'UNITS', '', 'NaN', 'nan', 'null', 'NULL']
+            chunks = pd.read_csv(
+                csv_path,
+                chunksize=chunk_size,
+                na_values=NA_VALUES,
+                dtype={column: str for column in META_COLUMNS},
+                skiprows=range(1, start_row + 1)
             )
         except Exception as e:
             self.stderr.write(f"Error reading CSV: {e}")
-            return
-        
-        self.stdout.write(f"   Found {len(df)} rows in CSV")
-        
-        # Step 3: Identify monthly columns
-        monthly_cols = []
-        for col in df.columns:
-            if isinstance(col, str) and col.startswith('2') and '-' in col and 'M' in col:
-                monthly_cols.append(col)
-        
-        self.stdout.write(f"   Found {len(monthly_cols)} monthly columns")
-        
-        # Step 4: Process each row
+            return 0, False
+
+        # Step 3: Parse, resolve currencies and stream rates chunk by chunk
         self.stdout.write("\n3. Processing data...")
-        
-        currency_created = 0
-        currency_updated = 0
-        rates_created = 0
+
         rows_processed = 0
-        rows_with_errors = 0
-        
-        # Batch processing for MonthlyRate
-        monthly_rate_batch = []
-        
-        for idx, row in df.iterrows():
-            rows_processed += 1
-            
-            # Show progress every 100 rows
-            if rows_processed % 100 == 0:
-                self.stdout.write(f"   Processed {rows_processed}/{len(df)} rows...")
-            
-            try:
-                # Extract metadata
-                country = str(row['COUNTRY']).strip() if pd.notna(row['COUNTRY']) else ''
-                indicator = str(row['INDICATOR']).strip() if pd.notna(row['INDICATOR']) else ''
-                frequency = str(row['FREQUENCY']).strip() if pd.notna(row['FREQUENCY']) else 'Annual'
-                scale = str(row['SCALE']).strip() if pd.notna(row['SCALE']) else 'Units'
-                
-                if not country or not indicator:
-                    raise ValueError(f"Missing country or indicator: '{country}', '{indicator}'")
-                
-                # Create or get Currency
-                currency, created = Currency.objects.get_or_create(
-                    COUNTRY=country,
-                    INDICATOR=indicator,
-                    defaults={
-                        'FREQUENCY': frequency,
-                        'SCALE': scale
-                    }
-                )
-                
-                if created:
-                    currency_created += 1
+        monthly_cols = None
+        completed = False
+        started = time.perf_counter()
+
+        try:
+            chunks = iter(chunks)
+            while True:
+                with self._timed('read'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    completed = True
+                    break
+
+                # Keep row numbers in messages relative to the whole file after a resume
+                chunk.index += start_row
+                if monthly_cols is None:
+                    monthly_cols = self._monthly_columns(chunk.columns)
+                    self.stdout.write(f"   Found {len(monthly_cols)} monthly columns")
+
+                if incremental:
+                    with transaction.atomic():
+                        processed, stop = self._load_chunk(chunk, monthly_cols, batch_size, skip_errors, incremental)
+                    # A stopped chunk is not recorded; re-applying its good rows is a no-op
+                    if not stop:
+                        self._write_checkpoint(checkpoint_path, csv_path, start_row + rows_processed + processed)
                 else:
-                    currency_updated += 1
-                
-                # Process monthly columns
-                for col in monthly_cols:
-                    value = row[col]
-                    
-                    # Skip NaN, None, empty values
-                    if pd.isna(value):
-                        continue
-                    
-                    # Skip if it's a string that can't be converted
-                    if isinstance(value, str):
-                        value_str = value.strip().lower()
-                        if value_str in ['units', 'nan', 'null', '']:
-                            continue
-                    
-                    try:
-                        # Parse year and month from column name
-                        year_str, month_str = col.split('-')
-                        year = int(year_str)
-                        month = int(month_str.replace('M', ''))
-                        
-                        # Convert value to float
-                        try:
-                            if isinstance(value, str):
-                                value = value.strip()
-                                # Handle scientific notation
-                                if 'e-' in value.lower():
-                                    rate_value = float(value)
-                                else:
-                                    rate_value = float(value)
-                            else:
-                                rate_value = float(value)
-                            
-                            # Add to batch
-                            monthly_rate_batch.append(MonthlyRate(
-                                currency=currency,
-                                year=year,
-                                month=month,
-                                rate=rate_value
-                            ))
-                            
-                            rates_created += 1
-                            
-                            # Bulk create if batch size reached
-                            if len(monthly_rate_batch) >= batch_size:
-                                MonthlyRate.objects.bulk_create(
-                                    monthly_rate_batch,
-                                    ignore_conflicts=True
-                                )
-                                monthly_rate_batch = []
-                                
-                        except (ValueError, TypeError) as conv_error:
-                            # Skip this rate if can't convert to float
-                            continue
-                            
-                    except (ValueError, IndexError) as parse_error:
-                        # Skip if can't parse column name
-                        continue
-                
-            except Exception as e:
-                rows_with_errors += 1
-                error_msg = f"Row {idx} error: {str(e)[:100]}"
+                    processed, stop = self._load_chunk(chunk, monthly_cols, batch_size, skip_errors, incremental)
+                rows_processed += processed
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"   Processed {rows_processed} rows, {self.rates_created} rates "
+                    f"({rows_processed / elapsed:.0f} rows/sec)..."
+                )
+                if stop:
+                    break
+        except Exception as e:
+            self.stderr.write(f"Error reading CSV: {e}")
+
+        return rows_processed, completed
+
+    def _monthly_columns(self, columns):
+        """Map every YYYY-MMM column to its (year, month), parsed once per file instead of per cell"""
+        monthly = {}
+        for col in columns:
+            match = MONTHLY_COLUMN.match(str(col))
+            if match and 1 <= int(match.group(2)) <= 12:
+                monthly[col] = (int(match.group(1)), int(match.group(2)))
+        return monthly
+
+    def _validate(self, chunk, skip_errors):
+        """Strip the metadata columns and flag bad rows; returns (country, indicator, frequency, scale, valid, stop)"""
+        country = chunk['COUNTRY'].fillna('').str.strip()
+        indicator = chunk['INDICATOR'].fillna('').str.strip()
+        frequency = chunk['FREQUENCY'].fillna('Annual').str.strip()
+        scale = chunk['SCALE'].fillna('Units').str.strip()
+
+        valid = (country != '') & (indicator != '')
+        stop = False
+        if not valid.all():
+            for idx in chunk.index[~valid]:
+                self.rows_with_errors += 1
+                error_msg = f"Row {idx} error: Missing country or indicator: '{country[idx]}', '{indicator[idx]}'"
                 if skip_errors:
                     self.stdout.write(f"   ⚠ {error_msg}")
                 else:
                     self.stderr.write(f"   ✗ {error_msg}")
-                    if not skip_errors:
-                        # Create remaining batch before stopping
-                        if monthly_rate_batch:
+                    # Keep the rows before the first bad one, as a row-by-row load would
+                    valid &= chunk.index < idx
+                    stop = True
+                    break
+
+        return country, indicator, frequency, scale, valid, stop
+
+    def _load_chunk(self, chunk, monthly_cols, batch_size, skip_errors, incremental=False):
+        """Load one chunk, fully or as a delta; returns (rows processed, whether loading must stop)"""
+        with self._timed('parse'):
+            country, indicator, frequency, scale, valid, stop = self._validate(chunk, skip_errors)
+
+        with self._timed('currencies'):
+            currency_ids = self._resolve_currencies(
+                country[valid], indicator[valid], frequency[valid], scale[valid]
+            )
+
+        with self._timed('parse'):
+            rates = melt_rates(chunk[valid], monthly_cols, currency_ids)
+
+        with self._timed('insert'):
+            if incremental:
+                self._apply_delta(rates, batch_size)
+            else:
+                MonthlyRate.objects.bulk_create(
+                    monthly_rates(rates), batch_size=batch_size, ignore_conflicts=True
+                )
+                self.rates_created += len(rates)
+
+        # A stopping load counts the rows up to and including the bad one
+        return (int(valid.sum()) + 1 if stop else len(chunk)), stop
+
+    def _load_parallel(self, csv_path, workers, chunk_size, batch_size, skip_errors):
+        """Assign every currency id up front, then parse and insert row ranges in a process pool"""
+        self.stdout.write(f"\n2. Scanning CSV file {csv_path} metadata...")
+        try:
+            with self._timed('scan'):
+                monthly_cols = self._monthly_columns(pd.read_csv(csv_path, nrows=0).columns)
+                # Blank lines are kept so that positions here match the workers' skiprows
+                lines = pd.read_csv(
+                    csv_path, usecols=META_COLUMNS, na_values=NA_VALUES, dtype=str, skip_blank_lines=False
+                )
+        except Exception as e:
+            self.stderr.write(f"Error reading CSV: {e}")
+            return 0, False
+        meta = lines[lines.notna().any(axis=1)]
+        self.stdout.write(f"   Found {len(meta)} rows and {len(monthly_cols)} monthly columns")
+
+        with self._timed('parse'):
+            country, indicator, frequency, scale, valid, stop = self._validate(meta, skip_errors)
+        with self._timed('currencies'):
+            ids = self._resolve_currencies(country[valid], indicator[valid], frequency[valid], scale[valid])
+            currency_ids = dict(zip(zip(country[valid], indicator[valid]), ids))
+
+        # Rows after a stopping error are never loaded
+        row_count = int(meta.index[~valid.to_numpy()][0]) if stop else len(lines)
+        range_size = max(chunk_size, -(-row_count // (workers * 4)))
+        ranges = [(start, min(start + range_size, row_count)) for start in range(0, row_count, range_size)]
+
+        # SQLite allows a single writer, so there the workers only parse and this process inserts
+        insert_in_workers = connection.vendor != 'sqlite'
+        self.stdout.write(f"\n3. Loading {len(ranges)} row ranges with {workers} workers...")
+        # Workers must open their own connections rather than inherit this one
+        connections.close_all()
+        completed = not stop
+        parse_seconds = insert_seconds = 0.0
+        with self._timed('load (wall clock)'), ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(
+                    _load_range, csv_path, start, stop_row, currency_ids,
+                    monthly_cols, chunk_size, batch_size, insert_in_workers
+                ): (start, stop_row)
+                for start, stop_row in ranges
+            }
+            for future in as_completed(futures):
+                start, stop_row = futures[future]
+                try:
+                    rates_created, parse_time, insert_time = future.result()
+                    if not insert_in_workers:
+                        rates, rates_created = rates_created, 0
+                        if rates is not None:
+                            inserting = time.perf_counter()
                             MonthlyRate.objects.bulk_create(
-                                monthly_rate_batch,
-                                ignore_conflicts=True
+                                monthly_rates(rates), batch_size=batch_size, ignore_conflicts=True
                             )
-                        return
-                continue
-        
-        # Create any remaining MonthlyRate records
-        if monthly_rate_batch:
-            MonthlyRate.objects.bulk_create(
-                monthly_rate_batch,
-                ignore_conflicts=True
-            )
-        
-        # Step 5: Summary
-        self.stdout.write("\n" + "="*60)
-        self.stdout.write("SEEDING COMPLETE - FINAL SUMMARY")
-        self.stdout.write("="*60)
-        self.stdout.write(f"Rows in CSV: {len(df)}")
-        self.stdout.write(f"Rows processed: {rows_processed}")
-        self.stdout.write(f"Rows with errors: {rows_with_errors}")
-        self.stdout.write(f"Currency records created: {currency_created}")
-        self.stdout.write(f"Currency records updated: {currency_updated}")
-        self.stdout.write(f"MonthlyRate records created: {rates_created}")
-        self.stdout.write(f"Total Currency in DB: {Currency.objects.count()}")
-        self.stdout.write(f"Total MonthlyRate in DB: {MonthlyRate.objects.count()}")
-        
-        if rows_with_errors == 0:
-            self.stdout.write(self.style.SUCCESS("\n✓ All rows processed successfully!"))
-        else:
-            self.stdout.write(self.style.WARNING(f"\n⚠ Completed with {rows_with_errors} errors"))
\ No newline at end of file
+                            insert_time = time.perf_counter() - inserting
+                            rates_created = len(rates)
+                except Exception as e:
+                    self.stderr.write(f"   ✗ Rows {start}-{stop_row - 1} failed: {e}")
+                    completed = False
+                    continue
+                self.rates_created += rates_created
+                parse_seconds += parse_time
+                insert_seconds += insert_time
+                self.stdout.write(f"   Loaded rows {start}-{stop_row - 1}: {rates_created} rates")
+
+        # Summed across workers, so they can exceed the wall clock time
+        self.timings['parse (workers)'] = parse_seconds
+        self.timings['insert (workers)' if insert_in_workers else 'insert'] = insert_seconds
+        return len(meta[meta.index < row_count]) + (1 if stop else 0), completed
+
+    @contextmanager
+    def _timed(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - started
+
+    def _apply_delta(self, rates, batch_size):
+        """Write only the cells of a chunk whose (currency, year, month, rate) hash is not already stored"""
+        # The first occurrence of a duplicated cell wins, as with ignore_conflicts in a full load
+        rates = rates.drop_duplicates(subset=['currency_id', 'year', 'month'])
+        stored = pd.DataFrame.from_records(
+            MonthlyRate.objects.filter(
+                currency_id__in=rates['currency_id'].unique().tolist()
+            ).order_by().values_list('id', *CELL_COLUMNS),
+            columns=['id'] + CELL_COLUMNS
+        ).astype({'id': 'int64', 'currency_id': 'int64', 'year': 'int64', 'month': 'int64', 'rate': 'float64'})
+
+        incoming_hashes = pd.util.hash_pandas_object(rates[CELL_COLUMNS], index=False)
+        stored_hashes = pd.util.hash_pandas_object(stored[CELL_COLUMNS], index=False)
+
+        inserts = rates[~incoming_hashes.isin(stored_hashes).to_numpy()]
+        stale = stored[~stored_hashes.isin(incoming_hashes).to_numpy()]
+        if inserts.empty and stale.empty:
+            return
+
+        # Changed cells are rewritten as delete + insert: no UPDATE reaches the audit trigger
+        # and bulk operations skip the per-row signals, so a reload is never audited.
+        # The delete refreshes the aggregates and summary rows of the stale cells itself
+        MonthlyRate.objects.filter(id__in=stale['id'].tolist()).delete()
+        MonthlyRate.objects.bulk_create(monthly_rates(inserts), batch_size=batch_size)
+
+        inserted_keys = set(zip(inserts['currency_id'], inserts['year'], inserts['month']))
+        stale_keys = set(zip(stale['currency_id'], stale['year'], stale['month']))
+        updated = len(inserted_keys & stale_keys)
+        self.rates_updated += updated
+        self.rates_created += len(inserted_keys) - updated
+        self.rates_deleted += len(stale_keys) - updated
+
+        YearlyRateAggregate.objects.refresh((currency_id, year) for currency_id, year, _ in inserted_keys)
+        RateSummary.objects.refresh(
+            MonthlyRate.objects.filter(
+                currency_id__in={currency_id for currency_id, _, _ in inserted_keys},
+                year__in={year for _, year, _ in inserted_keys}
+            ),
+            keys=inserted_keys
+        )
+
+    def _delete_missing_currencies(self, csv_path):
+        """Delete currencies with no row left in the CSV; their rates and derived rows cascade"""
+        keys = pd.read_csv(csv_path, usecols=['COUNTRY', 'INDICATOR'], dtype=str).fillna('')
+        keys = set(zip(keys['COUNTRY'].str.strip(), keys['INDICATOR'].str.strip()))
+        missing = [
+            currency_id
+            for currency_id, country, indicator in Currency.objects.values_list('id', 'COUNTRY', 'INDICATOR')
+            if (country, indicator) not in keys
+        ]
+        Currency.objects.filter(id__in=missing).delete()
+        return len(missing)
+
+    def _fingerprint(self, csv_path):
+        stat = os.stat(csv_path)
+        return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _read_checkpoint(self, checkpoint_path, csv_path):
+        """Number of CSV rows already committed by an interrupted load of the same file"""
+        try:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if checkpoint.get('csv') != self._fingerprint(csv_path):
+            self.stdout.write("   Ignoring checkpoint written for a different version of the CSV")
+            return 0
+        return int(checkpoint.get('rows', 0))
+
+    def _write_checkpoint(self, checkpoint_path, csv_path, rows):
+        # Written to a temporary file first so a crash never leaves a truncated checkpoint
+        temporary_path = f'{checkpoint_path}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump({'csv': self._fingerprint(csv_path), 'rows': rows}, f)
+        os.replace(temporary_path, checkpoint_path)
+
+    def _resolve_currencies(self, country, indicator, frequency, scale):
+        """Return the Currency id of every row, creating all missing currencies with one bulk insert"""
+        keys = list(zip(country, indicator))
+
+        new_keys = {}
+        for key, row_frequency, row_scale in zip(keys, frequency, scale):
+            if key not in self.currency_ids and key not in new_keys:
+                new_keys[key] = (row_frequency, row_scale)
+
+        if new_keys:
+            self._lookup_currencies(new_keys)
+            missing = [key for key in new_keys if key not in self.currency_ids]
+
+            currencies = []
+            for key in missing:
+                currency = Currency(
+                    COUNTRY=key[0],
+                    INDICATOR=key[1],
+                    FREQUENCY=new_keys[key][0],
+                    SCALE=new_keys[key][1]
+                )
+                currency.sync_derived_fields()
+                currencies.append(currency)
+            Currency.objects.bulk_create(currencies)
+            self.currency_created += len(currencies)
+
+            # MySQL does not return ids from bulk inserts, so read them back
+            self._lookup_currencies(missing)
+
+        return [self.currency_ids[key] for key in keys]
+
+    def _lookup_currencies(self, keys):
+        if not keys:
+            return
+        for currency_id, country, indicator in Currency.objects.filter(
+            COUNTRY__in={country for country, _ in keys},
+            INDICATOR__in={indicator for _, indicator in keys}
+        ).values_list('id', 'COUNTRY', 'INDICATOR'):
+            self.currency_ids.setdefault((country, indicator), currency_id)
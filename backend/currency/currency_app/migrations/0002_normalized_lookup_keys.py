@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:51
+
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def backfill_lookup_keys(apps, schema_editor):
+    Currency = apps.get_model('currency_app', 'Currency')
+    CurrencyRateAudit = apps.get_model('currency_app', 'CurrencyRateAudit')
+    Currency.objects.update(
+        country_key=Lower(Trim('COUNTRY')),
+        indicator_key=Lower(Trim('INDICATOR'))
+    )
+    CurrencyRateAudit.objects.exclude(currency_country=None).update(
+        currency_country_key=Lower(Trim('currency_country'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currency',
+            name='country_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='currency',
+            name='indicator_key',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='currencyrateaudit',
+            name='currency_country_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_lookup_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='currency',
+            index=models.Index(fields=['country_key', 'indicator_key'], name='idx_country_indicator_key'),
+        ),
+        migrations.AddIndex(
+            model_name='currencyrateaudit',
+            index=models.Index(fields=['currency_country_key', 'updated_at'], name='idx_audit_country_key_date'),
+        ),
+    ]
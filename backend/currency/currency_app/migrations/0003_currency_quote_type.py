@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:51
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+
+def classify_currencies(apps, schema_editor):
+    # Same precedence as classify_indicator(), evaluated in one UPDATE
+    Currency = apps.get_model('currency_app', 'Currency')
+    Currency.objects.update(
+        base_currency=Case(
+            When(INDICATOR__icontains='US Dollar', then=Value(1)),
+            When(INDICATOR__icontains='Euro', then=Value(2)),
+            When(INDICATOR__icontains='SDR', then=Value(3)),
+            default=Value(0)
+        ),
+        quote_direction=Case(
+            When(INDICATOR__icontains='per domestic currency', then=Value(1)),
+            default=Value(0)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_app', '0002_normalized_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currency',
+            name='base_currency',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'OTHER'), (1, 'USD'), (2, 'EUR'), (3, 'SDR')], db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='currency',
+            name='quote_direction',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Domestic currency per base'), (1, 'Base per domestic currency')], default=0, editable=False),
+        ),
+        migrations.RunPython(classify_currencies, migrations.RunPython.noop),
+    ]
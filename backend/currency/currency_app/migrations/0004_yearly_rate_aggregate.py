@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+
+
+def build_aggregates(apps, schema_editor):
+    MonthlyRate = apps.get_model('currency_app', 'MonthlyRate')
+    YearlyRateAggregate = apps.get_model('currency_app', 'YearlyRateAggregate')
+    stats = MonthlyRate.objects.order_by().values('currency_id', 'year').annotate(
+        stat_count=Count('id'),
+        stat_total=Sum('rate'),
+        stat_minimum=Min('rate'),
+        stat_maximum=Max('rate'),
+        stat_sum_squares=Sum(F('rate') * F('rate'))
+    )
+    YearlyRateAggregate.objects.bulk_create(
+        (
+            YearlyRateAggregate(
+                currency_id=row['currency_id'],
+                year=row['year'],
+                count=row['stat_count'],
+                total=row['stat_total'],
+                minimum=row['stat_minimum'],
+                maximum=row['stat_maximum'],
+                sum_squares=row['stat_sum_squares']
+            )
+            for row in stats
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_app', '0003_currency_quote_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearlyRateAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0.0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('sum_squares', models.FloatField(default=0.0)),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='yearly_aggregates', to='currency_app.currency')),
+            ],
+            options={
+                'ordering': ['currency', 'year'],
+                'unique_together': {('currency', 'year')},
+            },
+        ),
+        migrations.RunPython(build_aggregates, migrations.RunPython.noop),
+    ]
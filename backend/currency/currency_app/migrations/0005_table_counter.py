@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:55
+
+from django.db import migrations, models
+
+
+def count_existing_rows(apps, schema_editor):
+    TableCounter = apps.get_model('currency_app', 'TableCounter')
+    for name, model_name in [('currencies', 'Currency'), ('rates', 'MonthlyRate'), ('audits', 'CurrencyRateAudit')]:
+        TableCounter.objects.create(name=name, value=apps.get_model('currency_app', model_name).objects.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_app', '0004_yearly_rate_aggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
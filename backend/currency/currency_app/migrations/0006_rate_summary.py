@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BASE_CURRENCY_LABELS = {0: 'OTHER', 1: 'USD', 2: 'EUR', 3: 'SDR'}
+
+
+def build_summary(apps, schema_editor):
+    MonthlyRate = apps.get_model('currency_app', 'MonthlyRate')
+    RateSummary = apps.get_model('currency_app', 'RateSummary')
+    rates = MonthlyRate.objects.order_by().values(
+        'currency_id', 'year', 'month', 'rate',
+        'currency__COUNTRY', 'currency__country_key', 'currency__INDICATOR', 'currency__base_currency'
+    )
+    RateSummary.objects.bulk_create(
+        (
+            RateSummary(
+                currency_id=rate['currency_id'],
+                year=rate['year'],
+                month=rate['month'],
+                rate=rate['rate'],
+                country=rate['currency__COUNTRY'],
+                country_key=rate['currency__country_key'],
+                indicator=rate['currency__INDICATOR'],
+                base_currency_type=BASE_CURRENCY_LABELS[rate['currency__base_currency']]
+            )
+            for rate in rates.iterator(chunk_size=1000)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_app', '0005_table_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=100)),
+                ('country_key', models.CharField(max_length=100)),
+                ('indicator', models.CharField(max_length=200)),
+                ('base_currency_type', models.CharField(max_length=5)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('rate', models.FloatField()),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_rows', to='currency_app.currency')),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'indexes': [models.Index(fields=['year', '-rate'], name='idx_summary_year_rate'), models.Index(fields=['country_key', 'year'], name='idx_summary_country_year')],
+                'unique_together': {('currency', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+TRIGGER_NAME = 'currency_app_monthlyrate_audit'
+
+# Same content as the create_audit_log signal: one audit row per UPDATE, with the
+# currency columns copied from the joined Currency row in the same statement
+AUDIT_INSERT = """
+    INSERT INTO currency_app_currencyrateaudit
+        (currency_country, currency_country_key, currency_indicator, year, month,
+         old_rate, new_rate, change_percentage, updated_at)
+    SELECT c.COUNTRY, c.country_key, c.INDICATOR, NEW.year, NEW.month,
+           OLD.rate, NEW.rate,
+           CASE WHEN OLD.rate <> 0 THEN (NEW.rate - OLD.rate) / OLD.rate * 100 ELSE 0 END,
+           {now}
+    FROM currency_app_currency c
+    WHERE c.id = NEW.currency_id;
+    UPDATE currency_app_tablecounter SET value = value + 1 WHERE name = 'audits';
+"""
+
+CREATE_TRIGGER = {
+    'sqlite': f"""
+CREATE TRIGGER {TRIGGER_NAME}
+AFTER UPDATE ON currency_app_monthlyrate
+FOR EACH ROW
+BEGIN
+{AUDIT_INSERT.format(now="strftime('%Y-%m-%d %H:%M:%f', 'now')")}
+END
+""",
+    'mysql': f"""
+CREATE TRIGGER {TRIGGER_NAME}
+AFTER UPDATE ON currency_app_monthlyrate
+FOR EACH ROW
+BEGIN
+{AUDIT_INSERT.format(now='UTC_TIMESTAMP(6)')}
+END
+""",
+}
+
+
+def create_trigger(apps, schema_editor):
+    sql = CREATE_TRIGGER.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql, params=None)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_TRIGGER:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME}', params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_app', '0006_rate_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -1,27 +1,119 @@
-from django.db import models
-from django.db.models import Avg, Case, When, Value, CharField
+from django.db import connection, models, transaction
+from django.db.models import Avg
+
+
+class BaseCurrency(models.IntegerChoices):
+    OTHER = 0, 'OTHER'
+    USD = 1, 'USD'
+    EUR = 2, 'EUR'
+    SDR = 3, 'SDR'
+
+
+class QuoteDirection(models.IntegerChoices):
+    DOMESTIC_PER_BASE = 0, 'Domestic currency per base'
+    BASE_PER_DOMESTIC = 1, 'Base per domestic currency'
+
+
+def normalize_key(value):
+    # Lowercased lookup key so case-insensitive matches become exact index seeks
+    return (value or '').strip().lower()
+
+
+def classify_indicator(indicator):
+    # Resolve the quote type of an indicator once, so readers never scan the text again
+    text = normalize_key(indicator)
+    if 'us dollar' in text:
+        base = BaseCurrency.USD
+    elif 'euro' in text:
+        base = BaseCurrency.EUR
+    elif 'sdr' in text:
+        base = BaseCurrency.SDR
+    else:
+        base = BaseCurrency.OTHER
+    
+    if 'per domestic currency' in text:
+        direction = QuoteDirection.BASE_PER_DOMESTIC
+    else:
+        direction = QuoteDirection.DOMESTIC_PER_BASE
+    
+    return base, direction
+
+
+class MonthlyRateQuerySet(models.QuerySet):
+    def delete(self):
+        # TRIGGER: Aggregates, summary rows, counters and caches follow a rate delete once per call
+        with transaction.atomic():
+            if not self.query.where:
+                # Clearing the table: the derived rows all go too, without reading the deleted keys
+                deleted, counts = super().delete()
+                YearlyRateAggregate.objects.all().delete()
+                RateSummary.objects.all().delete()
+                count_deleted_rows(counts)
+                transaction.on_commit(publish_flush)
+                transaction.on_commit(bump_data_version)
+                return deleted, counts
+            
+            cells = list(self.order_by().values_list('currency_id', 'year', 'month'))
+            deleted, counts = super().delete()
+            count_deleted_rates(cells, counts)
+        return deleted, counts
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class ExchangeRateManager(models.Manager):
+    def get_queryset(self):
+        return MonthlyRateQuerySet(self.model, using=self._db)
+    
     def get_summary_view(self):
-        # VIEW: This method creates a view-like structure with annotated data
-        return self.select_related('currency').annotate(
-            base_currency_type=Case(
-                When(currency__INDICATOR__icontains='US Dollar', then=Value('USD')),
-                When(currency__INDICATOR__icontains='Euro', then=Value('EUR')),
-                When(currency__INDICATOR__icontains='SDR', then=Value('SDR')),
-                default=Value('OTHER'),
-                output_field=CharField()
-            )
+        # VIEW: Reads the materialized RateSummary table under the original view's column names
+        from django.db.models import F
+        
+        return RateSummary.objects.values(
+            'year',
+            'month',
+            'rate',
+            'base_currency_type',
+            currency__COUNTRY=F('country'),
+            currency__INDICATOR=F('indicator')
+        )
+
+    def rates_above_average(self, countries, year_from, year_to):
+        # WINDOW FUNCTION: One query for every currency of every country, partitioned per currency-year
+        from django.db.models import F, Window
+        
+        return self.filter(
+            currency__country_key__in=[normalize_key(country) for country in countries],
+            year__gte=year_from,
+            year__lte=year_to
+        ).annotate(
+            average_rate=Window(Avg('rate'), partition_by=[F('currency_id'), F('year')])
+        ).filter(
+            rate__gt=F('average_rate')
+        ).order_by(
+            'currency__COUNTRY', 'currency__INDICATOR', 'year', 'month'
         ).values(
             'currency__COUNTRY',
             'currency__INDICATOR',
             'year',
             'month',
             'rate',
-            'base_currency_type'
+            'average_rate'
         )
 
+    def history(self, currency_ids, year_from, year_to):
+        # INDEX: One range scan of idx_currency_date per currency, already in (currency, year, month) order
+        return self.filter(
+            currency_id__in=currency_ids,
+            year__gte=year_from,
+            year__lte=year_to
+        ).order_by('currency_id', 'year', 'month').values_list('currency_id', 'year', 'month', 'rate')
+
 class RateManager(models.Manager):
+    def get_queryset(self):
+        return MonthlyRateQuerySet(self.model, using=self._db)
+    
     def update_rate_procedure(self, currency_id, year, month, rate):
         # STORED PROCEDURE: This method mimics a stored procedure with validation logic
         from django.core.exceptions import ValidationError
@@ -52,24 +144,209 @@ class RateManager(models.Manager):
             'month': month,
             'rate': rate
         }
+    
+    def bulk_update_rates(self, rows, batch_size=1000):
+        # STORED PROCEDURE: Validates a whole batch in memory, then upserts it with one bulk statement
+        import math
+        
+        results = [None] * len(rows)
+        pending = {}
+        
+        def reject(index, message):
+            results[index] = {'index': index, 'status': 'error', 'error': message}
+        
+        for index, row in enumerate(rows):
+            try:
+                currency_id = int(row['currency_id'])
+                year = int(row['year'])
+                month = int(row['month'])
+                rate = float(row['rate'])
+            except KeyError as e:
+                reject(index, f'Missing parameter: {str(e)}')
+                continue
+            except (TypeError, ValueError):
+                reject(index, 'Invalid value')
+                continue
+            
+            if not math.isfinite(rate) or rate <= 0:
+                reject(index, 'Rate must be positive')
+            elif month < 1 or month > 12:
+                reject(index, 'Month must be between 1-12')
+            elif (currency_id, year, month) in pending:
+                reject(index, 'Duplicate currency/year/month in batch')
+            else:
+                pending[(currency_id, year, month)] = (index, rate)
+        
+        currency_ids = {currency_id for currency_id, _, _ in pending}
+        currencies = {
+            currency_id: (country, indicator)
+            for currency_id, country, indicator in Currency.objects.filter(
+                id__in=currency_ids
+            ).values_list('id', 'COUNTRY', 'INDICATOR')
+        }
+        for key in [key for key in pending if key[0] not in currencies]:
+            index, _ = pending.pop(key)
+            reject(index, 'Currency not found')
+        
+        if not pending:
+            return results
+        
+        with transaction.atomic():
+            # One read of the previous rates drives both the per-row outcome and the audit rows.
+            # It locks those rows (and, on InnoDB, the gaps of the missing ones) until the upsert
+            # commits, so a concurrent batch waits and then sees this one's rates as the old ones.
+            existing = {
+                (currency_id, year, month): old_rate
+                for currency_id, year, month, old_rate in self.select_for_update().filter(
+                    currency_id__in={currency_id for currency_id, _, _ in pending},
+                    year__in={year for _, year, _ in pending}
+                ).order_by().values_list('currency_id', 'year', 'month', 'rate')
+                if (currency_id, year, month) in pending
+            }
+        
+            audits = []
+            for (currency_id, year, month), (index, rate) in pending.items():
+                old_rate = existing.get((currency_id, year, month))
+                change_percentage = None
+                if old_rate is not None:
+                    change_percentage = ((rate - old_rate) / old_rate) * 100 if old_rate != 0 else 0
+                    country, indicator = currencies[currency_id]
+                    audits.append(CurrencyRateAudit(
+                        currency_country=country,
+                        currency_country_key=normalize_key(country),
+                        currency_indicator=indicator,
+                        year=year,
+                        month=month,
+                        old_rate=old_rate,
+                        new_rate=rate,
+                        change_percentage=change_percentage
+                    ))
+            
+                results[index] = {
+                    'index': index,
+                    'status': 'success',
+                    'action': 'updated' if old_rate is not None else 'created',
+                    'currency_id': currency_id,
+                    'currency': currencies[currency_id][0],
+                    'year': year,
+                    'month': month,
+                    'rate': rate,
+                    'old_rate': old_rate,
+                    'change_percentage': change_percentage
+                }
+        
+            self.bulk_create(
+                [
+                    MonthlyRate(currency_id=currency_id, year=year, month=month, rate=rate)
+                    for (currency_id, year, month), (_, rate) in pending.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['currency', 'year', 'month'],
+                update_fields=['rate'],
+                batch_size=batch_size
+            )
+            
+            # TRIGGER: The native audit trigger already fired for every upserted UPDATE
+            if not audit_trigger_installed():
+                CurrencyRateAudit.objects.bulk_create(audits, batch_size=batch_size)
+                TableCounter.objects.increment(TableCounter.AUDITS, len(audits))
+            
+            TableCounter.objects.increment(TableCounter.RATES, len(pending) - len(existing))
+            YearlyRateAggregate.objects.refresh({(currency_id, year) for currency_id, year, _ in pending})
+            RateSummary.objects.refresh(
+                self.filter(currency_id__in=currency_ids, year__in={year for _, year, _ in pending}),
+                keys=pending.keys()
+            )
+            
+            # bulk_create sends no post_save, so the cache invalidation receivers are run by hand
+            cells = list(pending)
+            transaction.on_commit(lambda: publish_rate_changes(cells))
+            transaction.on_commit(bump_data_version)
+            # PUSH: Subscribed sockets get the whole batch once it is committed
+            changes = [(currency_id, year, month, rate) for (currency_id, year, month), (_, rate) in pending.items()]
+            transaction.on_commit(lambda: broadcast_rate_changes(changes))
+        
+        return results
+
+class CurrencyQuerySet(models.QuerySet):
+    def delete(self):
+        # TRIGGER: One counter update and one invalidation per delete, not one per currency
+        with transaction.atomic():
+            deleted, counts = super().delete()
+            count_deleted_rows(counts)
+        return deleted, counts
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class CurrencyManager(models.Manager):
+    def get_queryset(self):
+        return CurrencyQuerySet(self.model, using=self._db)
+    
+    def by_country(self, country):
+        # INDEX: Exact match on idx_country_indicator_key instead of COUNTRY__iexact
+        return self.filter(country_key=normalize_key(country))
+
+    def by_indicator(self, country, indicator):
+        # INDEX: Exact match on both columns of idx_country_indicator_key
+        return self.filter(country_key=normalize_key(country), indicator_key=normalize_key(indicator))
+
 
 class Currency(models.Model):
+    objects = CurrencyManager()
+    
     COUNTRY = models.CharField(max_length=100, db_index=True)  # INDEX
     INDICATOR = models.CharField(max_length=200, db_index=True)  # INDEX
     FREQUENCY = models.CharField(max_length=50)
     SCALE = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Normalized copies of COUNTRY / INDICATOR, kept in sync by save()
+    country_key = models.CharField(max_length=100, default='', editable=False)
+    indicator_key = models.CharField(max_length=200, default='', editable=False)
+    
+    # Quote type derived from INDICATOR by classify_indicator(), kept in sync by save()
+    base_currency = models.PositiveSmallIntegerField(
+        choices=BaseCurrency.choices, default=BaseCurrency.OTHER, db_index=True, editable=False
+    )  # INDEX
+    quote_direction = models.PositiveSmallIntegerField(
+        choices=QuoteDirection.choices, default=QuoteDirection.DOMESTIC_PER_BASE, editable=False
+    )
+    
     class Meta:
         indexes = [
             # COMPOSITE INDEX: For frequent queries
             models.Index(fields=['COUNTRY', 'INDICATOR'], name='idx_country_indicator'),
+            # COMPOSITE INDEX: For case-insensitive lookups through the normalized keys
+            models.Index(fields=['country_key', 'indicator_key'], name='idx_country_indicator_key'),
         ]
         ordering = ['COUNTRY', 'INDICATOR']
     
     def __str__(self):
         return f"{self.COUNTRY} - {self.INDICATOR}"
     
+    def sync_derived_fields(self):
+        # Also called by bulk loaders, since bulk_create() bypasses save()
+        self.country_key = normalize_key(self.COUNTRY)
+        self.indicator_key = normalize_key(self.INDICATOR)
+        self.base_currency, self.quote_direction = classify_indicator(self.INDICATOR)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted, counts = super().delete(*args, **kwargs)
+            count_deleted_rows(counts)
+        return deleted, counts
+    
+    def save(self, *args, **kwargs):
+        self.sync_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields, 'country_key', 'indicator_key', 'base_currency', 'quote_direction'
+            }
+        super().save(*args, **kwargs)
+    
     # METHOD that uses SUBQUERY in ORM
     def get_rates_above_average(self, year):
         # QUERY WITH SUBQUERY: Demonstrates subquery usage in Django ORM
@@ -116,15 +393,24 @@ class MonthlyRate(models.Model):
     def __str__(self):
         return f"{self.currency.COUNTRY} - {self.year}-{self.month:02d}: {self.rate}"
     
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted, counts = super().delete(*args, **kwargs)
+            count_deleted_rates([(self.currency_id, self.year, self.month)], counts)
+        return deleted, counts
+    
     # STORED FUNCTION equivalent using Django method
     @classmethod
     def calculate_average_rate(cls, currency_id, year):
         # STORED FUNCTION: Equivalent to a stored function using Django aggregation
-        avg = cls.objects.filter(
+        # Reads the maintained YearlyRateAggregate row instead of running AVG() on every call
+        aggregate = YearlyRateAggregate.objects.filter(
             currency_id=currency_id,
             year=year
-        ).aggregate(avg_rate=Avg('rate'))['avg_rate']
-        return avg or 0.0
+        ).values_list('total', 'count').first()
+        if not aggregate or not aggregate[1]:
+            return 0.0
+        return aggregate[0] / aggregate[1]
 
     @classmethod
     def update_rate_procedure(cls, currency_id, year, month, rate):
@@ -162,10 +448,115 @@ class MonthlyRate(models.Model):
             'id': monthly_rate.id
         }
 
+class YearlyAggregateManager(models.Manager):
+    def _grouped_stats(self, queryset):
+        from django.db.models import Count, F, Max, Min, Sum
+        
+        return queryset.order_by().values('currency_id', 'year').annotate(
+            stat_count=Count('id'),
+            stat_total=Sum('rate'),
+            stat_minimum=Min('rate'),
+            stat_maximum=Max('rate'),
+            stat_sum_squares=Sum(F('rate') * F('rate'))
+        )
+    
+    def _from_stats(self, stats):
+        return self.model(
+            currency_id=stats['currency_id'],
+            year=stats['year'],
+            count=stats['stat_count'],
+            total=stats['stat_total'],
+            minimum=stats['stat_minimum'],
+            maximum=stats['stat_maximum'],
+            sum_squares=stats['stat_sum_squares']
+        )
+    
+    def refresh(self, groups):
+        """Recompute the aggregates of the given (currency_id, year) groups from their monthly rows"""
+        groups = set(groups)
+        if not groups:
+            return
+        
+        stats = self._grouped_stats(MonthlyRate.objects.filter(
+            currency_id__in={currency_id for currency_id, _ in groups},
+            year__in={year for _, year in groups}
+        ))
+        aggregates = [
+            self._from_stats(row) for row in stats
+            if (row['currency_id'], row['year']) in groups
+        ]
+        
+        self.bulk_create(
+            aggregates,
+            update_conflicts=True,
+            unique_fields=['currency', 'year'],
+            update_fields=['count', 'total', 'minimum', 'maximum', 'sum_squares']
+        )
+        
+        # Groups whose last monthly row was deleted
+        emptied = groups - {(aggregate.currency_id, aggregate.year) for aggregate in aggregates}
+        for currency_id, year in emptied:
+            self.filter(currency_id=currency_id, year=year).delete()
+    
+    def rebuild(self, batch_size=1000):
+        """Replace every aggregate with one grouped pass over MonthlyRate"""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                (self._from_stats(row) for row in self._grouped_stats(MonthlyRate.objects.all())),
+                batch_size=batch_size
+            )
+
+
+class YearlyRateAggregate(models.Model):
+    # Per currency-year running statistics maintained on every MonthlyRate write
+    objects = YearlyAggregateManager()
+    
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='yearly_aggregates')
+    year = models.IntegerField()
+    count = models.IntegerField(default=0)
+    total = models.FloatField(default=0.0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    sum_squares = models.FloatField(default=0.0)
+    
+    class Meta:
+        # INDEX: The unique constraint doubles as the (currency, year) lookup index
+        unique_together = ['currency', 'year']
+        ordering = ['currency', 'year']
+    
+    def __str__(self):
+        return f"{self.currency_id} - {self.year}: avg {self.average}"
+    
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+    
+    @property
+    def stddev(self):
+        # Population standard deviation from the running sums
+        if not self.count:
+            return 0.0
+        variance = self.sum_squares / self.count - self.average ** 2
+        return max(variance, 0.0) ** 0.5
+
+
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
+from .broadcast import broadcast_rate_changes
+from .cache import bump_data_version
+from .invalidation import publish_flush, publish_rate_changes
+
+class AuditManager(models.Manager):
+    def by_country(self, country):
+        # INDEX: Exact match on idx_audit_country_key_date instead of currency_country__iexact
+        return self.filter(currency_country_key=normalize_key(country))
+
+
 class CurrencyRateAudit(models.Model):
+    objects = AuditManager()
+    
     currency_country = models.CharField(max_length=100, null=True, blank=True) 
     currency_indicator = models.CharField(max_length=200, null=True, blank=True)  
     year = models.IntegerField()
@@ -175,21 +566,188 @@ class CurrencyRateAudit(models.Model):
     change_percentage = models.FloatField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now_add=True)
     
+    # Normalized copy of currency_country, kept in sync by save()
+    currency_country_key = models.CharField(max_length=100, default='', editable=False)
+    
     class Meta:
         indexes = [
             # INDEX: For audit queries
             models.Index(fields=['currency_country', 'updated_at'], name='idx_audit_currency_date'),
+            # INDEX: For case-insensitive country filters through the normalized key
+            models.Index(fields=['currency_country_key', 'updated_at'], name='idx_audit_country_key_date'),
         ]
         ordering = ['-updated_at']
     
     def __str__(self):
         return f"Audit: {self.currency_country} - {self.year}-{self.month}"
+    
+    def save(self, *args, **kwargs):
+        self.currency_country_key = normalize_key(self.currency_country)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'currency_country_key'}
+        super().save(*args, **kwargs)
 
 
-# TRIGGER: Post-save signal acts as an AFTER UPDATE/INSERT trigger
+class RateSummaryManager(models.Manager):
+    SUMMARY_FIELDS = ['country', 'country_key', 'indicator', 'base_currency_type', 'rate']
+    
+    def _from_rates(self, rates):
+        return [
+            self.model(
+                currency_id=rate['currency_id'],
+                year=rate['year'],
+                month=rate['month'],
+                rate=rate['rate'],
+                country=rate['currency__COUNTRY'],
+                country_key=rate['currency__country_key'],
+                indicator=rate['currency__INDICATOR'],
+                base_currency_type=BaseCurrency(rate['currency__base_currency']).label
+            )
+            for rate in rates
+        ]
+    
+    def _rate_values(self, queryset):
+        return queryset.order_by().values(
+            'currency_id', 'year', 'month', 'rate',
+            'currency__COUNTRY', 'currency__country_key', 'currency__INDICATOR', 'currency__base_currency'
+        )
+    
+    def refresh(self, rates, keys=None):
+        """Upsert the summary rows of a MonthlyRate queryset, optionally narrowed to (currency_id, year, month) keys"""
+        rates = self._rate_values(rates)
+        if keys is not None:
+            keys = set(keys)
+            rates = [rate for rate in rates if (rate['currency_id'], rate['year'], rate['month']) in keys]
+        
+        self.bulk_create(
+            self._from_rates(rates),
+            update_conflicts=True,
+            unique_fields=['currency', 'year', 'month'],
+            update_fields=self.SUMMARY_FIELDS
+        )
+    
+    def discard(self, keys):
+        """Delete the summary rows of removed (currency_id, year, month) keys"""
+        keys = set(keys)
+        if not keys:
+            return
+        
+        ids = [
+            summary_id
+            for summary_id, currency_id, year, month in self.filter(
+                currency_id__in={currency_id for currency_id, _, _ in keys},
+                year__in={year for _, year, _ in keys}
+            ).values_list('id', 'currency_id', 'year', 'month')
+            if (currency_id, year, month) in keys
+        ]
+        self.filter(id__in=ids).delete()
+    
+    def refresh_currency(self, currency):
+        """Propagate a currency's denormalized columns to its summary rows"""
+        self.filter(currency_id=currency.id).update(
+            country=currency.COUNTRY,
+            country_key=currency.country_key,
+            indicator=currency.INDICATOR,
+            base_currency_type=BaseCurrency(currency.base_currency).label
+        )
+    
+    def rebuild(self, batch_size=1000):
+        """Replace the whole summary from MonthlyRate joined to Currency"""
+        with transaction.atomic():
+            self.all().delete()
+            rates = self._rate_values(MonthlyRate.objects.all()).iterator(chunk_size=batch_size)
+            batch = []
+            for rate in rates:
+                batch.append(rate)
+                if len(batch) >= batch_size:
+                    self.bulk_create(self._from_rates(batch))
+                    batch = []
+            if batch:
+                self.bulk_create(self._from_rates(batch))
+
+
+class RateSummary(models.Model):
+    # MATERIALIZED VIEW: Denormalized MonthlyRate + Currency rows, maintained on every write
+    objects = RateSummaryManager()
+    
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='summary_rows')
+    country = models.CharField(max_length=100)
+    country_key = models.CharField(max_length=100)
+    indicator = models.CharField(max_length=200)
+    base_currency_type = models.CharField(max_length=5)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    rate = models.FloatField()
+    
+    class Meta:
+        unique_together = ['currency', 'year', 'month']
+        indexes = [
+            # INDEX: Top rates of a year (dashboard ORDER BY rate DESC LIMIT n)
+            models.Index(fields=['year', '-rate'], name='idx_summary_year_rate'),
+            # INDEX: A country's summary for a year
+            models.Index(fields=['country_key', 'year'], name='idx_summary_country_year'),
+        ]
+        ordering = ['-year', '-month']
+    
+    def __str__(self):
+        return f"Summary: {self.country} - {self.year}-{self.month:02d}: {self.rate}"
+
+
+class TableCounterManager(models.Manager):
+    def increment(self, name, amount=1):
+        from django.db.models import F
+        
+        if not self.filter(name=name).update(value=F('value') + amount):
+            self.recount([name])
+    
+    def recount(self, names=None):
+        """Reset counters from COUNT(*); only needed after bulk loads that bypass the signals"""
+        for name in names or TableCounter.TABLES:
+            self.update_or_create(name=name, defaults={'value': TableCounter.TABLES[name].objects.count()})
+    
+    def totals(self):
+        return dict(self.values_list('name', 'value'))
+
+
+class TableCounter(models.Model):
+    # Maintained row counts, so the dashboard never runs an unfiltered COUNT(*) on InnoDB
+    objects = TableCounterManager()
+    
+    CURRENCIES = 'currencies'
+    RATES = 'rates'
+    AUDITS = 'audits'
+    
+    TABLES = {
+        CURRENCIES: Currency,
+        RATES: MonthlyRate,
+        AUDITS: CurrencyRateAudit,
+    }
+    NAMES = {model: name for name, model in TABLES.items()}
+    
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+# Databases where migration 0007 installs currency_app_monthlyrate_audit, a native AFTER UPDATE
+# trigger that writes CurrencyRateAudit in the same statement as the rate update
+AUDIT_TRIGGER_VENDORS = ('sqlite', 'mysql')
+
+
+def audit_trigger_installed():
+    return connection.vendor in AUDIT_TRIGGER_VENDORS
+
+
+# TRIGGER: Post-save signal acts as an AFTER UPDATE/INSERT trigger on databases without the native one
 @receiver(post_save, sender=MonthlyRate)
 def create_audit_log(sender, instance, created, **kwargs):
     # TRIGGER: Creates audit log after save (like an AFTER INSERT/UPDATE trigger)
+    if audit_trigger_installed():
+        return
+    
     if not created and hasattr(instance, '_old_rate') and instance._old_rate is not None:
         old_rate = instance._old_rate
         change_percentage = 0
@@ -212,9 +770,95 @@ def create_audit_log(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=MonthlyRate)
 def capture_old_rate(sender, instance, **kwargs):
     # TRIGGER: Captures old rate before update (like a BEFORE UPDATE trigger)
-    if instance.pk:
+    if instance.pk and not audit_trigger_installed():
         try:
             old_instance = MonthlyRate.objects.get(pk=instance.pk)
             instance._old_rate = old_instance.rate
         except MonthlyRate.DoesNotExist:
-            instance._old_rate = None
\ No newline at end of file
+            instance._old_rate = None
+
+
+# CACHE INVALIDATION: A rate write refreshes its cells in the in-process rate matrix of every worker;
+# a currency write marks it stale everywhere. Both go over the invalidation bus once committed.
+# MonthlyRate deletes are handled once per delete call by count_deleted_rates
+@receiver(post_save, sender=MonthlyRate)
+def refresh_rate_store(sender, instance, **kwargs):
+    cell = (instance.currency_id, instance.year, instance.month)
+    # Runs once the write is committed, before update_rate_procedure returns to the caller
+    transaction.on_commit(lambda: publish_rate_changes([cell]))
+    # Retires every cached payload (dashboard snapshots, ...) built from the old data
+    transaction.on_commit(bump_data_version)
+
+
+# Currency deletes are handled once per delete call by count_deleted_rows
+@receiver(post_save, sender=Currency)
+def invalidate_rate_store(sender, **kwargs):
+    transaction.on_commit(publish_flush)
+    transaction.on_commit(bump_data_version)
+
+
+# PUSH: Sends every committed rate save to the sockets subscribed to its currency
+@receiver(post_save, sender=MonthlyRate)
+def broadcast_rate_change(sender, instance, **kwargs):
+    change = (instance.currency_id, instance.year, instance.month, instance.rate)
+    # Registered after refresh_rate_store, so the pushed conversions read the new rates
+    transaction.on_commit(lambda: broadcast_rate_changes([change]))
+
+
+# TRIGGER: Keeps the YearlyRateAggregate row of the touched currency-year in step with MonthlyRate
+@receiver(post_save, sender=MonthlyRate)
+def refresh_yearly_aggregate(sender, instance, **kwargs):
+    # At most 12 rows are re-read through idx_currency_date, so min/max stay exact without the old rate
+    YearlyRateAggregate.objects.refresh([(instance.currency_id, instance.year)])
+
+
+# TRIGGER: Row counters follow inserts and deletes instead of being recounted on demand
+@receiver(post_save, sender=Currency)
+@receiver(post_save, sender=MonthlyRate)
+@receiver(post_save, sender=CurrencyRateAudit)
+def count_created_row(sender, created, **kwargs):
+    if created:
+        TableCounter.objects.increment(TableCounter.NAMES[sender])
+
+
+def count_deleted_rows(counts):
+    """
+    Counter and cache upkeep for one delete of currencies, given the per-model counts it returned.
+
+    Runs once per QuerySet.delete() or Currency.delete() instead of once per deleted row, and
+    also counts the rates removed by the cascade.
+    """
+    for model, name in TableCounter.NAMES.items():
+        if counts.get(model._meta.label):
+            TableCounter.objects.increment(name, -counts[model._meta.label])
+    if counts.get(Currency._meta.label):
+        transaction.on_commit(publish_flush)
+        transaction.on_commit(bump_data_version)
+
+
+def count_deleted_rates(cells, counts):
+    """
+    Derived table and cache upkeep for one delete of (currency_id, year, month) rate cells.
+
+    Called by MonthlyRate.delete() and MonthlyRateQuerySet.delete(), the way count_deleted_rows
+    is for currencies, so a bulk delete costs one refresh per table rather than one per row.
+    """
+    count_deleted_rows(counts)
+    if not cells:
+        return
+    YearlyRateAggregate.objects.refresh((currency_id, year) for currency_id, year, _ in cells)
+    RateSummary.objects.discard(cells)
+    transaction.on_commit(lambda: publish_rate_changes(cells))
+    transaction.on_commit(bump_data_version)
+
+
+# TRIGGER: Keeps the materialized RateSummary in step with MonthlyRate and Currency
+@receiver(post_save, sender=MonthlyRate)
+def refresh_rate_summary(sender, instance, **kwargs):
+    RateSummary.objects.refresh(MonthlyRate.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Currency)
+def refresh_currency_summary(sender, instance, created, **kwargs):
+    if not created:
+        RateSummary.objects.refresh_currency(instance)
@@ -0,0 +1,248 @@
+import threading
+
+import numpy as np
+
+# Cells one refresh re-reads at most; bigger writes reload the whole matrix lazily instead
+MAX_REFRESH_CELLS = 500
+
+
+def period_index(year, month):
+    """Map a (year, month) pair onto a single monthly period number"""
+    return int(year) * 12 + int(month) - 1
+
+
+class RateSnapshot:
+    """Immutable view of every MonthlyRate held as a dense NumPy matrix"""
+
+    def __init__(self, currencies, rows, rates, first_period, base_currencies, quote_directions, cross_rates,
+                 country_keys):
+        # Keyed by the normalized (country_key, indicator_key) pair, like Currency.objects.by_indicator
+        self.currencies = currencies
+        # currency id -> row in the rate matrix
+        self.rows = rows
+        # rates[row, period - first_period], NaN where no rate is stored
+        self.rates = rates
+        self.first_period = first_period
+        # Per-row Currency.base_currency / Currency.quote_direction
+        self.base_currencies = base_currencies
+        self.quote_directions = quote_directions
+        # cross_rates[base_currency, period - first_period]: USD value of one base unit that month
+        self.cross_rates = cross_rates
+        # Per-row Currency.country_key, needed to re-derive cross rates after a patch
+        self.country_keys = country_keys
+
+    def get_currency(self, country, indicator):
+        from .models import normalize_key
+        return self.currencies.get((normalize_key(str(country)), normalize_key(str(indicator))))
+
+    def _rows(self, currency_ids):
+        return np.array([self.rows.get(currency_id, -1) for currency_id in currency_ids], dtype=np.int64)
+
+    def get_quote(self, currency_id):
+        """Return (base_currency, quote_direction) for a currency"""
+        row = self.rows[currency_id]
+        return int(self.base_currencies[row]), int(self.quote_directions[row])
+
+    def get_quotes(self, currency_ids):
+        """Vectorized get_quote; every id must belong to the snapshot"""
+        rows = self._rows(currency_ids)
+        return self.base_currencies[rows], self.quote_directions[rows]
+
+    def get_base_value(self, base_currency, year, month):
+        """USD value of one unit of a base currency in a given month, clamped to the stored range"""
+        column = period_index(year, month) - self.first_period
+        column = min(max(column, 0), self.cross_rates.shape[1] - 1)
+        return float(self.cross_rates[base_currency, column])
+
+    def get_base_values(self, base_currencies, years, months):
+        """Vectorized get_base_value"""
+        columns = np.asarray(years, dtype=np.int64) * 12 + np.asarray(months, dtype=np.int64) - 1 - self.first_period
+        columns = np.clip(columns, 0, self.cross_rates.shape[1] - 1)
+        return self.cross_rates[base_currencies, columns]
+
+    def get_rate(self, currency_id, year, month):
+        """Rate of one month, or None for unknown currencies, months outside 1-12 and missing data"""
+        row = self.rows.get(currency_id)
+        if row is None or not 1 <= int(month) <= 12:
+            return None
+
+        column = period_index(year, month) - self.first_period
+        if column < 0 or column >= self.rates.shape[1]:
+            return None
+
+        rate = self.rates[row, column]
+        return None if np.isnan(rate) else float(rate)
+
+    def get_rates(self, currency_ids, years, months):
+        """Vectorized get_rate; returns a float array with NaN where no rate is stored"""
+        rows = self._rows(currency_ids)
+        months = np.asarray(months, dtype=np.int64)
+        columns = np.asarray(years, dtype=np.int64) * 12 + months - 1 - self.first_period
+
+        # Months outside 1-12 would roll over into a neighbouring year
+        found = (rows >= 0) & (months >= 1) & (months <= 12) & (columns >= 0) & (columns < self.rates.shape[1])
+        result = np.full(len(rows), np.nan)
+        result[found] = self.rates[rows[found], columns[found]]
+        return result
+
+    def with_rates(self, changes):
+        """
+        Copy of this snapshot with (currency_id, year, month, rate) changes applied.
+
+        Only the cross rates of the touched months are re-derived. Returns None when a change
+        falls outside the matrix (unknown currency or month), which needs a full reload.
+        """
+        from .conversion import derive_cross_rates
+
+        rates = self.rates.copy()
+        columns = set()
+        for currency_id, year, month, rate in changes:
+            row = self.rows.get(int(currency_id))
+            column = period_index(year, month) - self.first_period
+            if row is None or column < 0 or column >= rates.shape[1]:
+                return None
+            rates[row, column] = rate
+            columns.add(column)
+
+        cross_rates = self.cross_rates.copy()
+        columns = sorted(columns)
+        cross_rates[:, columns] = derive_cross_rates(
+            self.country_keys, self.base_currencies, self.quote_directions, rates[:, columns]
+        )
+        return RateSnapshot(
+            self.currencies, self.rows, rates, self.first_period, self.base_currencies,
+            self.quote_directions, cross_rates, self.country_keys
+        )
+
+
+class RateStore:
+    """Per-worker cache of all rates, refreshed cell by cell on rate writes and rebuilt lazily after any other write"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loaded_generation = -1
+        self._snapshot = None
+
+    def invalidate(self):
+        self._generation += 1
+
+    def refresh(self, cells):
+        """
+        Re-read committed (currency_id, year, month) cells from the database into the loaded snapshot.
+
+        Cheaper than invalidate(): only the touched rows are read and readers keep a current
+        snapshot. The read happens under the store lock, so refreshes apply in the order they
+        read and a late message can never put back an older rate. Batches above
+        MAX_REFRESH_CELLS, or cells the snapshot cannot hold, fall back to invalidate().
+        """
+        from django.db.models import Q
+        from .models import MonthlyRate
+
+        cells = {(int(currency_id), int(year), int(month)) for currency_id, year, month in cells}
+        with self._lock:
+            snapshot = self.peek()
+            if snapshot is None or not cells:
+                # Nothing loaded, or already stale: the next read reloads from the database anyway
+                return
+            if len(cells) > MAX_REFRESH_CELLS:
+                self.invalidate()
+                return
+
+            # INDEX: One idx_currency_date range per touched currency-year
+            touched = Q()
+            for currency_id, year in {(currency_id, year) for currency_id, year, _ in cells}:
+                touched |= Q(currency_id=currency_id, year=year)
+            stored = {
+                (currency_id, year, month): rate
+                for currency_id, year, month, rate in MonthlyRate.objects.filter(touched).values_list(
+                    'currency_id', 'year', 'month', 'rate'
+                )
+            }
+            # Deleted rows go back to "no rate"
+            patched = snapshot.with_rates([
+                (currency_id, year, month, stored.get((currency_id, year, month), np.nan))
+                for currency_id, year, month in cells
+            ])
+            if patched is None:
+                self.invalidate()
+            else:
+                self._snapshot = patched
+
+    def peek(self):
+        """Return the current snapshot without touching the database, or None if it is stale"""
+        if self._loaded_generation == self._generation:
+            return self._snapshot
+        return None
+
+    def snapshot(self):
+        """Return a fresh snapshot, reloading from the database if a write happened since the last load"""
+        snapshot = self.peek()
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            # Record the generation before reading so a write landing mid-load forces another reload
+            generation = self._generation
+            if self._loaded_generation != generation:
+                self._snapshot = self._load()
+                self._loaded_generation = generation
+            return self._snapshot
+
+    def _load(self):
+        from .conversion import derive_cross_rates
+        from .models import Currency, MonthlyRate
+
+        currencies = {}
+        rows = {}
+        country_keys = []
+        quotes = []
+        for row, (currency_id, country, indicator, country_key, indicator_key, base, direction) in enumerate(
+            Currency.objects.order_by('id').values_list(
+                'id', 'COUNTRY', 'INDICATOR', 'country_key', 'indicator_key', 'base_currency', 'quote_direction'
+            )
+        ):
+            rows[currency_id] = row
+            country_keys.append(country_key)
+            quotes.append((base, direction))
+            currencies[(country_key, indicator_key)] = {
+                'id': currency_id,
+                'country': country,
+                'indicator': indicator
+            }
+
+        records = np.array(
+            list(MonthlyRate.objects.order_by().values_list('currency_id', 'year', 'month', 'rate')),
+            dtype=np.float64
+        ).reshape(-1, 4)
+
+        quotes = np.array(quotes, dtype=np.int64).reshape(-1, 2)
+        base_currencies, quote_directions = quotes[:, 0], quotes[:, 1]
+
+        periods = (records[:, 1] * 12 + records[:, 2] - 1).astype(np.int64)
+        first_period = int(periods.min()) if len(periods) else 0
+        last_period = int(periods.max()) if len(periods) else 0
+        rates = np.full((len(rows), last_period - first_period + 1), np.nan)
+
+        # Rates for currencies created after the currency read above are dropped; that write
+        # has already bumped the generation, so the next lookup reloads anyway
+        currency_ids = records[:, 0].astype(np.int64)
+        id_to_row = np.full(max(rows, default=0) + 1, -1, dtype=np.int64)
+        id_to_row[list(rows)] = list(rows.values())
+        known = currency_ids < len(id_to_row)
+        row_index = np.full(len(currency_ids), -1, dtype=np.int64)
+        row_index[known] = id_to_row[currency_ids[known]]
+        known = row_index >= 0
+        rates[row_index[known], periods[known] - first_period] = records[known, 3]
+
+        # EUR/SDR values per month, derived once per load so conversions never query for them
+        cross_rates = derive_cross_rates(country_keys, base_currencies, quote_directions, rates)
+
+        return RateSnapshot(
+            currencies, rows, rates, first_period, base_currencies, quote_directions, cross_rates,
+            country_keys
+        )
+
+
+# One store per worker process, shared by every consumer in it
+rate_store = RateStore()
@@ -0,0 +1,84 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from collections import Counter
+
+# Write generation the current task's reads must not predate, set per message by the consumer
+read_after = contextvars.ContextVar('read_after', default=0)
+
+
+class SingleFlight:
+    """
+    Per-worker request coalescing: concurrent calls with the same key share one in-flight task.
+
+    Keys are tuples whose first item names the query, which is what the counters are grouped
+    by. Callers share the result object, so it must be treated as read-only.
+
+    A joined flight may have started before a write committed. Callers that must see a write
+    pass the generation mark_write() returned for it as `after` and only join later flights;
+    the consumer does so for the messages following a write on the same connection. Writes
+    of other connections are not waited for: their readers may get a result read just before.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (task, write generation when it started)
+        self._calls = {}
+        self._generation = 0
+        self._executed = Counter()
+        self._coalesced = Counter()
+
+    def mark_write(self):
+        """Record a committed write; returns the generation later reads must not predate"""
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    async def do(self, key, call, after=0):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task, generation = self._calls.get(key, (None, None))
+            # A task of another event loop (e.g. an async_to_sync caller) cannot be awaited here
+            if task is not None and task.get_loop() is loop and generation >= after:
+                self._coalesced[key[0]] += 1
+            else:
+                task = loop.create_task(call())
+                self._calls[key] = (task, self._generation)
+                self._executed[key[0]] += 1
+                task.add_done_callback(functools.partial(self._finished, key))
+        # Shielded: a caller cancelled on disconnect must not cancel the query for the others
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        with self._lock:
+            if self._calls.get(key, (None,))[0] is task:
+                del self._calls[key]
+
+    def metrics(self):
+        with self._lock:
+            executed, coalesced = dict(self._executed), dict(self._coalesced)
+            in_flight = len(self._calls)
+        return {
+            'executed': sum(executed.values()),
+            'coalesced': sum(coalesced.values()),
+            'in_flight': in_flight,
+            'by_query': {
+                name: {'executed': executed.get(name, 0), 'coalesced': coalesced.get(name, 0)}
+                for name in sorted(executed.keys() | coalesced.keys())
+            }
+        }
+
+
+# One coalescer per worker process, shared by every consumer in it
+flights = SingleFlight()
+
+
+def single_flight(key):
+    """Coalesce concurrent calls of an async query helper; key maps its arguments to (name, *params)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await flights.do(key(*args, **kwargs), lambda: func(*args, **kwargs), after=read_after.get())
+        return wrapper
+    return decorator
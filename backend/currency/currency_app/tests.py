@@ -1,3 +1,1521 @@
-from django.test import TestCase
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .broadcast import RATE_CHANGED_EVENT, RateBroadcaster, currency_group
+from .cache import bump_data_version, get_data_version, get_or_build, make_key
+from .consumers import CurrencyConsumer
+from .conversion import EUR_TO_USD, SDR_TO_USD, convert_batch, derive_cross_rates
+from .encoding import CODECS, JSON_CODEC, EncodedPayloadCache, dumps, loads, negotiate_codec
+from .history import lttb_indices, minmax_indices
+from .invalidation import (
+    INVALIDATION_EVENT, INVALIDATION_GROUP, InvalidationListener, InvalidationListenerMiddleware, _listeners
+)
+from .management.commands import benchmark_concurrency, benchmark_load, seed_currencies
+from .models import (
+    BaseCurrency, Currency, CurrencyRateAudit, MonthlyRate, QuoteDirection, RateSummary, TableCounter,
+    YearlyRateAggregate, classify_indicator
+)
+from .rate_store import RateStore, rate_store
+from .singleflight import SingleFlight, read_after
+
+
+class NormalizedLookupKeyTests(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Viet Nam',
+            INDICATOR='Domestic currency per US Dollar',
+            FREQUENCY='Monthly',
+            SCALE='Units'
+        )
+
+    def test_keys_are_kept_in_sync_on_save(self):
+        self.assertEqual(self.currency.country_key, 'viet nam')
+        self.assertEqual(self.currency.indicator_key, 'domestic currency per us dollar')
+
+        self.currency.COUNTRY = 'VIET NAM (Socialist Republic)'
+        self.currency.save(update_fields=['COUNTRY'])
+        self.currency.refresh_from_db()
+        self.assertEqual(self.currency.country_key, 'viet nam (socialist republic)')
+
+    def test_lookups_are_case_insensitive(self):
+        found = Currency.objects.by_indicator('VIET nam', 'domestic CURRENCY per us dollar').get()
+        self.assertEqual(found.pk, self.currency.pk)
+        self.assertEqual(Currency.objects.by_country(' viet NAM ').count(), 1)
+
+    def test_currency_lookup_seeks_key_index(self):
+        plan = Currency.objects.by_indicator('Viet Nam', 'Domestic currency per US Dollar').explain()
+        self.assertIn('USING INDEX idx_country_indicator_key', plan)
+
+        plan = Currency.objects.by_country('Viet Nam').explain()
+        self.assertIn('USING INDEX idx_country_indicator_key', plan)
+
+    def test_audit_lookup_seeks_key_index(self):
+        CurrencyRateAudit.objects.create(currency_country='Viet Nam', year=2024, month=1, new_rate=1.0)
+
+        logs = CurrencyRateAudit.objects.by_country('VIET NAM')
+        self.assertEqual(logs.count(), 1)
+        self.assertIn('USING INDEX idx_audit_country_key_date', logs.order_by('-updated_at').explain())
+
+
+class IndicatorClassificationTests(TestCase):
+    def test_indicator_forms(self):
+        DPB, BPD = QuoteDirection.DOMESTIC_PER_BASE, QuoteDirection.BASE_PER_DOMESTIC
+        cases = {
+            'Domestic currency per US Dollar': (BaseCurrency.USD, DPB),
+            'US Dollar per domestic currency': (BaseCurrency.USD, BPD),
+            'Domestic currency per Euro': (BaseCurrency.EUR, DPB),
+            '  EURO PER DOMESTIC CURRENCY ': (BaseCurrency.EUR, BPD),
+            'Domestic currency per SDR': (BaseCurrency.SDR, DPB),
+            'SDR per domestic currency': (BaseCurrency.SDR, BPD),
+            'Nominal effective exchange rate': (BaseCurrency.OTHER, DPB),
+            '': (BaseCurrency.OTHER, DPB),
+            None: (BaseCurrency.OTHER, DPB),
+        }
+        for indicator, expected in cases.items():
+            with self.subTest(indicator=indicator):
+                self.assertEqual(classify_indicator(indicator), expected)
+
+    def test_currencies_are_classified_when_saved(self):
+        currency = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='US Dollar per domestic currency', FREQUENCY='Monthly', SCALE='Units'
+        )
+        currency.refresh_from_db()
+        self.assertEqual(
+            (currency.base_currency, currency.quote_direction), (BaseCurrency.USD, QuoteDirection.BASE_PER_DOMESTIC)
+        )
+
+        currency.INDICATOR = 'Domestic currency per SDR'
+        currency.save(update_fields=['INDICATOR'])
+        currency.refresh_from_db()
+        self.assertEqual(
+            (currency.base_currency, currency.quote_direction), (BaseCurrency.SDR, QuoteDirection.DOMESTIC_PER_BASE)
+        )
+
+        currency.INDICATOR = ''
+        currency.save()
+        currency.refresh_from_db()
+        self.assertEqual(currency.base_currency, BaseCurrency.OTHER)
+
+    def test_bulk_loaders_classify_through_sync_derived_fields(self):
+        currency = Currency(COUNTRY='Japan', INDICATOR='Euro per domestic currency', FREQUENCY='Monthly', SCALE='Units')
+        currency.sync_derived_fields()
+        Currency.objects.bulk_create([currency])
+
+        stored = Currency.objects.values_list('base_currency', 'quote_direction', 'indicator_key').get()
+        self.assertEqual(stored, (BaseCurrency.EUR, QuoteDirection.BASE_PER_DOMESTIC, 'euro per domestic currency'))
+
+
+class AuditTriggerTests(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Japan',
+            INDICATOR='Domestic currency per US Dollar',
+            FREQUENCY='Monthly',
+            SCALE='Units'
+        )
+
+    def test_update_writes_audit_row_in_the_same_statement(self):
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 150.0)
+        self.assertFalse(CurrencyRateAudit.objects.exists())
+
+        with self.assertNumQueries(1):
+            MonthlyRate.objects.filter(currency=self.currency, year=2024, month=1).update(rate=120.0)
+
+        audit = CurrencyRateAudit.objects.get()
+        self.assertEqual(audit.currency_country, 'Japan')
+        self.assertEqual(audit.currency_country_key, 'japan')
+        self.assertEqual(audit.currency_indicator, 'Domestic currency per US Dollar')
+        self.assertEqual((audit.year, audit.month), (2024, 1))
+        self.assertEqual((audit.old_rate, audit.new_rate), (150.0, 120.0))
+        self.assertAlmostEqual(audit.change_percentage, -20.0)
+        self.assertIsNotNone(audit.updated_at)
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.AUDITS], 1)
+
+    def test_update_rate_procedure_is_audited(self):
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 150.0)
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 165.0)
+
+        audit = CurrencyRateAudit.objects.by_country('japan').get()
+        self.assertAlmostEqual(audit.change_percentage, 10.0)
+
+
+class RateStoreConsumerTests(TransactionTestCase):
+    # Committed for real: the consumer reads through the read pool's own connections
+
+    def setUp(self):
+        cache.clear()
+        rate_store.invalidate()
+        self.yen = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        self.dong = Currency.objects.create(
+            COUNTRY='Viet Nam', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        MonthlyRate.update_rate_procedure(self.yen.id, 2024, 1, 150.0)
+        MonthlyRate.update_rate_procedure(self.dong.id, 2024, 1, 25000.0)
+        self.convert = {
+            'type': 'convert', 'amount': 150, 'year': 2024, 'month': 1,
+            'from_country': 'Japan', 'from_indicator': 'Domestic currency per US Dollar',
+            'to_country': 'Viet Nam', 'to_indicator': 'Domestic currency per US Dollar'
+        }
+
+    def exchange(self, *messages):
+        """Send messages over one socket, one at a time, and return the replies"""
+        async def run():
+            communicator = WebsocketCommunicator(CurrencyConsumer.as_asgi(), '/ws/currency/')
+            await communicator.connect()
+            await communicator.receive_json_from()  # connection_established
+            replies = []
+            for message in messages:
+                await communicator.send_json_to(message)
+                replies.append(await communicator.receive_json_from(timeout=5))
+            await communicator.disconnect()
+            return replies
+        return async_to_sync(run)()
+
+    def test_conversions_are_answered_from_one_load(self):
+        with mock.patch.object(rate_store, '_load', wraps=rate_store._load) as load:
+            first, second = self.exchange(self.convert, {**self.convert, 'amount': 300})
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(first['type'], 'conversion_result')
+        self.assertEqual((first['data']['from_rate'], first['data']['to_rate']), (150.0, 25000.0))
+        self.assertAlmostEqual(first['data']['converted_amount'], 25000.0)
+        self.assertAlmostEqual(second['data']['converted_amount'], 50000.0)
+
+    def test_unknown_currencies_and_months_are_reported(self):
+        unknown, missing = self.exchange(
+            {**self.convert, 'from_country': 'Atlantis'}, {**self.convert, 'month': 2}
+        )
+        self.assertEqual(unknown, {'type': 'error', 'message': 'Currency not found'})
+        self.assertEqual(missing, {'type': 'error', 'message': 'No rate data for 2024-2'})
+
+        snapshot = rate_store.snapshot()
+        self.assertIsNone(snapshot.get_rate(self.dong.id + 1, 2024, 1))
+        # Only ids resolved through get_currency may be passed to get_quote
+        with self.assertRaises(KeyError):
+            snapshot.get_quote(self.dong.id + 1)
+
+    def test_months_outside_the_year_are_not_rolled_over(self):
+        MonthlyRate.update_rate_procedure(self.yen.id, 2023, 12, 140.0)
+        MonthlyRate.update_rate_procedure(self.dong.id, 2023, 12, 24000.0)
+        MonthlyRate.update_rate_procedure(self.yen.id, 2024, 2, 155.0)
+        MonthlyRate.update_rate_procedure(self.dong.id, 2024, 2, 25500.0)
+
+        thirteenth, zeroth, as_strings = self.exchange(
+            {**self.convert, 'year': 2023, 'month': 13},
+            {**self.convert, 'month': 0},
+            {**self.convert, 'year': '2024', 'month': '1'}
+        )
+        self.assertEqual(thirteenth, {'type': 'error', 'message': 'No rate data for 2023-13'})
+        self.assertEqual(zeroth, {'type': 'error', 'message': 'No rate data for 2024-0'})
+        self.assertEqual((as_strings['data']['year'], as_strings['data']['month']), (2024, 1))
+        self.assertIsNone(rate_store.snapshot().get_rate(self.yen.id, 2024, 14))
+
+    def test_update_rate_then_convert_is_not_stale(self):
+        with mock.patch.object(rate_store, '_load', wraps=rate_store._load) as load:
+            before, updated, after = self.exchange(
+                self.convert,
+                {'type': 'update_rate', 'currency_id': self.yen.id, 'year': 2024, 'month': 1, 'rate': 125.0},
+                self.convert
+            )
+
+        self.assertEqual(updated['type'], 'rate_update_result')
+        self.assertAlmostEqual(before['data']['converted_amount'], 25000.0)
+        self.assertEqual(after['data']['from_rate'], 125.0)
+        self.assertAlmostEqual(after['data']['converted_amount'], 30000.0)
+        # The written month was refreshed in place rather than reloading the matrix
+        self.assertEqual(load.call_count, 1)
+
+    def test_only_committed_writes_reach_the_store(self):
+        snapshot = rate_store.snapshot()
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            MonthlyRate.update_rate_procedure(self.yen.id, 2024, 1, 999.0)
+            raise RuntimeError('rolled back')
+        self.assertIs(rate_store.peek(), snapshot)
+
+        Currency.objects.create(
+            COUNTRY='Thailand', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        self.assertIsNone(rate_store.peek())
+        self.assertIsNotNone(rate_store.snapshot().get_currency('thailand', 'domestic currency per us dollar'))
+
+
+class ConcurrentMessageTests(SimpleTestCase):
+    """Handlers are replaced by coroutines the test releases, so no database is involved"""
+
+    def run_socket(self, scenario, **handlers):
+        async def run():
+            with mock.patch.multiple(CurrencyConsumer, **handlers):
+                communicator = WebsocketCommunicator(CurrencyConsumer.as_asgi(), '/ws/currency/')
+                await communicator.connect()
+                await communicator.receive_json_from()  # connection_established
+                try:
+                    await scenario(communicator)
+                finally:
+                    await communicator.disconnect()
+        async_to_sync(run)()
+
+    def test_replies_echo_the_request_id_out_of_order(self):
+        release = asyncio.Event()
+
+        async def slow_conversion(consumer, data):
+            await release.wait()
+            await consumer.send_message({'type': 'conversion_result'})
+
+        async def scenario(communicator):
+            await communicator.send_json_to({'type': 'convert', 'request_id': 'slow'})
+            await communicator.send_json_to({'type': 'echo', 'request_id': 'fast'})
+            fast = await communicator.receive_json_from()
+            release.set()
+            slow = await communicator.receive_json_from()
+            self.assertEqual((fast['type'], fast['request_id']), ('echo', 'fast'))
+            self.assertEqual(slow, {'type': 'conversion_result', 'request_id': 'slow'})
+
+        self.run_socket(scenario, handle_conversion=slow_conversion)
+
+    def test_in_flight_handlers_are_bounded(self):
+        started = []
+        release = asyncio.Event()
+
+        async def blocked_conversion(consumer, data):
+            started.append(data['request_id'])
+            await release.wait()
+            await consumer.send_message({'type': 'conversion_result'})
+
+        async def scenario(communicator):
+            for number in range(3):
+                await communicator.send_json_to({'type': 'convert', 'request_id': number})
+            await asyncio.sleep(0.05)
+            # The third frame waits on the receive loop for a free slot
+            self.assertEqual(started, [0, 1])
+            release.set()
+            replies = {(await communicator.receive_json_from())['request_id'] for _ in range(3)}
+            self.assertEqual(replies, {0, 1, 2})
+            self.assertEqual(started, [0, 1, 2])
+
+        with mock.patch('currency_app.consumers.MAX_IN_FLIGHT_PER_CONNECTION', 2):
+            self.run_socket(scenario, handle_conversion=blocked_conversion)
+
+    def test_disconnect_cancels_running_handlers(self):
+        outcome = []
+
+        async def endless_conversion(consumer, data):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                outcome.append('cancelled')
+                raise
+
+        async def scenario(communicator):
+            await communicator.send_json_to({'type': 'convert', 'request_id': 'abandoned'})
+            await asyncio.sleep(0.05)
+
+        self.run_socket(scenario, handle_conversion=endless_conversion)
+        self.assertEqual(outcome, ['cancelled'])
+
+    def test_writes_are_ordered_with_the_reads_around_them(self):
+        events = []
+
+        async def read(consumer, data):
+            events.append(f"read {data['request_id']} start")
+            await asyncio.sleep(0.02)
+            events.append(f"read {data['request_id']} end")
+            await consumer.send_message({'type': 'conversion_result'})
+
+        async def write(consumer, data):
+            events.append('write start')
+            await asyncio.sleep(0.02)
+            events.append('write end')
+            await consumer.send_message({'type': 'rate_update_result'})
+
+        async def scenario(communicator):
+            for message in ({'type': 'convert', 'request_id': 'before'},
+                            {'type': 'update_rate', 'request_id': 'write'},
+                            {'type': 'convert', 'request_id': 'after'},
+                            {'type': 'convert', 'request_id': 'also after'}):
+                await communicator.send_json_to(message)
+            for _ in range(4):
+                await communicator.receive_json_from()
+
+        self.run_socket(scenario, handle_conversion=read, demo_stored_procedure=write)
+        self.assertEqual(events[:4], ['read before start', 'read before end', 'write start', 'write end'])
+        # The reads after the write still overlap each other
+        self.assertEqual(events[4:6], ['read after start', 'read also after start'])
+
+
+class BatchConversionTests(TestCase):
+    def setUp(self):
+        for country, rate in (('Japan', 150.0), ('Viet Nam', 25000.0)):
+            currency = Currency.objects.create(
+                COUNTRY=country, INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+            )
+            MonthlyRate.update_rate_procedure(currency.id, 2024, 1, rate)
+        self.rates = RateStore().snapshot()
+        self.defaults = {
+            'from_country': 'Japan', 'from_indicator': 'Domestic currency per US Dollar',
+            'to_country': 'Viet Nam', 'to_indicator': 'Domestic currency per US Dollar',
+            'year': 2024, 'month': 1
+        }
+
+    def test_items_are_converted_in_order_with_per_item_errors(self):
+        results = convert_batch(self.rates, [
+            {**self.defaults, 'amount': 150},
+            [300, 'Japan', 'Domestic currency per US Dollar', 'Viet Nam', 'Domestic currency per US Dollar', 2024, 1],
+            {'amount': 3},
+            {'from_country': 'Atlantis'},
+            'not an item',
+            {'month': 2},
+            {'year': 'soon'},
+        ], defaults=self.defaults)
+
+        self.assertEqual([result['index'] for result in results], list(range(7)))
+        self.assertEqual([result['status'] for result in results[:3]], ['ok', 'ok', 'ok'])
+        self.assertAlmostEqual(results[0]['converted_amount'], 25000.0)
+        self.assertAlmostEqual(results[1]['converted_amount'], 50000.0)
+        # Fields missing from an item come from the top-level message
+        self.assertAlmostEqual(results[2]['converted_amount'], 500.0)
+        self.assertEqual(results[2]['from_currency']['country'], 'Japan')
+        self.assertEqual([result['message'] for result in results[3:]], [
+            'Currency not found', 'Invalid item', 'No rate data for 2024-2', 'Invalid item'
+        ])
+
+    def test_months_outside_the_year_are_per_item_errors(self):
+        # 2023-13 and 2024-0 would otherwise land on the stored 2024-01 and 2023-12 rates
+        for currency in Currency.objects.all():
+            MonthlyRate.update_rate_procedure(currency.id, 2023, 12, 100.0)
+        rates = RateStore().snapshot()
+
+        results = convert_batch(rates, [
+            {'year': 2023, 'month': 13}, {'year': 2025, 'month': 0}, {'year': 2024, 'month': '1'}
+        ], defaults=self.defaults)
+
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'ok'])
+        self.assertEqual([result.get('message') for result in results[:2]], [
+            'No rate data for 2023-13', 'No rate data for 2025-0'
+        ])
+        self.assertTrue(np.isnan(rates.get_rates([results[2]['from_currency']['id']], [2023], [13])[0]))
+
+    def test_batch_matches_single_conversions(self):
+        single, _ = CurrencyConsumer()._conversion_data(self.rates, {**self.defaults, 'amount': 42})
+        batch, = convert_batch(self.rates, [{'amount': 42}], defaults=self.defaults)
+        self.assertAlmostEqual(batch['converted_amount'], single['converted_amount'])
+        self.assertAlmostEqual(batch['exchange_rate'], single['exchange_rate'])
+
+
+class CrossRateTests(SimpleTestCase):
+    def test_median_of_dual_quoting_countries_with_constant_fallback(self):
+        DPB, BPD = QuoteDirection.DOMESTIC_PER_BASE, QuoteDirection.BASE_PER_DOMESTIC
+        USD, EUR, SDR = BaseCurrency.USD, BaseCurrency.EUR, BaseCurrency.SDR
+        rows = [
+            # country, base, direction, rates of two months
+            ('a', USD, DPB, [100.0, 100.0]),
+            ('a', EUR, DPB, [110.0, np.nan]),
+            ('b', USD, DPB, [10.0, 10.0]),
+            ('b', EUR, BPD, [1 / 12, np.nan]),
+            ('c', USD, DPB, [2.0, 2.0]),
+            ('c', EUR, DPB, [2.6, np.nan]),
+            ('c', SDR, DPB, [3.0, 3.0]),
+            # No USD quote to pair with, so it implies nothing
+            ('d', SDR, DPB, [500.0, 500.0]),
+        ]
+        cross_rates = derive_cross_rates(
+            [country for country, _, _, _ in rows],
+            np.array([base for _, base, _, _ in rows]),
+            np.array([direction for _, _, direction, _ in rows]),
+            np.array([rates for _, _, _, rates in rows])
+        )
+
+        # EUR/USD implied by a, b and c is 1.1, 1.2 and 1.3; the second month has no EUR quote
+        np.testing.assert_allclose(cross_rates[EUR], [1.2, EUR_TO_USD])
+        np.testing.assert_allclose(cross_rates[SDR], [1.5, 1.5])
+        np.testing.assert_allclose(cross_rates[USD], [1.0, 1.0])
+
+    def test_months_without_dual_quotes_use_the_constants(self):
+        cross_rates = derive_cross_rates(
+            ['a'], np.array([BaseCurrency.USD]), np.array([QuoteDirection.DOMESTIC_PER_BASE]), np.array([[100.0]])
+        )
+        self.assertEqual(cross_rates[BaseCurrency.EUR, 0], EUR_TO_USD)
+        self.assertEqual(cross_rates[BaseCurrency.SDR, 0], SDR_TO_USD)
+
+
+class BulkUpdateRatesTests(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Japan',
+            INDICATOR='Domestic currency per US Dollar',
+            FREQUENCY='Monthly',
+            SCALE='Units'
+        )
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 150.0)
+
+    def test_mixed_batch_reports_each_row(self):
+        results = MonthlyRate.procedures.bulk_update_rates([
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 1, 'rate': 165.0},
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 2, 'rate': 151.0},
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 13, 'rate': 1.0},
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 3, 'rate': -1.0},
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 2, 'rate': 152.0},
+            {'currency_id': self.currency.id + 1, 'year': 2024, 'month': 1, 'rate': 1.0},
+            {'currency_id': self.currency.id, 'year': 2024, 'rate': 1.0},
+            {'currency_id': self.currency.id, 'year': 'soon', 'month': 1, 'rate': 1.0},
+        ])
+
+        self.assertEqual([result['index'] for result in results], list(range(8)))
+        self.assertEqual(
+            (results[0]['action'], results[0]['old_rate'], results[0]['change_percentage']), ('updated', 150.0, 10.0)
+        )
+        self.assertEqual((results[1]['action'], results[1]['old_rate']), ('created', None))
+        self.assertEqual([result['error'] for result in results[2:]], [
+            'Month must be between 1-12',
+            'Rate must be positive',
+            'Duplicate currency/year/month in batch',
+            'Currency not found',
+            "Missing parameter: 'month'",
+            'Invalid value',
+        ])
+
+        stored = dict(MonthlyRate.objects.filter(currency=self.currency).values_list('month', 'rate'))
+        self.assertEqual(stored, {1: 165.0, 2: 151.0})
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 2)
+
+    def test_only_updated_rows_are_audited(self):
+        MonthlyRate.procedures.bulk_update_rates([
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 1, 'rate': 120.0},
+            {'currency_id': self.currency.id, 'year': 2024, 'month': 2, 'rate': 151.0},
+        ])
+
+        audit = CurrencyRateAudit.objects.get()
+        self.assertEqual((audit.year, audit.month), (2024, 1))
+        self.assertEqual((audit.old_rate, audit.new_rate), (150.0, 120.0))
+        self.assertAlmostEqual(audit.change_percentage, -20.0)
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.AUDITS], 1)
+
+
+class CurrencyDeleteTests(TestCase):
+    def setUp(self):
+        for country in ('Japan', 'Thailand', 'Viet Nam'):
+            currency = Currency.objects.create(
+                COUNTRY=country, INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+            )
+            for month in (1, 2):
+                MonthlyRate.update_rate_procedure(currency.id, 2024, month, 100.0 + month)
+
+    def test_bulk_delete_updates_counters_and_caches_once(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            deleted, _ = Currency.objects.all().delete()
+
+        self.assertGreater(deleted, 3)
+        # One flush and one data version bump for the whole delete
+        self.assertEqual(len(callbacks), 2)
+        totals = TableCounter.objects.totals()
+        self.assertEqual((totals[TableCounter.CURRENCIES], totals[TableCounter.RATES]), (0, 0))
+
+    def test_single_delete_counts_its_cascaded_rates(self):
+        Currency.objects.by_country('Japan').get().delete()
+
+        totals = TableCounter.objects.totals()
+        self.assertEqual((totals[TableCounter.CURRENCIES], totals[TableCounter.RATES]), (2, 4))
+
+
+class RatesAboveAverageTests(TestCase):
+    def setUp(self):
+        self.currencies = {}
+        for country in ('Japan', 'Viet Nam', 'Thailand'):
+            currency = Currency.objects.create(
+                COUNTRY=country, INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+            )
+            self.currencies[country] = currency
+            for year in (2023, 2024):
+                for month, rate in ((1, 100.0), (2, 110.0), (3, 120.0)):
+                    MonthlyRate.objects.create(currency=currency, year=year, month=month, rate=rate + year - 2023)
+
+    def above(self, countries, year_from, year_to):
+        return [
+            (row['currency__COUNTRY'], row['year'], row['month'], row['rate'], row['average_rate'])
+            for row in MonthlyRate.objects.rates_above_average(countries, year_from, year_to)
+        ]
+
+    def test_each_currency_year_is_its_own_partition(self):
+        self.assertEqual(self.above(['japan'], 2023, 2024), [
+            ('Japan', 2023, 3, 120.0, 110.0), ('Japan', 2024, 3, 121.0, 111.0),
+        ])
+
+    def test_countries_and_years_narrow_the_scan(self):
+        rows = self.above(['JAPAN', ' viet nam '], 2024, 2024)
+        self.assertEqual([(country, year) for country, year, _, _, _ in rows], [('Japan', 2024), ('Viet Nam', 2024)])
+        self.assertEqual(self.above(['Japan'], 2025, 2026), [])
+
+    def test_consumer_caps_countries_and_years(self):
+        consumer = CurrencyConsumer()
+        consumer.send_message = mock.AsyncMock()
+
+        with mock.patch('currency_app.consumers.MAX_ABOVE_AVERAGE_COUNTRIES', 2):
+            async_to_sync(consumer.demo_subquery)({'countries': ['Japan', 'Viet Nam', 'Thailand'], 'year': 2024})
+        consumer.send_message.assert_awaited_with({'type': 'error', 'message': 'Too many countries: 3 (max 2)'})
+
+        async_to_sync(consumer.demo_subquery)({'country': 'Japan', 'year_from': 1900, 'year_to': 2024})
+        consumer.send_message.assert_awaited_with({
+            'type': 'error', 'message': 'Year range too long: 1900-2024 (max 30 years)'
+        })
+
+
+class YearlyRateAggregateTests(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        for month, rate in ((1, 150.0), (2, 160.0), (3, 170.0)):
+            MonthlyRate.update_rate_procedure(self.currency.id, 2024, month, rate)
+        MonthlyRate.update_rate_procedure(self.currency.id, 2023, 12, 140.0)
+
+    def aggregate(self, year=2024):
+        return YearlyRateAggregate.objects.filter(currency=self.currency, year=year).values_list(
+            'count', 'total', 'minimum', 'maximum'
+        ).first()
+
+    def test_saves_refresh_their_currency_year(self):
+        self.assertEqual(self.aggregate(), (3, 480.0, 150.0, 170.0))
+        self.assertEqual(MonthlyRate.calculate_average_rate(self.currency.id, 2024), 160.0)
+
+        # Lowering the maximum needs the other months, not just the old and new rate
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 3, 155.0)
+        self.assertEqual(self.aggregate(), (3, 465.0, 150.0, 160.0))
+        self.assertEqual(self.aggregate(2023), (1, 140.0, 140.0, 140.0))
+
+    def test_rebuild_matches_the_maintained_rows(self):
+        maintained = set(YearlyRateAggregate.objects.values_list('currency_id', 'year', 'count', 'total'))
+        YearlyRateAggregate.objects.rebuild()
+        self.assertEqual(set(YearlyRateAggregate.objects.values_list('currency_id', 'year', 'count', 'total')), maintained)
+
+    def test_queryset_delete_refreshes_once(self):
+        with mock.patch.object(
+            YearlyRateAggregate.objects, 'refresh', wraps=YearlyRateAggregate.objects.refresh
+        ) as refresh, self.captureOnCommitCallbacks(execute=True):
+            deleted, _ = MonthlyRate.objects.filter(currency=self.currency, month__in=[1, 12]).delete()
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(self.aggregate(), (2, 330.0, 160.0, 170.0))
+        # The year lost its last month
+        self.assertIsNone(self.aggregate(2023))
+        self.assertEqual(MonthlyRate.calculate_average_rate(self.currency.id, 2023), 0.0)
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 2)
+
+    def test_instance_delete_refreshes_its_year(self):
+        MonthlyRate.objects.get(currency=self.currency, year=2024, month=3).delete()
+        self.assertEqual(self.aggregate(), (2, 310.0, 150.0, 160.0))
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 3)
+
+    def test_deletes_refresh_the_rate_store_once_committed(self):
+        with mock.patch('currency_app.models.publish_rate_changes') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                MonthlyRate.objects.filter(currency=self.currency, year=2024, month=2).delete()
+            publish.assert_called_once_with([(self.currency.id, 2024, 2)])
+
+    def test_clearing_the_table_drops_every_derived_row(self):
+        with mock.patch('currency_app.models.publish_flush') as flush, self.captureOnCommitCallbacks(execute=True):
+            MonthlyRate.objects.all().delete()
+
+        flush.assert_called_once_with()
+        self.assertFalse(YearlyRateAggregate.objects.exists())
+        self.assertFalse(RateSummary.objects.exists())
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 0)
+
+
+class RateSummaryTests(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 150.0)
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 2, 160.0)
+
+    def rows(self):
+        return set(RateSummary.objects.values_list('country', 'country_key', 'indicator', 'year', 'month', 'rate'))
+
+    def test_rate_saves_upsert_their_row(self):
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 155.0)
+
+        self.assertEqual(self.rows(), {
+            ('Japan', 'japan', 'Domestic currency per US Dollar', 2024, 1, 155.0),
+            ('Japan', 'japan', 'Domestic currency per US Dollar', 2024, 2, 160.0),
+        })
+        self.assertEqual(RateSummary.objects.get(month=1).base_currency_type, BaseCurrency.USD.label)
+
+    def test_renamed_currencies_are_propagated(self):
+        self.currency.COUNTRY = 'Nippon'
+        self.currency.INDICATOR = 'Domestic currency per Euro'
+        self.currency.save()
+
+        self.assertEqual(
+            set(RateSummary.objects.values_list('country', 'country_key', 'indicator', 'base_currency_type')),
+            {('Nippon', 'nippon', 'Domestic currency per Euro', BaseCurrency.EUR.label)}
+        )
+
+    def test_summary_view_reads_the_maintained_rows(self):
+        view = MonthlyRate.objects.get_summary_view().filter(currency__COUNTRY='Japan').order_by('month')
+        self.assertEqual(
+            [(row['currency__COUNTRY'], row['month'], row['rate']) for row in view],
+            [('Japan', 1, 150.0), ('Japan', 2, 160.0)]
+        )
+
+    def test_deleted_rates_leave_the_summary(self):
+        MonthlyRate.objects.filter(currency=self.currency, month=2).delete()
+        self.assertEqual(self.rows(), {('Japan', 'japan', 'Domestic currency per US Dollar', 2024, 1, 150.0)})
+
+        RateSummary.objects.rebuild()
+        self.assertEqual(self.rows(), {('Japan', 'japan', 'Domestic currency per US Dollar', 2024, 1, 150.0)})
+
+
+class RateBroadcastTests(TestCase):
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Japan',
+            INDICATOR='Domestic currency per US Dollar',
+            FREQUENCY='Monthly',
+            SCALE='Units'
+        )
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(currency_group(self.currency.id), self.channel)
+
+    def receive(self):
+        return async_to_sync(self.channel_layer.receive)(self.channel)
+
+    def test_update_rate_procedure_is_pushed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 150.0)
+
+        event = self.receive()
+        self.assertEqual(event['type'], RATE_CHANGED_EVENT)
+        self.assertEqual(event['currency_id'], self.currency.id)
+        self.assertEqual(event['changes'], [{'year': 2024, 'month': 1, 'rate': 150.0}])
+
+    def test_bulk_update_is_pushed_as_one_event_per_currency(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MonthlyRate.procedures.bulk_update_rates([
+                {'currency_id': self.currency.id, 'year': 2024, 'month': month, 'rate': 150.0 + month}
+                for month in (1, 2, 3)
+            ])
+
+        event = self.receive()
+        self.assertEqual([change['month'] for change in event['changes']], [1, 2, 3])
+
+    @override_settings(RATE_BROADCAST_WINDOW=60)
+    def test_changes_within_the_window_are_merged(self):
+        broadcaster = RateBroadcaster()
+        broadcaster.publish([(self.currency.id, 2024, 1, 150.0), (self.currency.id, 2024, 2, 151.0)])
+        broadcaster.publish([(self.currency.id, 2024, 1, 152.0)])
+        broadcaster.flush()
+
+        event = self.receive()
+        self.assertEqual(event['changes'], [
+            {'year': 2024, 'month': 1, 'rate': 152.0},
+            {'year': 2024, 'month': 2, 'rate': 151.0}
+        ])
+        self.assertEqual(loads(event['payloads']['json'])['type'], 'rate_update')
+
+        metrics = broadcaster.metrics()
+        self.assertEqual((metrics['changes_received'], metrics['events_sent']), (3, 1))
+        self.assertEqual(metrics['messages_saved'], 2)
+
+
+class SubscriptionConsumerTests(TransactionTestCase):
+    # Committed for real: pushes re-read the changed cells on the read pool's own connections
+
+    def setUp(self):
+        cache.clear()
+        rate_store.invalidate()
+        self.yen = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        self.dong = Currency.objects.create(
+            COUNTRY='Viet Nam', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        MonthlyRate.update_rate_procedure(self.yen.id, 2024, 1, 150.0)
+        MonthlyRate.update_rate_procedure(self.dong.id, 2024, 1, 25000.0)
+        self.pair = {
+            'amount': 150, 'year': 2024, 'month': 1,
+            'from_country': 'Japan', 'from_indicator': 'Domestic currency per US Dollar',
+            'to_country': 'Viet Nam', 'to_indicator': 'Domestic currency per US Dollar'
+        }
+
+    @mock.patch('currency_app.consumers.MAX_SUBSCRIPTIONS', 2)
+    def test_subscriptions_push_until_unsubscribed(self):
+        async def connect():
+            communicator = WebsocketCommunicator(CurrencyConsumer.as_asgi(), '/ws/currency/')
+            await communicator.connect()
+            await communicator.receive_json_from()  # connection_established
+            return communicator
+
+        async def request(communicator, message):
+            await communicator.send_json_to(message)
+            return await communicator.receive_json_from(timeout=5)
+
+        async def update(writer, rate):
+            reply = await request(writer, {
+                'type': 'update_rate', 'currency_id': self.yen.id, 'year': 2024, 'month': 1, 'rate': rate
+            })
+            self.assertEqual(reply['type'], 'rate_update_result')
+
+        async def run():
+            subscriber, writer = await connect(), await connect()
+
+            subscribed = await request(subscriber, {'type': 'subscribe', 'pair': self.pair})
+            self.assertEqual(subscribed['data']['kind'], 'pair')
+            initial = await subscriber.receive_json_from(timeout=5)
+            self.assertEqual((initial['type'], initial['data']['from_rate']), ('conversion_update', 150.0))
+
+            subscribed = await request(subscriber, {'type': 'subscribe', 'country': 'JAPAN'})
+            self.assertEqual((subscribed['data']['kind'], subscribed['data']['count']), ('country', 2))
+            refused = await request(subscriber, {'type': 'subscribe', 'country': 'Viet Nam'})
+            self.assertEqual(refused, {'type': 'error', 'message': 'Too many subscriptions (max 2)'})
+
+            # Both subscriptions share the yen group, joined once
+            await update(writer, 125.0)
+            pushes = {}
+            for _ in range(2):
+                push = await subscriber.receive_json_from(timeout=5)
+                pushes[push['type']] = push
+            self.assertEqual(set(pushes), {'conversion_update', 'rate_update'})
+            self.assertEqual(pushes['conversion_update']['data']['from_rate'], 125.0)
+            self.assertAlmostEqual(pushes['conversion_update']['data']['converted_amount'], 30000.0)
+            self.assertEqual(pushes['rate_update']['data'], {
+                'currency_id': self.yen.id, 'changes': [{'year': 2024, 'month': 1, 'rate': 125.0}]
+            })
+            self.assertTrue(await subscriber.receive_nothing())
+
+            # The country subscription still holds the yen group
+            unsubscribed = await request(subscriber, {'type': 'unsubscribe', 'pair': self.pair})
+            self.assertEqual(unsubscribed['data']['count'], 1)
+            await update(writer, 130.0)
+            self.assertEqual((await subscriber.receive_json_from(timeout=5))['type'], 'rate_update')
+            self.assertTrue(await subscriber.receive_nothing())
+
+            unsubscribed = await request(subscriber, {'type': 'unsubscribe', 'subscription': 'country:japan'})
+            self.assertEqual(unsubscribed['data']['count'], 0)
+            await update(writer, 135.0)
+            self.assertTrue(await subscriber.receive_nothing())
+
+            missing = await request(subscriber, {'type': 'unsubscribe', 'subscription': 'country:japan'})
+            self.assertEqual(missing, {'type': 'error', 'message': 'Not subscribed: country:japan'})
+
+            await subscriber.disconnect()
+            await writer.disconnect()
+
+        async_to_sync(run)()
+
+
+class InvalidationBusTests(TransactionTestCase):
+    # Committed for real: the listeners re-read their cells on the read pool's own connections
+
+    def setUp(self):
+        self.currency = Currency.objects.create(
+            COUNTRY='Japan',
+            INDICATOR='Domestic currency per US Dollar',
+            FREQUENCY='Monthly',
+            SCALE='Units'
+        )
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 150.0)
+
+        # Two worker processes, each with its own rate store listening in its own event loop
+        self.workers = []
+        for worker_id in ('worker-a', 'worker-b'):
+            loop = asyncio.new_event_loop()
+            self.addCleanup(loop.close)
+            listener = InvalidationListener(RateStore(), worker_id)
+            loop.run_until_complete(listener.subscribe())
+            self.workers.append((loop, listener))
+
+    def deliver(self, messages=1):
+        for loop, listener in self.workers:
+            for _ in range(messages):
+                loop.run_until_complete(asyncio.wait_for(listener.receive(), 1))
+
+    def rates(self, currency_id=None):
+        return [
+            listener.store.snapshot().get_rate(currency_id or self.currency.id, 2024, 1)
+            for _, listener in self.workers
+        ]
+
+    def test_workers_refresh_the_written_month_after_commit(self):
+        self.assertEqual(self.rates(), [150.0, 150.0])
+
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 165.0)
+        self.deliver()
+
+        # Refreshed in place: the new rate is served without reloading the matrix
+        with self.assertNumQueries(0):
+            self.assertEqual(self.rates(), [165.0, 165.0])
+
+    def test_concurrent_writers_converge_on_the_stored_rate(self):
+        self.rates()
+
+        # Two workers write the same month; the first message is read only after the second write
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 200.0)
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 300.0)
+        self.deliver(messages=2)
+
+        self.assertEqual(self.rates(), [300.0, 300.0])
+
+    def test_late_rate_event_does_not_restore_an_older_rate(self):
+        rate_store.snapshot()
+        stale_event = {
+            'type': RATE_CHANGED_EVENT, 'id': 'late', 'currency_id': self.currency.id,
+            'changes': [{'year': 2024, 'month': 1, 'rate': 200.0}]
+        }
+        MonthlyRate.update_rate_procedure(self.currency.id, 2024, 1, 300.0)
+
+        async_to_sync(CurrencyConsumer()._refresh_event_cells)(stale_event)
+        self.assertEqual(rate_store.snapshot().get_rate(self.currency.id, 2024, 1), 300.0)
+
+    def test_currency_writes_drop_every_snapshot(self):
+        self.rates()
+
+        Currency.objects.create(
+            COUNTRY='Viet Nam',
+            INDICATOR='Domestic currency per US Dollar',
+            FREQUENCY='Monthly',
+            SCALE='Units'
+        )
+        self.deliver()
+
+        for _, listener in self.workers:
+            self.assertIsNone(listener.store.peek())
+            self.assertIsNotNone(listener.store.snapshot().get_currency('viet nam', 'domestic currency per us dollar'))
+
+
+class InvalidationGroupExpiryTests(SimpleTestCase):
+    def setUp(self):
+        self.layer = InMemoryChannelLayer()
+        self.listener = InvalidationListener(RateStore(), 'worker-a', channel_layer=self.layer, renew_interval=0.01)
+        self.flush = {'type': INVALIDATION_EVENT, 'origin': 'worker-b', 'cells': None}
+
+    def expire_membership(self):
+        # As if the worker had been up for longer than group_expiry
+        self.layer.groups[INVALIDATION_GROUP][self.listener.channel_name] = 1
+
+    def test_expired_membership_is_renewed(self):
+        async def scenario():
+            await self.listener.subscribe()
+            self.expire_membership()
+            await self.layer.group_send(INVALIDATION_GROUP, self.flush)
+            dropped = self.listener.channel_name not in self.layer.groups[INVALIDATION_GROUP]
+
+            await self.listener.renew()
+            await self.layer.group_send(INVALIDATION_GROUP, self.flush)
+            await asyncio.wait_for(self.listener.receive(), 1)
+            return dropped
+
+        self.assertTrue(asyncio.run(scenario()))
+        self.assertEqual(self.listener.applied, 1)
+
+    def test_running_listener_renews_its_membership(self):
+        async def scenario():
+            task = asyncio.ensure_future(self.listener.run())
+            while self.listener.channel_name is None:
+                await asyncio.sleep(0)
+            self.expire_membership()
+            await asyncio.sleep(0.05)
+
+            await self.layer.group_send(INVALIDATION_GROUP, self.flush)
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.listener.applied, 1)
+
+    def test_listener_starts_at_lifespan_startup(self):
+        application = mock.AsyncMock()
+        sent = []
+
+        async def scenario():
+            messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+
+            async def receive():
+                return next(messages)
+
+            async def send(message):
+                # Already listening when the server is told the worker is up
+                sent.append((message['type'], asyncio.get_running_loop() in _listeners))
+
+            await InvalidationListenerMiddleware(application)({'type': 'lifespan'}, receive, send)
+            _listeners.pop(asyncio.get_running_loop()).cancel()
+
+        asyncio.run(scenario())
+        self.assertEqual(sent, [('lifespan.startup.complete', True), ('lifespan.shutdown.complete', True)])
+        application.assert_not_called()
+
+
+class EncodedPayloadCacheTests(SimpleTestCase):
+    def test_entries_expire_with_the_data_version(self):
+        payloads = EncodedPayloadCache(max_entries=2)
+        payloads.set('countries_list', 1, dumps({'type': 'countries_list'}))
+
+        self.assertEqual(loads(payloads.get('countries_list', 1)), {'type': 'countries_list'})
+        self.assertIsNone(payloads.get('countries_list', 2))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        payloads = EncodedPayloadCache(max_entries=2)
+        payloads.set('a', 1, '"a"')
+        payloads.set('b', 1, '"b"')
+        payloads.get('a', 1)
+        payloads.set('c', 1, '"c"')
+
+        self.assertIsNone(payloads.get('b', 1))
+        self.assertEqual(payloads.get('a', 1), '"a"')
+
+
+class WireCodecTests(SimpleTestCase):
+    def test_clients_without_a_subprotocol_get_json(self):
+        self.assertIs(negotiate_codec([]), JSON_CODEC)
+        self.assertIs(negotiate_codec(['graphql-ws']), JSON_CODEC)
+        self.assertEqual(loads(JSON_CODEC.encode({'rates': np.array([1.5, 2.0])})), {'rates': [1.5, 2.0]})
+
+    def test_request_id_is_added_to_encoded_replies(self):
+        for codec in (JSON_CODEC, *CODECS.values()):
+            encoded = codec.with_field(codec.encode({'type': 'countries_list', 'data': {}}), 'request_id', 'r1')
+            self.assertEqual(codec.decode(encoded), {'type': 'countries_list', 'data': {}, 'request_id': 'r1'})
+
+    @skipUnless('msgpack' in CODECS, 'msgpack is not installed')
+    def test_msgpack_packs_float_arrays_as_raw_float64(self):
+        codec = negotiate_codec(['graphql-ws', 'msgpack'])
+        self.assertEqual(codec.subprotocol, 'msgpack')
+
+        rates = np.linspace(1.0, 2.0, 100)
+        encoded = codec.encode({'type': 'rate_history', 'rates': rates})
+        self.assertIsInstance(encoded, bytes)
+        self.assertLess(len(encoded), len(rates) * 8 + 64)
+
+        decoded = codec.decode(encoded)
+        self.assertEqual(decoded['type'], 'rate_history')
+        np.testing.assert_array_equal(decoded['rates'], rates)
+
+
+@skipUnless('msgpack' in CODECS, 'msgpack is not installed')
+class MessagePackConsumerTests(TransactionTestCase):
+    # Committed for real: the history is read on the read pool's own connections
+
+    def setUp(self):
+        cache.clear()
+        rate_store.invalidate()
+        self.codec = CODECS['msgpack']
+        self.yen = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        MonthlyRate.procedures.bulk_update_rates([
+            {'currency_id': self.yen.id, 'year': 2024, 'month': month, 'rate': 150.0 + month / 4}
+            for month in range(1, 13)
+        ])
+
+    def test_msgpack_subprotocol_gets_binary_replies(self):
+        async def run():
+            communicator = WebsocketCommunicator(
+                CurrencyConsumer.as_asgi(), '/ws/currency/', subprotocols=['graphql-ws', 'msgpack']
+            )
+            connected, subprotocol = await communicator.connect()
+            greeting = await communicator.receive_output()
+
+            # Binary frames are msgpack; text frames are still read as JSON
+            await communicator.send_to(bytes_data=self.codec.encode({
+                'type': 'get_rate_history', 'currency_id': self.yen.id, 'year_from': 2024, 'year_to': 2024,
+                'request_id': 7
+            }))
+            history = await communicator.receive_output(timeout=5)
+            await communicator.send_to(text_data=dumps({'type': 'echo', 'request_id': 'text'}))
+            echo = await communicator.receive_output(timeout=5)
+            await communicator.send_to(bytes_data=b'\xc1')
+            invalid = await communicator.receive_output(timeout=5)
+            await communicator.disconnect()
+            return connected, subprotocol, greeting, history, echo, invalid
+
+        connected, subprotocol, greeting, history, echo, invalid = async_to_sync(run)()
+
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, 'msgpack')
+        self.assertNotIn('text', greeting)
+        self.assertEqual(self.codec.decode(greeting['bytes'])['type'], 'connection_established')
+
+        reply = self.codec.decode(history['bytes'])
+        self.assertEqual((reply['type'], reply['request_id']), ('rate_history', 7))
+        values = reply['data']['values']
+        self.assertIsInstance(values, np.ndarray)
+        self.assertEqual(values.dtype, np.dtype('<f8'))
+        np.testing.assert_array_equal(values, 150.0 + np.arange(1, 13) / 4)
+        # The float64 array went out as one extension value, not 12 msgpack floats
+        self.assertIn(values.tobytes(), history['bytes'])
+
+        self.assertEqual(self.codec.decode(echo['bytes'])['request_id'], 'text')
+        self.assertEqual(self.codec.decode(invalid['bytes']), {'type': 'error', 'message': 'Invalid msgpack'})
+
+
+class DownsamplingTests(SimpleTestCase):
+    def setUp(self):
+        self.x = np.arange(300, dtype=np.float64)
+        self.y = np.sin(self.x / 10)
+        self.y[150] = 5.0
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        picked = lttb_indices(self.x, self.y, 50)
+        self.assertEqual(len(picked), 50)
+        self.assertEqual((picked[0], picked[-1]), (0, 299))
+        self.assertIn(150, picked)
+        self.assertTrue(np.all(np.diff(picked) > 0))
+
+    def test_minmax_keeps_bucket_extremes(self):
+        picked = minmax_indices(self.x, self.y, 50)
+        self.assertLessEqual(len(picked), 50)
+        self.assertIn(150, picked)
+        self.assertIn(int(np.argmin(self.y)), picked)
+
+    def test_minmax_fills_an_odd_point_with_the_last_sample(self):
+        picked = minmax_indices(self.x, self.y, 5)
+        self.assertEqual(len(picked), 5)
+        self.assertEqual(picked[-1], 299)
+        self.assertEqual(len(minmax_indices(self.x, self.y, 4)), 4)
+
+    def test_short_series_are_returned_whole(self):
+        np.testing.assert_array_equal(lttb_indices(self.x[:10], self.y[:10], 50), np.arange(10))
+
+
+class RateHistoryConsumerTests(TransactionTestCase):
+    # Committed for real: the history is read on the read pool's own connections
+
+    def setUp(self):
+        cache.clear()
+        rate_store.invalidate()
+        self.yen = Currency.objects.create(
+            COUNTRY='Japan', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        self.dong = Currency.objects.create(
+            COUNTRY='Viet Nam', INDICATOR='Domestic currency per US Dollar', FREQUENCY='Monthly', SCALE='Units'
+        )
+        rows = [
+            {'currency_id': currency.id, 'year': year, 'month': month, 'rate': base + year - 2020 + month / 100}
+            for currency, base in ((self.yen, 100.0), (self.dong, 20000.0))
+            for year in (2020, 2021) for month in range(1, 13)
+        ]
+        # The dong misses one month, which the pair series then skips
+        MonthlyRate.procedures.bulk_update_rates([
+            row for row in rows if (row['currency_id'], row['year'], row['month']) != (self.dong.id, 2021, 6)
+        ])
+        self.history = {'type': 'get_rate_history', 'currency_id': self.yen.id, 'year_from': 2020, 'year_to': 2021}
+
+    def exchange(self, *messages, subprotocols=None):
+        async def run():
+            communicator = WebsocketCommunicator(
+                CurrencyConsumer.as_asgi(), '/ws/currency/', subprotocols=subprotocols
+            )
+            await communicator.connect()
+            await communicator.receive_output()  # connection_established
+            replies = []
+            for message in messages:
+                await communicator.send_json_to(message)
+                replies.append(await communicator.receive_output(timeout=5))
+            await communicator.disconnect()
+            return replies
+        replies = async_to_sync(run)()
+        codec = CODECS['msgpack'] if subprotocols else JSON_CODEC
+        return [codec.decode(reply.get('bytes') or reply.get('text')) for reply in replies]
+
+    def test_single_series_and_pair(self):
+        single, pair = self.exchange(
+            self.history,
+            {**self.history, 'currency_id': None, 'country': 'Viet Nam', 'to_currency_id': self.yen.id}
+        )
+
+        self.assertEqual(single['type'], 'rate_history')
+        data = single['data']
+        self.assertEqual((data['value'], data['total_points'], data['points'], data['downsampling']),
+                         ('rate', 24, 24, None))
+        self.assertEqual((data['years'][0], data['months'][0], data['values'][0]), (2020, 1, 100.01))
+        self.assertEqual((data['years'][-1], data['months'][-1], data['values'][-1]), (2021, 12, 101.12))
+
+        data = pair['data']
+        self.assertEqual((data['value'], data['total_points']), ('exchange_rate', 23))
+        self.assertNotIn((2021, 6), set(zip(data['years'], data['months'])))
+        self.assertAlmostEqual(data['values'][0], 100.01 / 20000.01)
+
+    def test_downsampling_and_its_validation(self):
+        lttb, minmax, too_few, not_a_number, unknown = self.exchange(
+            {**self.history, 'max_points': 6},
+            {**self.history, 'max_points': 6, 'downsample': 'minmax'},
+            {**self.history, 'max_points': 2},
+            {**self.history, 'max_points': 'many'},
+            {**self.history, 'max_points': 6, 'downsample': 'average'},
+        )
+
+        self.assertEqual((lttb['data']['points'], lttb['data']['downsampling']), (6, 'lttb'))
+        self.assertEqual((minmax['data']['points'], minmax['data']['downsampling']), (6, 'minmax'))
+        self.assertEqual(too_few, {'type': 'error', 'message': 'max_points must be at least 3'})
+        self.assertEqual(not_a_number['type'], 'error')
+        self.assertIn('many', not_a_number['message'])
+        self.assertEqual(unknown, {'type': 'error', 'message': 'downsample must be one of: lttb, minmax'})
+
+    @skipUnless('msgpack' in CODECS, 'msgpack is not installed')
+    def test_msgpack_replies_carry_float64_arrays(self):
+        reply, = self.exchange({**self.history, 'request_id': 'h1'}, subprotocols=['msgpack'])
+
+        self.assertEqual((reply['type'], reply['request_id']), ('rate_history', 'h1'))
+        self.assertIsInstance(reply['data']['values'], np.ndarray)
+        self.assertEqual(reply['data']['values'].dtype, np.float64)
+        self.assertEqual(len(reply['data']['values']), 24)
+        self.assertEqual(list(reply['data']['months'][:3]), [1, 2, 3])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_identical_calls_share_one_query(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def query():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ['Japan', 'Vietnam']
+
+        async def run():
+            return await asyncio.gather(
+                *(flights.do(('countries',), query) for _ in range(5)),
+                flights.do(('currencies', 'japan'), query)
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(result == ['Japan', 'Vietnam'] for result in results))
+
+        metrics = flights.metrics()
+        self.assertEqual((metrics['executed'], metrics['coalesced'], metrics['in_flight']), (2, 4, 0))
+        self.assertEqual(metrics['by_query']['countries'], {'executed': 1, 'coalesced': 4})
+
+    def test_reads_after_a_write_do_not_join_older_flights(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def query():
+            calls.append(1)
+            number = len(calls)
+            await asyncio.sleep(0.01)
+            return number
+
+        async def run():
+            before = asyncio.ensure_future(flights.do(('summary',), query))
+            await asyncio.sleep(0)
+            written = flights.mark_write()
+            # Another connection may still share the older read; the writer's next read may not
+            other, own = await asyncio.gather(
+                flights.do(('summary',), query), flights.do(('summary',), query, after=written)
+            )
+            later = asyncio.ensure_future(flights.do(('summary',), query, after=written))
+            return await before, other, own, await later
+
+        self.assertEqual(asyncio.run(run()), (1, 1, 2, 3))
+
+    def test_consumer_reads_after_its_own_write(self):
+        seen = []
+
+        async def write(consumer, data):
+            pass
+
+        async def read(consumer, data):
+            seen.append(read_after.get())
+
+        consumer = CurrencyConsumer()
+        consumer.last_write = 0
+        with mock.patch.multiple(CurrencyConsumer, demo_stored_procedure=write, demo_stored_function=read):
+            async_to_sync(consumer.handle_message)({'type': 'get_average_rate'})
+            async_to_sync(consumer.handle_message)({'type': 'update_rate'})
+            async_to_sync(consumer.handle_message)({'type': 'get_average_rate'})
+
+        self.assertEqual(seen[0], 0)
+        self.assertEqual(seen[1], consumer.last_write)
+        self.assertGreater(consumer.last_write, 0)
+
+
+class SharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.key = make_key('currencies', 'viet nam')
+
+    def build(self):
+        self.builds += 1
+        return [{'id': 1, 'COUNTRY': 'Viet Nam'}, self.builds]
+
+    def test_fresh_entries_are_served_until_the_data_version_changes(self):
+        self.assertEqual(get_or_build(self.key, self.build, 60)[1], 1)
+        self.assertEqual(get_or_build(self.key, self.build, 60)[1], 1)
+
+        bump_data_version()
+        self.assertEqual(get_or_build(self.key, self.build, 60)[1], 2)
+
+    def test_stale_entries_are_served_while_another_reader_rebuilds(self):
+        get_or_build(self.key, self.build, 0, stale_timeout=60)
+
+        # Another worker holds the refresh lock: this reader gets the stale payload at once
+        cache.add(f'{self.key}:refresh', True, version=get_data_version())
+        self.assertEqual(get_or_build(self.key, self.build, 0, stale_timeout=60)[1], 1)
+
+        cache.delete(f'{self.key}:refresh', version=get_data_version())
+        self.assertEqual(get_or_build(self.key, self.build, 0, stale_timeout=60)[1], 2)
+
+    def test_dashboard_payload_is_keyed_by_year_and_limit(self):
+        consumer = CurrencyConsumer()
+        with mock.patch.object(consumer, '_build_dashboard_data', return_value={'year': 2023}) as build:
+            async_to_sync(consumer._get_dashboard_data)({'year': 2023, 'limit': 3})
+            async_to_sync(consumer._get_dashboard_data)({'year': '2023', 'limit': '3'})
+
+        build.assert_called_once_with(2023, 3)
+        self.assertIn({'year': 2023}, cache.get(make_key('dashboard', 2023, 3), version=get_data_version()))
+
+
+class BenchmarkLoadTests(TransactionTestCase):
+    def test_message_mix_parses_weights(self):
+        self.assertEqual(benchmark_load.message_mix('convert=3, update_rate'), {'convert': 3.0, 'update_rate': 1.0})
+        with self.assertRaises(argparse.ArgumentTypeError):
+            benchmark_load.message_mix('convert=1,unknown=2')
+        with self.assertRaises(argparse.ArgumentTypeError):
+            benchmark_load.message_mix('convert=0')
+
+    def test_results_group_latencies_by_type(self):
+        samples = [('convert', latency / 1000, True) for latency in range(1, 101)] + [('update_rate', 0.5, False)]
+        results = benchmark_load.Command()._results(2.0, samples, {'convert': 50, 'update_rate': 3})
+
+        self.assertEqual(list(results), ['convert', 'update_rate', 'total'])
+        self.assertEqual(results['convert']['messages'], 100)
+        self.assertAlmostEqual(results['convert']['p50_ms'], 50.5)
+        self.assertAlmostEqual(results['convert']['p99_ms'], 99.01)
+        self.assertEqual(results['update_rate']['errors'], 1)
+        self.assertEqual(results['total']['messages'], 101)
+        self.assertEqual(results['total']['queries'], 53)
+        self.assertAlmostEqual(results['total']['throughput'], 50.5)
+
+    def test_populate_builds_derived_tables(self):
+        benchmark_load.Command()._populate(3, 2023, 2024, seed=1)
+
+        self.assertEqual(Currency.objects.count(), 6)
+        self.assertEqual(Currency.objects.filter(base_currency=BaseCurrency.EUR).count(), 3)
+        self.assertEqual(MonthlyRate.objects.count(), 6 * 24)
+        self.assertEqual(YearlyRateAggregate.objects.count(), 6 * 2)
+        self.assertEqual(RateSummary.objects.count(), 6 * 24)
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 6 * 24)
+
+    def test_refuses_the_regular_settings(self):
+        with self.assertRaisesMessage(CommandError, 'currency.settings_benchmark'):
+            call_command('benchmark_load', no_seed=True)
+
+    @override_settings(BENCHMARK_LOAD=True)
+    def test_writes_results_for_each_message_type(self):
+        benchmark_load.Command()._populate(3, 2023, 2024, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'benchmark_load', no_seed=True, clients=2, messages=10, output=output,
+                mix=benchmark_load.message_mix('convert=1,get_currencies=1,update_rate=1'), stdout=mock.MagicMock()
+            )
+            with open(output) as results:
+                document = json.load(results)
+
+        self.assertEqual(document['dataset']['currencies'], 6)
+        self.assertEqual(document['results']['total']['messages'], 20)
+        self.assertEqual(document['results']['total']['errors'], 0)
+        self.assertGreater(document['results']['total']['queries'], 0)
+
+
+class BenchmarkConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        benchmark_load.Command()._populate(4, 2023, 2024, seed=1)
+
+    def test_simultaneous_reads_ask_for_different_keys(self):
+        cells = list(
+            MonthlyRate.objects.order_by('year', 'currency_id')
+            .values_list('currency__COUNTRY', 'currency_id', 'year').distinct()
+        )
+        command = benchmark_concurrency.Command()
+        requests = [dumps(command._request(number, cells)) for number in range(len(cells))]
+        self.assertEqual(len(set(requests)), len(cells))
+
+    def test_reports_every_thread_and_socket_count(self):
+        output = mock.MagicMock()
+        call_command('benchmark_concurrency', sockets=[1, 3], threads=[0, 2], messages=4, stdout=output)
+
+        rows = [call.args[0].split() for call in output.write.call_args_list if call.args[0][:1] == ' ']
+        self.assertEqual([(row[0], row[1], row[2]) for row in rows], [
+            ('0', '1', '4'), ('0', '3', '12'), ('2', '1', '4'), ('2', '3', '12')
+        ])
+
+
+class SeedCurrenciesTests(TestCase):
+    HEADER = 'COUNTRY,INDICATOR,FREQUENCY,SCALE,2023-M01,2023-M02\n'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.csv_path = os.path.join(directory.name, 'currencies.csv')
+
+    def write_csv(self, lines):
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write(self.HEADER + ''.join(lines))
+
+    def seed(self, **options):
+        call_command('seed_currencies', self.csv_path, stdout=mock.MagicMock(), stderr=mock.MagicMock(), **options)
+
+    def cells(self):
+        return set(MonthlyRate.objects.values_list('currency__COUNTRY', 'year', 'month', 'rate'))
+
+    def test_workers_assign_ids_from_each_row(self):
+        lines = [
+            f'Country {number},Domestic currency per US Dollar,Monthly,Units,{number}.5,{number}.75\n'
+            for number in range(12)
+        ]
+        # Blank lines shift line numbers against parsed rows
+        lines.insert(3, '\n')
+        lines.insert(8, '\n\n')
+        self.write_csv(lines)
+
+        self.seed(workers=2, chunk_size=2)
+
+        self.assertEqual(Currency.objects.count(), 12)
+        self.assertEqual(self.cells(), {
+            (f'Country {number}', 2023, month, number + fraction)
+            for number in range(12) for month, fraction in ((1, 0.5), (2, 0.75))
+        })
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 24)
+
+    def test_workers_stop_at_the_first_bad_row(self):
+        self.write_csv([
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.0\n',
+            ',Domestic currency per US Dollar,Monthly,Units,3.0,4.0\n',
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,5.0,6.0\n',
+        ])
+
+        self.seed(workers=2, chunk_size=1)
+        self.assertEqual(self.cells(), {('Aland', 2023, 1, 1.0), ('Aland', 2023, 2, 2.0)})
+
+        self.seed(workers=2, chunk_size=1, skip_errors=True)
+        self.assertEqual({country for country, _, _, _ in self.cells()}, {'Aland', 'Bhutan'})
+
+    def test_chunked_load_matches_the_csv(self):
+        self.write_csv([
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.0\n',
+            'Aland,Domestic currency per Euro,Monthly,Units,1.5,\n',
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,NaN,6.0\n',
+            # Repeated in a later chunk: same currency, first rate wins
+            'Aland,Domestic currency per US Dollar,Monthly,Units,9.0,9.0\n',
+            'Chad,Domestic currency per US Dollar,,,7.0,8.0\n',
+        ])
+
+        self.seed(chunk_size=2)
+
+        self.assertEqual(Currency.objects.count(), 4)
+        self.assertEqual(Currency.objects.get(COUNTRY='Chad').FREQUENCY, 'Annual')
+        self.assertEqual(self.cells(), {
+            ('Aland', 2023, 1, 1.0), ('Aland', 2023, 2, 2.0), ('Aland', 2023, 1, 1.5),
+            ('Bhutan', 2023, 2, 6.0), ('Chad', 2023, 1, 7.0), ('Chad', 2023, 2, 8.0),
+        })
+        self.assertEqual(YearlyRateAggregate.objects.count(), 4)
+        self.assertEqual(RateSummary.objects.count(), 6)
+        self.assertEqual(TableCounter.objects.totals(), {
+            TableCounter.CURRENCIES: 4, TableCounter.RATES: 6, TableCounter.AUDITS: 0
+        })
+
+    def test_chunked_load_keeps_rows_before_a_bad_one(self):
+        self.write_csv([
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.0\n',
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,5.0,6.0\n',
+            'Chad,,Monthly,Units,3.0,4.0\n',
+            'Denmark,Domestic currency per US Dollar,Monthly,Units,7.0,8.0\n',
+        ])
+
+        self.seed(chunk_size=2)
+
+        self.assertEqual(set(Currency.objects.values_list('COUNTRY', flat=True)), {'Aland', 'Bhutan'})
+        self.assertEqual(MonthlyRate.objects.count(), 4)
+
+    def test_incremental_load_applies_only_the_delta(self):
+        self.write_csv([
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.0\n',
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,5.0,6.0\n',
+            'Chad,Domestic currency per US Dollar,Monthly,Units,7.0,8.0\n',
+        ])
+        self.seed()
+        unchanged = MonthlyRate.objects.get(currency__COUNTRY='Aland', month=1).pk
+
+        self.write_csv([
+            # Aland: January unchanged, February changed
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.5\n',
+            # Bhutan: February removed
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,5.0,\n',
+            # Chad is gone, Denmark is new
+            'Denmark,Domestic currency per US Dollar,Monthly,Units,3.0,4.0\n',
+        ])
+        self.seed(incremental=True, chunk_size=2)
+
+        self.assertEqual(self.cells(), {
+            ('Aland', 2023, 1, 1.0), ('Aland', 2023, 2, 2.5), ('Bhutan', 2023, 1, 5.0),
+            ('Denmark', 2023, 1, 3.0), ('Denmark', 2023, 2, 4.0),
+        })
+        self.assertTrue(MonthlyRate.objects.filter(pk=unchanged).exists())
+        self.assertFalse(Currency.objects.filter(COUNTRY='Chad').exists())
+        self.assertFalse(CurrencyRateAudit.objects.exists())
+        self.assertEqual(YearlyRateAggregate.objects.get(currency__COUNTRY='Aland').maximum, 2.5)
+        self.assertEqual(YearlyRateAggregate.objects.get(currency__COUNTRY='Bhutan').count, 1)
+        self.assertEqual(
+            set(RateSummary.objects.values_list('country', 'month', 'rate')),
+            {(country, month, rate) for country, _, month, rate in self.cells()}
+        )
+        self.assertEqual(TableCounter.objects.totals()[TableCounter.RATES], 5)
+
+    def test_incremental_load_resumes_after_the_checkpoint(self):
+        self.write_csv([
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.0\n',
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,5.0,6.0\n',
+            'Chad,Domestic currency per US Dollar,Monthly,Units,7.0,8.0\n',
+        ])
+        checkpoint_path = f'{self.csv_path}.checkpoint'
+        seed_currencies.Command()._write_checkpoint(checkpoint_path, self.csv_path, 2)
+
+        self.seed(incremental=True, chunk_size=1)
+
+        self.assertEqual({country for country, _, _, _ in self.cells()}, {'Chad'})
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+    def test_checkpoint_of_a_changed_csv_is_ignored(self):
+        rows = [
+            'Aland,Domestic currency per US Dollar,Monthly,Units,1.0,2.0\n',
+            'Bhutan,Domestic currency per US Dollar,Monthly,Units,5.0,6.0\n',
+        ]
+        checkpoint_path = f'{self.csv_path}.checkpoint'
+        command = seed_currencies.Command(stdout=mock.MagicMock())
+
+        self.write_csv(rows)
+        command._write_checkpoint(checkpoint_path, self.csv_path, 1)
+        self.assertEqual(command._read_checkpoint(checkpoint_path, self.csv_path), 1)
+
+        # Same size, new modification time
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(command._read_checkpoint(checkpoint_path, self.csv_path), 0)
+
+        command._write_checkpoint(checkpoint_path, self.csv_path, 1)
+        self.write_csv(rows + ['Chad,Domestic currency per US Dollar,Monthly,Units,7.0,8.0\n'])
+        self.assertEqual(command._read_checkpoint(checkpoint_path, self.csv_path), 0)
+
+        self.seed(incremental=True)
+        self.assertEqual(Currency.objects.count(), 3)